@@ -0,0 +1,143 @@
+"""
+Admission control for heavy analysis requests.
+
+Each request is given an estimated memory cost (from the file's row count and
+the plots it asks for). Requests run while the sum of running costs fits in a
+per-worker budget; the rest wait in a bounded queue and are rejected with a
+retry hint when the queue is full or their wait times out. Waiting requests
+are granted round-robin across tenants so one client cannot starve others.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    def __init__(self, cost, tenant):
+        self.cost = cost
+        self.tenant = tenant
+        self.granted = False
+
+
+class AdmissionController:
+    """Memory-budgeted admission with a bounded, per-tenant fair wait queue"""
+
+    def __init__(self, budget_mb=1024, max_queue=8, queue_timeout=25,
+                 bytes_per_row=400, plot_cost_mb=40, base_cost_mb=50):
+        self.budget_mb = budget_mb
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bytes_per_row = bytes_per_row
+        self.plot_cost_mb = plot_cost_mb
+        self.base_cost_mb = base_cost_mb
+
+        self._cond = threading.Condition()
+        self._in_use_mb = 0
+        self._running = 0
+        self._waiting = 0
+        self._queues = OrderedDict()  # tenant -> deque of tickets, in round-robin order
+        self._avg_seconds = 5.0  # moving average of admitted request duration
+
+    def estimate_cost(self, rows_count, n_plots, comparison=False):
+        """Estimated peak memory (MB) of a request, capped at the budget so it can always run alone"""
+        rows_mb = (rows_count or 0) * self.bytes_per_row / (1024 * 1024)
+        cost = self.base_cost_mb + rows_mb + n_plots * self.plot_cost_mb
+        if comparison:
+            # Period slices copy the frame, plus two comparison plots per precip type
+            cost += rows_mb + 4 * self.plot_cost_mb
+        return min(cost, self.budget_mb)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'budget_mb': self.budget_mb,
+                'in_use_mb': round(self._in_use_mb, 1),
+                'running': self._running,
+                'waiting': self._waiting,
+                'max_queue': self.max_queue
+            }
+
+    def _retry_after(self):
+        """Rough seconds until capacity frees up, for the Retry-After header"""
+        per_slot = self._avg_seconds / max(self._running, 1)
+        return max(1, int(round(per_slot * (self._waiting + 1))))
+
+    def _fits(self, cost):
+        return self._running == 0 or self._in_use_mb + cost <= self.budget_mb
+
+    def _grant(self, ticket):
+        ticket.granted = True
+        self._in_use_mb += ticket.cost
+        self._running += 1
+        self._waiting -= 1
+
+    def _dispatch(self):
+        """Grant queued tickets round-robin across tenants while they fit in the budget"""
+        granted = False
+        while self._queues:
+            tenant, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            if not self._fits(ticket.cost):
+                # Head-of-line blocking keeps large requests from starving
+                break
+            queue.popleft()
+            self._grant(ticket)
+            granted = True
+            del self._queues[tenant]
+            if queue:
+                self._queues[tenant] = queue  # Move tenant to the back of the rotation
+        if granted:
+            self._cond.notify_all()
+
+    def _remove(self, ticket):
+        queue = self._queues.get(ticket.tenant)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            self._waiting -= 1
+            if not queue:
+                del self._queues[ticket.tenant]
+
+    @contextmanager
+    def admit(self, cost, tenant='default'):
+        """Hold `cost` MB of the budget for the duration of the block"""
+        ticket = _Ticket(cost, tenant)
+        with self._cond:
+            if not self._queues and self._fits(cost):
+                self._waiting += 1
+                self._grant(ticket)
+            else:
+                if self._waiting >= self.max_queue:
+                    raise AdmissionRejected('Server is busy: too many analysis requests are queued',
+                                            self._retry_after())
+                self._queues.setdefault(tenant, deque()).append(ticket)
+                self._waiting += 1
+                self._dispatch()
+                deadline = time.monotonic() + self.queue_timeout
+                while not ticket.granted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._remove(ticket)
+                        self._dispatch()
+                        raise AdmissionRejected('Server is busy: timed out waiting for capacity',
+                                                self._retry_after())
+                    self._cond.wait(remaining)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use_mb -= ticket.cost
+                self._running -= 1
+                elapsed = time.monotonic() - started
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+                self._dispatch()
@@ -0,0 +1,122 @@
+"""
+Aggregate tables derived from processed precipitation data.
+
+These are the same monthly and seasonal totals the analysis notebook wrote to
+moab_monthly_totals.csv / moab_seasonal_totals.csv, plus the operating period
+vs climatology statistics shown by /process.
+"""
+import numpy as np
+import pandas as pd
+
+import resampling
+
+PRECIP_COLUMNS = {'rain': 'Rain_mm', 'snow': 'Snow_mm'}
+# Every precip_type an analysis accepts: the stored columns above plus their sum
+PRECIP_TYPES = {**PRECIP_COLUMNS, 'total': 'Precip_Total_mm'}
+
+
+def monthly_totals(df):
+    """Rain, snow and total precipitation per Year/Month"""
+    totals = df.groupby(['Year', 'Month'])[['Rain_mm', 'Snow_mm']].sum().reset_index()
+    totals['Precip_Total_mm'] = totals['Rain_mm'] + totals['Snow_mm']
+    return totals
+
+
+def seasonal_totals(df):
+    """Rain, snow and total precipitation per SeasonYear/Season (December counts toward the next DJF)"""
+    season_year = np.where(df['Month'] == 12, df['Year'] + 1, df['Year'])
+    totals = (df.assign(SeasonYear=season_year)
+                .groupby(['SeasonYear', 'Season'])[['Rain_mm', 'Snow_mm']].sum()
+                .reset_index())
+    totals['Precip_Total_mm'] = totals['Rain_mm'] + totals['Snow_mm']
+    return totals
+
+
+def window_monthly_totals(df, start, end, series=None):
+    """Rain and snow totals per Year/Month of the window [start, end]
+
+    With a UniformSeries the totals are reduceat sums over the grid, as in
+    uniform_comparison_statistics (months where a column has no observation
+    are NaN); otherwise a groupby sum of the window's rows.
+    """
+    cols = list(PRECIP_COLUMNS.values())
+    if series is None:
+        window = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+        return window.groupby(['Year', 'Month'])[cols].sum().reset_index()
+    window = series.window(start, end)
+    tables = [window.reduce(col, 'M', 'sum') for col in cols]
+    observed = np.logical_or.reduce([(t['observations'] > 0).to_numpy() for t in tables])
+    months = pd.DatetimeIndex(tables[0]['period'])[observed]
+    totals = pd.DataFrame({'Year': months.year, 'Month': months.month})
+    for col, table in zip(cols, tables):
+        totals[col] = table['value'].to_numpy()[observed]
+    return totals
+
+
+def comparison_statistics(df_operating, df_climatology, precip_type='rain', resample=None):
+    """Statistical comparison of monthly totals between an operating period and a climatology"""
+    col_name = PRECIP_COLUMNS[precip_type]
+    monthly_op = df_operating.groupby(['Year', 'Month'])[col_name].sum().values
+    monthly_clim = df_climatology.groupby(['Year', 'Month'])[col_name].sum().values
+    return monthly_comparison_statistics(monthly_op, monthly_clim, resample)
+
+
+def uniform_comparison_statistics(series, operating, climatology, precip_type='rain', resample=None):
+    """comparison_statistics() on a UniformSeries, with periods given as (start, end) pairs.
+
+    Periods are slices of the grid and monthly totals are reduceat sums, so
+    no boolean scan or groupby over the full record is needed.
+    """
+    col_name = PRECIP_COLUMNS[precip_type]
+    monthly_op = series.window(*operating).period_totals(col_name, 'M')
+    monthly_clim = series.window(*climatology).period_totals(col_name, 'M')
+    return monthly_comparison_statistics(monthly_op, monthly_clim, resample)
+
+
+def monthly_comparison_statistics(monthly_op, monthly_clim, resample=None):
+    """Significance tests and effect size for two arrays of monthly totals
+
+    `resample` (keyword arguments for resampling.resampled_statistics, e.g.
+    n_resamples and seed) adds bootstrap confidence intervals and a
+    permutation p-value.
+    """
+    from scipy import stats
+
+    # Statistical tests
+    t_stat, t_pval = stats.ttest_ind(monthly_op, monthly_clim)
+    u_stat, u_pval = stats.mannwhitneyu(monthly_op, monthly_clim, alternative='two-sided')
+    ks_stat, ks_pval = stats.ks_2samp(monthly_op, monthly_clim)
+
+    # Effect size (Cohen's d)
+    pooled_std = np.sqrt((monthly_op.std()**2 + monthly_clim.std()**2) / 2)
+    cohens_d = (monthly_op.mean() - monthly_clim.mean()) / pooled_std if pooled_std > 0 else 0
+
+    result = {
+        'operating_mean': float(monthly_op.mean()),
+        'operating_std': float(monthly_op.std()),
+        'climatology_mean': float(monthly_clim.mean()),
+        'climatology_std': float(monthly_clim.std()),
+        't_test_pvalue': float(t_pval),
+        'mannwhitney_pvalue': float(u_pval),
+        'ks_test_pvalue': float(ks_pval),
+        'cohens_d': float(cohens_d)
+    }
+    if resample is not None:
+        result.update(resampling.resampled_statistics(monthly_op, monthly_clim, **resample))
+    return result
+
+
+def comparison_table(df_operating, df_climatology, stats_fn=None):
+    """Comparison statistics for rain and snow as a DataFrame (one row per precip type)
+
+    `stats_fn(precip_type)` can supply the statistics instead (e.g. from a UniformSeries).
+    """
+    rows = []
+    for precip_type in PRECIP_COLUMNS:
+        row = {'precip_type': precip_type}
+        if stats_fn is not None:
+            row.update(stats_fn(precip_type))
+        else:
+            row.update(comparison_statistics(df_operating, df_climatology, precip_type))
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -1,28 +1,77 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import os
 import sys
 import traceback
+import gc
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
-import numpy as np
-from models import db, DataFile
+from models import db, DataFile, upgrade_schema
 from config import Config
 from data_processor import DataProcessor
 from plot_generator import PlotGenerator
+from dataset_cache import DatasetCache
+from shared_dataset import SharedDatasetStore, default_shared_dir
+from storage import save_stream_with_hash, directory_size, FileLocks
+from single_flight import SingleFlight, request_key
+from admission import AdmissionController, AdmissionRejected
+from plot_cache import PlotCache, plot_cache_key
+from cache_warmer import CacheWarmer, WARM_READY
+from reclaimer import Reclaimer
+import aggregates
+import exporter
+import uniform_series
+import totals_store
+import catalog
+import wind
+import event_wind
+import precip_events
+import extremes
+import trends
+import baselines
+from query import Query
+import multi_station
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db.init_app(app)
 
 plot_gen = PlotGenerator()
+shared_store = None
+if Config.SHARED_DATASETS:
+    shared_store = SharedDatasetStore(Config.SHARED_DATASET_DIR or default_shared_dir(Config.CACHE_FOLDER))
+# Readers of stored files hold these locks so reclamation never removes a file mid-read
+file_locks = FileLocks(os.path.join(Config.CACHE_FOLDER, 'reclaim', 'files'))
+dataset_cache = DatasetCache(Config.DATASET_CACHE_SIZE, store=shared_store, file_locks=file_locks,
+                             max_aggregates=Config.AGGREGATE_CACHE_SIZE)
+process_flight = SingleFlight(os.path.join(Config.CACHE_FOLDER, 'single_flight'), Config.COALESCE_RESULT_TTL,
+                              publish_if=lambda result: result[1] == 200)
+totals_flight = SingleFlight(os.path.join(Config.CACHE_FOLDER, 'single_flight'), Config.COALESCE_RESULT_TTL)
+admission = AdmissionController(
+    budget_mb=Config.ADMISSION_MEMORY_BUDGET_MB,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+    bytes_per_row=Config.ADMISSION_BYTES_PER_ROW,
+    plot_cost_mb=Config.ADMISSION_PLOT_COST_MB
+)
+plot_cache = PlotCache(os.path.join(Config.CACHE_FOLDER, 'plots'), Config.PLOT_CACHE_MB * 1024 * 1024)
+
+# Plots rendered by "generate all" and pre-rendered by cache warming after upload
+ESSENTIAL_PLOTS = ['annual_totals', 'monthly_climatology']
+
+# Routes that always answer with JSON, including for errors
+API_PATH_PREFIXES = ('/process', '/upload', '/delete_file', '/render_plot', '/export', '/file_status', '/totals', '/api/', '/storage', '/wind_rose', '/event_wind', '/events', '/extremes', '/trends', '/baselines', '/process_multi')
 
 @app.errorhandler(404)
 def handle_404(e):
     """Handle 404 errors"""
     try:
         # Check if this is an API endpoint
-        if hasattr(request, 'path') and (request.path.startswith('/process') or request.path.startswith('/upload') or request.path.startswith('/delete_file')):
+        if hasattr(request, 'path') and request.path.startswith(API_PATH_PREFIXES):
             return jsonify({'error': 'Endpoint not found'}), 404
     except RuntimeError:
         # Request context not available, assume API endpoint
@@ -41,7 +90,7 @@ def handle_500(e):
     
     # Return JSON for API endpoints
     try:
-        if hasattr(request, 'path') and (request.path.startswith('/process') or request.path.startswith('/upload') or request.path.startswith('/delete_file')):
+        if hasattr(request, 'path') and request.path.startswith(API_PATH_PREFIXES):
             return jsonify({'error': f'Server error: {error_msg}'}), 500
     except RuntimeError:
         # Request context not available, assume API endpoint
@@ -59,7 +108,7 @@ def handle_exception(e):
     
     # Return JSON for API endpoints
     try:
-        if hasattr(request, 'path') and (request.path.startswith('/process') or request.path.startswith('/upload') or request.path.startswith('/delete_file')):
+        if hasattr(request, 'path') and request.path.startswith(API_PATH_PREFIXES):
             return jsonify({'error': error_msg}), 500
     except RuntimeError:
         # Request context not available, assume API endpoint
@@ -73,11 +122,253 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def compressed_extensions():
+    """Accepted compressed/archive extensions, e.g. ['.gz', '.zip', '.zst']"""
+    return sorted(f'.{ext}' for ext in Config.ALLOWED_EXTENSIONS if ext != 'csv')
+
+def find_stored_content(content_hash):
+    """Return a processed DataFile whose stored file has this content, if any"""
+    # Deleted entries close to reclamation are not reused, so their file is not removed under a new entry
+    reuse_cutoff = datetime.utcnow() - timedelta(hours=app.config['RECLAIM_RETENTION_HOURS'] / 2)
+    candidates = (DataFile.query
+                  .filter(DataFile.content_hash == content_hash, DataFile.rows_count.isnot(None),
+                          db.or_(DataFile.is_active.is_(True), DataFile.deleted_at.is_(None),
+                                 DataFile.deleted_at > reuse_cutoff))
+                  .order_by(DataFile.is_active.desc(), DataFile.id))
+    for candidate in candidates:
+        if os.path.exists(candidate.file_path):
+            return candidate
+    return None
+
+def plot_source_id(data_file):
+    """Plot cache namespace of a file: its content hash, or its stored path for older rows"""
+    if data_file.content_hash:
+        return data_file.content_hash
+    return request_key('path', [os.path.abspath(data_file.file_path)])
+
+def uniform_series_for(data_file):
+    """Uniform-grid precipitation series of a file (cached), or None if the record is too irregular"""
+    def build(df):
+        try:
+            return uniform_series.from_processed(df)
+        except ValueError as e:
+            print(f"No uniform grid for {data_file.file_path}: {e}", file=sys.stderr, flush=True)
+            return None
+    return dataset_cache.aggregate(data_file.file_path, 'uniform', build)
+
+def resample_options():
+    """Resampling settings for comparison statistics, or None when disabled"""
+    if Config.RESAMPLE_COUNT <= 0:
+        return None
+    return {
+        'n_resamples': Config.RESAMPLE_COUNT,
+        'seed': Config.RESAMPLE_SEED,
+        'chunk_size': Config.RESAMPLE_CHUNK
+    }
+
+def comparison_statistics(data_file, df_operating, df_climatology, operating, climatology, precip_type,
+                          baseline=None):
+    """Operating vs climatology statistics, from the uniform grid when the file has one
+    
+    With a stored baseline only the operating window is aggregated.
+    """
+    series = uniform_series_for(data_file)
+    if baseline is not None:
+        # Same monthly totals the baseline was built from
+        col_name = aggregates.PRECIP_COLUMNS[precip_type]
+        monthly_op = aggregates.window_monthly_totals(df_operating, *operating, series=series)[col_name]
+        monthly_op = monthly_op.dropna().to_numpy()
+        return aggregates.monthly_comparison_statistics(monthly_op, baseline.monthly_totals(precip_type),
+                                                        resample_options())
+    if series is None:
+        return aggregates.comparison_statistics(df_operating, df_climatology, precip_type, resample_options())
+    return aggregates.uniform_comparison_statistics(series, operating, climatology, precip_type,
+                                                    resample_options())
+
+def baseline_for(data_file, baseline_id):
+    """Stored climatology baseline of a file (raises ValueError if it is not one of the file's)"""
+    try:
+        baseline = baselines.get_baseline(int(baseline_id))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid baseline_id '{baseline_id}'")
+    if baseline is None or baseline.file_id != data_file.id:
+        raise ValueError(f'Baseline {baseline_id} not found for file {data_file.id}')
+    return baseline
+
+def wind_table_for(data_file, month_filter=None, precip_type=None, sectors=wind.DEFAULT_SECTORS,
+                   speed_bins=None):
+    """Wind rose table of a file for one month/precip filter, computed once per cached dataset"""
+    months = sorted(int(m) for m in (month_filter or []))
+    name = request_key('wind', {'months': months, 'precip_type': precip_type or 'all',
+                                'sectors': int(sectors), 'speed_bins': speed_bins})
+    return dataset_cache.aggregate(
+        data_file.file_path, name,
+        lambda df: wind.wind_rose_table(df, months, precip_type, sectors, speed_bins, data_file.file_format))
+
+def events_for(data_file, precip_type, min_gap_hours=None, threshold=None):
+    """Precipitation event table of a file (whole record), computed once per cached dataset"""
+    min_gap_hours = Config.EVENT_MIN_GAP_HOURS if min_gap_hours is None else min_gap_hours
+    threshold = Config.EVENT_THRESHOLD_MM if threshold is None else threshold
+    name = request_key('events', {'precip_type': precip_type, 'min_gap_hours': min_gap_hours,
+                                  'threshold': threshold})
+    return dataset_cache.aggregate(
+        data_file.file_path, name,
+        lambda df: precip_events.segment_events(df, precip_type, min_gap_hours, threshold))
+
+def extremes_for(data_file, precip_type, windows_days=extremes.DEFAULT_WINDOWS_DAYS, min_coverage=0.8):
+    """Annual maximum n-day totals of a file, computed once per cached dataset"""
+    name = request_key('extremes', {'precip_type': precip_type, 'windows_days': list(windows_days),
+                                    'min_coverage': min_coverage})
+    return dataset_cache.aggregate(
+        data_file.file_path, name,
+        lambda df: extremes.annual_maxima(df, precip_type, windows_days, min_coverage))
+
+def trends_for(data_file, precip_types, alpha):
+    """Trend table of a file's monthly, seasonal and annual totals, computed once per cached dataset"""
+    def build(df):
+        monthly = dataset_cache.aggregate(data_file.file_path, 'monthly', aggregates.monthly_totals)
+        seasonal = dataset_cache.aggregate(data_file.file_path, 'seasonal', aggregates.seasonal_totals)
+        return trends.trend_table(monthly, seasonal, df['timestamp'].min(), df['timestamp'].max(),
+                                  precip_types, alpha)
+    name = request_key('trends', {'precip_types': list(precip_types), 'alpha': alpha})
+    return dataset_cache.aggregate(data_file.file_path, name, build)
+
+_station_pool = None
+_station_pool_lock = threading.Lock()
+
+def station_pool():
+    """Process pool that parses uncached files for /process_multi, or None to parse on threads"""
+    global _station_pool
+    if Config.MULTI_STATION_PROCESSES <= 0 or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    with _station_pool_lock:
+        if _station_pool is None:
+            # forkserver: forking this multithreaded process could copy locks held by other threads
+            # into the workers. The server preloads multi_station so workers start with pandas imported.
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['multi_station'])
+            _station_pool = ProcessPoolExecutor(max_workers=Config.MULTI_STATION_PROCESSES, mp_context=context)
+        return _station_pool
+
+def drop_station_pool(pool):
+    """Forget a broken station pool so the next station_pool() call starts a new one"""
+    global _station_pool
+    with _station_pool_lock:
+        if _station_pool is pool:
+            _station_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def load_station_tables(paths):
+    """multi_station.load_stations() on the station pool, retried once on a new pool if a worker died"""
+    for attempt in range(2):
+        pool = station_pool()
+        try:
+            return multi_station.load_stations(paths, station_monthly_for, pool, file_locks)
+        except BrokenProcessPool:
+            print("Station pool broken, starting a new one", file=sys.stderr, flush=True)
+            drop_station_pool(pool)
+            if attempt:
+                raise
+
+def station_monthly_for(path):
+    """Monthly totals with coverage of a file if it is cached in this process, else None"""
+    if not dataset_cache.contains(path):
+        return None
+    return dataset_cache.aggregate(path, 'monthly_coverage', multi_station.monthly_coverage)
+
+def plot_key(gen, plot_type, precip_type, month_filter=None, season_filter=None):
+    """Plot cache key, including the configured event settings for event plots"""
+    settings = None
+    if plot_type in gen.EVENT_PLOTS:
+        settings = {'min_gap_hours': Config.EVENT_MIN_GAP_HOURS, 'threshold': Config.EVENT_THRESHOLD_MM}
+    return plot_cache_key(gen, plot_type, precip_type, month_filter, season_filter, settings)
+
+def render_plot(gen, data_file, df, plot_type, precip_type, month_filter=None, season_filter=None):
+    """Render one per-file plot; wind roses and event plots are drawn from cached tables"""
+    if plot_type == 'wind_rose':
+        return gen.wind_rose(df, precip_type, month_filter, table=wind_table_for(data_file, month_filter, precip_type))
+    if plot_type == 'return_levels':
+        return gen.return_levels(df, precip_type, maxima=extremes_for(data_file, precip_type))
+    if plot_type in gen.EVENT_PLOTS:
+        return getattr(gen, plot_type)(df, precip_type, month_filter, events=events_for(data_file, precip_type))
+    return gen.render(df, plot_type, precip_type, month_filter, season_filter)
+
+def warm_generators():
+    """Generator variants used by the default UI: progressive previews and their full renders"""
+    return [plot_gen.for_output('auto', 'preview', annotate=False), plot_gen.for_output('auto', 'full')]
+
+def warm_file(data_file):
+    """Build the processed DataFrame, aggregate tables and default plots of a file"""
+    path = data_file.file_path
+    n_plots = 2 * len(ESSENTIAL_PLOTS) * len(warm_generators())
+    with admission.admit(admission.estimate_cost(data_file.rows_count, n_plots), 'cache-warmer'):
+        df, _ = dataset_cache.get(path)
+        dataset_cache.aggregate(path, 'monthly', aggregates.monthly_totals)
+        dataset_cache.aggregate(path, 'seasonal', aggregates.seasonal_totals)
+        uniform_series_for(data_file)
+        totals_store.ensure_totals(data_file, lambda: df)
+        source_id = plot_source_id(data_file)
+        for gen in warm_generators():
+            for plot_type in ESSENTIAL_PLOTS:
+                for precip_type in ['rain', 'snow']:
+                    key = plot_key(gen, plot_type, precip_type)
+                    if plot_cache.get(source_id, key):
+                        continue
+                    plot_cache.put(source_id, key, gen.render(df, plot_type, precip_type), gen.mime_type(plot_type))
+                    gc.collect()
+
+cache_warmer = CacheWarmer(app, warm_file, retry_on=(AdmissionRejected,))
+
+def release_artifacts(data_file):
+    """Remove the artifacts derived from a stored file; returns bytes freed per category"""
+    return {
+        'shared_datasets': dataset_cache.release(data_file.file_path),
+        'plot_cache': plot_cache.invalidate(plot_source_id(data_file))
+    }
+
+reclaimer = Reclaimer(app, app.config['UPLOAD_FOLDER'], os.path.join(Config.CACHE_FOLDER, 'reclaim'),
+                      release_artifacts, timedelta(hours=Config.RECLAIM_RETENTION_HOURS),
+                      Config.RECLAIM_INTERVAL_SECONDS)
+# Station pool workers re-import app.py when it is run as the main script; only the server reclaims
+if Config.RECLAIM_ENABLED and multiprocessing.parent_process() is None:
+    reclaimer.start()
+
 @app.route('/')
 def index():
     """Main page with file selection and options"""
-    files = DataFile.query.filter_by(is_active=True).order_by(DataFile.uploaded_at.desc()).all()
-    return render_template('index.html', files=files)
+    # Only the newest page is rendered; the rest is fetched from /api/files on demand
+    files, next_cursor = catalog.catalog_page(limit=app.config['CATALOG_PAGE_SIZE'])
+    return render_template('index.html', files=files, next_cursor=next_cursor,
+                           compressed_extensions=compressed_extensions())
+
+@app.route('/api/files', methods=['GET'])
+def list_files():
+    """Paginated catalog of active files, newest first
+    
+    Query parameters: limit, cursor (from next_cursor), covers_start,
+    covers_end, format, station, min_size, max_size, q.
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', app.config['CATALOG_PAGE_SIZE']))
+            filters = catalog.parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+        limit = max(1, min(limit, app.config['CATALOG_MAX_PAGE_SIZE']))
+        try:
+            files, next_cursor = catalog.catalog_page(filters, limit, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'files': [f.to_catalog_dict() for f in files],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error listing files: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -91,7 +382,7 @@ def upload_file():
             return jsonify({'error': 'No file selected'}), 400
         
         if not file or not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Please upload a CSV file.'}), 400
+            return jsonify({'error': f"Invalid file type. Please upload a CSV file (optionally compressed as {', '.join(compressed_extensions())})."}), 400
         
         # Ensure upload directory exists
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -101,17 +392,56 @@ def upload_file():
         unique_filename = f"{timestamp}_{filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         
+        # Hash the content while streaming it to disk
         try:
-            file.save(filepath)
+            temp_path, content_hash, _ = save_stream_with_hash(file.stream, app.config['UPLOAD_FOLDER'])
         except Exception as e:
             error_msg = f'Error saving file: {str(e)}'
             print(error_msg, file=sys.stderr, flush=True)
             return jsonify({'error': error_msg}), 500
         
+        # Same content uploaded before: link to the stored file and its processed outputs
+        existing = find_stored_content(content_hash)
+        if existing:
+            os.remove(temp_path)
+            data_file = DataFile(
+                filename=existing.filename,
+                original_filename=filename,
+                file_path=existing.file_path,
+                rows_count=existing.rows_count,
+                date_range_start=existing.date_range_start,
+                date_range_end=existing.date_range_end,
+                content_hash=content_hash,
+                warm_status=existing.warm_status,
+                file_format=existing.file_format,
+                station=existing.station,
+                file_size=existing.file_size
+            )
+            db.session.add(data_file)
+            db.session.flush()
+            totals_store.copy_totals(existing.id, data_file.id)
+            db.session.commit()
+            if app.config['WARM_CACHE_ON_UPLOAD'] and data_file.warm_status != WARM_READY:
+                cache_warmer.enqueue(data_file)
+            return jsonify({
+                'success': True,
+                'file_id': data_file.id,
+                'filename': filename,
+                'rows_count': data_file.rows_count,
+                'date_range': f"{data_file.date_range_start.strftime('%Y-%m-%d')} to {data_file.date_range_end.strftime('%Y-%m-%d')}",
+                'duplicate_of': existing.id,
+                'warm_status': data_file.warm_status
+            })
+        
+        os.replace(temp_path, filepath)
+        
         try:
-            # Process file to get metadata
-            processor = DataProcessor(filepath)
-            df, _ = processor.process()
+            # Process file to get metadata (compressed files are decompressed as a stream)
+            processor = DataProcessor(filepath, max_uncompressed_bytes=app.config['MAX_UNCOMPRESSED_LENGTH'])
+            rows_estimate = processor.uncompressed_size() // Config.ADMISSION_CSV_BYTES_PER_ROW
+            with admission.admit(admission.estimate_cost(rows_estimate, 0), request_tenant()):
+                result = processor.process()
+            df, _ = result
             
             # Validate that we have data
             if len(df) == 0:
@@ -136,18 +466,35 @@ def upload_file():
                 file_path=filepath,
                 rows_count=len(df),
                 date_range_start=date_start,
-                date_range_end=date_end
+                date_range_end=date_end,
+                content_hash=content_hash,
+                file_format=processor.file_format,
+                station=processor.station,
+                file_size=os.path.getsize(filepath)
             )
             db.session.add(data_file)
+            db.session.flush()
+            # Monthly and daily totals for SQL-level queries (/totals)
+            totals_store.save_totals(data_file.id, df)
             db.session.commit()
             
+            # Keep the parsed data and pre-render the default plots for the first analysis
+            if app.config['WARM_CACHE_ON_UPLOAD']:
+                dataset_cache.put(filepath, result)
+                cache_warmer.enqueue(data_file)
+            
             return jsonify({
                 'success': True,
                 'file_id': data_file.id,
                 'filename': filename,
                 'rows_count': len(df),
-                'date_range': f"{df['timestamp'].min().strftime('%Y-%m-%d')} to {df['timestamp'].max().strftime('%Y-%m-%d')}"
+                'date_range': f"{df['timestamp'].min().strftime('%Y-%m-%d')} to {df['timestamp'].max().strftime('%Y-%m-%d')}",
+                'warm_status': data_file.warm_status
             })
+        except AdmissionRejected as e:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return busy_response(e)
         except Exception as e:
             # Clean up file if processing fails
             if os.path.exists(filepath):
@@ -171,13 +518,78 @@ def upload_file():
 @app.route('/process', methods=['POST'])
 def process_data():
     """Process data and generate plots based on user selections"""
-    import gc  # For garbage collection
-    
     try:
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No JSON data received'}), 400
         
+        # Identical concurrent requests share one computation, which is admitted
+        # against the worker's memory budget
+        params = normalize_process_params(data)
+        key = request_key('process', params)
+        n_plots = 4 if params['generate_all'] else 2 * len(params['plot_types'])
+        cost = estimate_request_cost(data.get('file_id'), n_plots, params['enable_comparison'])
+        tenant = request_tenant()
+        
+        def admitted_run():
+            with admission.admit(cost, tenant):
+                return run_process(data)
+        
+        payload, status = process_flight.do(key, admitted_run, tag=params['file_id'])
+        return jsonify(payload), status
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        tb_str = traceback.format_exc()
+        print(f"Error in process_data: {error_msg}", file=sys.stderr, flush=True)
+        print(tb_str, file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+def request_tenant():
+    """Client identity used for fair queuing of heavy requests"""
+    return request.headers.get('X-Tenant-ID') or request.remote_addr or 'default'
+
+def estimate_request_cost(file_id, n_plots, comparison=False):
+    """Estimated memory cost (MB) of an analysis request on a file"""
+    data_file = DataFile.query.get(file_id) if file_id else None
+    rows_count = data_file.rows_count if data_file else 0
+    return admission.estimate_cost(rows_count, n_plots, comparison)
+
+def busy_response(e):
+    """503 response for requests rejected by admission control"""
+    response = jsonify({
+        'error': str(e),
+        'retry_after': e.retry_after,
+        'suggestion': f'Please try again in about {e.retry_after} seconds'
+    })
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def normalize_process_params(data):
+    """Canonical form of /process parameters, so equivalent requests get the same key"""
+    def sorted_list(values):
+        return sorted(str(v) for v in (values or []))
+    return {
+        'file_id': data.get('file_id'),
+        'months': sorted_list(data.get('months')),
+        'seasons': sorted_list(data.get('seasons')),
+        'plot_types': sorted_list(data.get('plot_types')),
+        'generate_all': bool(data.get('generate_all', False)),
+        'enable_comparison': bool(data.get('enable_comparison', False)),
+        'op_start': data.get('op_start'),
+        'op_end': data.get('op_end'),
+        'clim_start': data.get('clim_start'),
+        'clim_end': data.get('clim_end'),
+        'baseline_id': data.get('baseline_id'),
+        'output_format': data.get('output_format', 'auto'),
+        'quality': data.get('quality', 'full'),
+        'progressive': bool(data.get('progressive', False))
+    }
+
+def run_process(data):
+    """Run the /process pipeline and return (response payload, HTTP status)"""
+    try:
         file_id = data.get('file_id')
         month_filter = data.get('months', [])
         season_filter = data.get('seasons', [])
@@ -190,9 +602,26 @@ def process_data():
         op_end = data.get('op_end')
         clim_start = data.get('clim_start')
         clim_end = data.get('clim_end')
+        # A stored climatology baseline replaces clim_start/clim_end
+        baseline_id = data.get('baseline_id')
+        
+        # Output encoding: 'auto' picks the cheapest encoder per plot type
+        output_format = data.get('output_format', 'auto')
+        quality = data.get('quality', 'full')
+        # Progressive mode returns low-DPI unannotated previews; the client then
+        # fetches full renders lazily from /render_plot
+        progressive = bool(data.get('progressive', False))
         
         if not file_id:
-            return jsonify({'error': 'No file selected'}), 400
+            return {'error': 'No file selected'}, 400
+        
+        try:
+            if progressive:
+                gen = plot_gen.for_output(output_format, 'preview', annotate=False)
+            else:
+                gen = plot_gen.for_output(output_format, quality)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
         # Get file from database (check if active)
         data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
@@ -200,30 +629,24 @@ def process_data():
             # Check if file exists but is inactive (soft-deleted)
             inactive_file = DataFile.query.filter_by(id=file_id, is_active=False).first()
             if inactive_file:
-                return jsonify({
+                return {
                     'error': f'File with ID {file_id} has been deleted',
                     'filename': inactive_file.original_filename
-                }), 404
-            return jsonify({
+                }, 404
+            return {
                 'error': f'File with ID {file_id} not found',
                 'suggestion': 'Please upload the file again or select a different file'
-            }), 404
+            }, 404
         
         if not os.path.exists(data_file.file_path):
-            return jsonify({'error': 'File not found on server'}), 404
+            return {'error': 'File not found on server'}, 404
         
-        # Process data
-        try:
-            processor = DataProcessor(data_file.file_path)
-            df, _ = processor.process()
-            # Force garbage collection after processing to free memory
-            gc.collect()
-        except Exception as e:
-            error_msg = f'Error processing data file: {str(e)}'
-            tb_str = traceback.format_exc()
-            print(f"Data processing error: {error_msg}", file=sys.stderr, flush=True)
-            print(tb_str, file=sys.stderr, flush=True)
-            return jsonify({'error': error_msg}), 500
+        baseline = None
+        if enable_comparison and baseline_id:
+            try:
+                baseline = baseline_for(data_file, baseline_id)
+            except ValueError as e:
+                return {'error': str(e)}, 400
         
         # Convert month strings to integers
         if month_filter:
@@ -232,83 +655,78 @@ def process_data():
             except (ValueError, TypeError) as e:
                 error_msg = f'Invalid month filter: {str(e)}'
                 print(f"Month filter error: {error_msg}", file=sys.stderr, flush=True)
-                return jsonify({'error': error_msg}), 400
+                return {'error': error_msg}, 400
         
-        # Generate regular plots
+        if generate_all:
+            # Limit number of plots for "generate all" to avoid timeout (Render free tier limit)
+            # Generate only 2 essential plots to stay within timeout
+            requested_types = ESSENTIAL_PLOTS
+        else:
+            # Check if any plot types were selected
+            if not plot_types or len(plot_types) == 0:
+                return {
+                    'error': 'No plot types selected. Please select at least one plot type.',
+                    'suggestion': 'Check at least one plot type checkbox before generating'
+                }, 400
+            
+            # Limit number of plots per request to avoid timeout (Render free tier has 30s timeout)
+            max_plots = 4  # Limit to 4 plots (2 plot types × 2 precip types)
+            if len(plot_types) * 2 > max_plots:
+                return {
+                    'error': f'Too many plots requested. Maximum {max_plots} plots at a time (2 plot types). Please select fewer plot types.',
+                    'requested': len(plot_types) * 2,
+                    'limit': max_plots,
+                    'suggestion': 'Try selecting 1-2 plot types at a time'
+                }, 400
+            requested_types = plot_types
+        
+        # Plots already rendered (e.g. by cache warming after upload) skip the pipeline
         plots = {}
+        plot_formats = {}  # MIME type of each encoded plot
         plot_errors = []  # Track errors for user feedback
+        source_id = plot_source_id(data_file)
+        to_render = []
+        for plot_type in requested_types:
+            for precip_type in ['rain', 'snow']:
+                key = f'{precip_type}_{plot_type}'
+                cached = plot_cache.get(source_id, plot_key(gen, plot_type, precip_type, month_filter, season_filter))
+                if cached:
+                    plots[key], plot_formats[key] = cached
+                else:
+                    to_render.append((key, plot_type, precip_type))
+        
+        df = None
+        source = Query.from_data_file(data_file, cache=dataset_cache)
+        if to_render or enable_comparison:
+            # Process data (cached per file, shared with /render_plot)
+            try:
+                df = source.execute()
+                # Force garbage collection after processing to free memory
+                gc.collect()
+            except Exception as e:
+                error_msg = f'Error processing data file: {str(e)}'
+                tb_str = traceback.format_exc()
+                print(f"Data processing error: {error_msg}", file=sys.stderr, flush=True)
+                print(tb_str, file=sys.stderr, flush=True)
+                return {'error': error_msg}, 500
+        
+        # Generate regular plots
         try:
-            if generate_all:
-                # Limit number of plots for "generate all" to avoid timeout (Render free tier limit)
-                # Generate only 2 essential plots to stay within timeout
-                plots = {}
-                essential_plots = ['annual_totals', 'monthly_climatology']  # Reduced from 3 to 2
-                for plot_type in essential_plots:
-                    for precip_type in ['rain', 'snow']:
-                        key = f'{precip_type}_{plot_type}'
-                        try:
-                            if plot_type == 'monthly_heatmap':
-                                plots[key] = plot_gen.monthly_totals_heatmap(df, precip_type, month_filter)
-                            elif plot_type == 'monthly_climatology':
-                                plots[key] = plot_gen.monthly_climatology(df, precip_type, month_filter)
-                            elif plot_type == 'seasonal_boxplot':
-                                plots[key] = plot_gen.seasonal_boxplot(df, precip_type, season_filter)
-                            elif plot_type == 'annual_totals':
-                                plots[key] = plot_gen.annual_totals(df, precip_type)
-                            elif plot_type == 'monthly_distribution':
-                                plots[key] = plot_gen.monthly_distribution_boxplot(df, precip_type, month_filter)
-                            elif plot_type == 'monthly_histogram':
-                                plots[key] = plot_gen.monthly_histogram(df, precip_type, month_filter)
-                            gc.collect()
-                        except Exception as e:
-                            plots[key] = None
-                            tb_str = traceback.format_exc()
-                            error_msg = f"Error generating {key}: {str(e)}"
-                            print(error_msg, file=sys.stderr, flush=True)
-                            print(tb_str, file=sys.stderr, flush=True)
-                            plot_errors.append(f"{key}: {str(e)}")
-            else:
-                # Check if any plot types were selected
-                if not plot_types or len(plot_types) == 0:
-                    return jsonify({
-                        'error': 'No plot types selected. Please select at least one plot type.',
-                        'suggestion': 'Check at least one plot type checkbox before generating'
-                    }), 400
-                
-                # Limit number of plots per request to avoid timeout (Render free tier has 30s timeout)
-                max_plots = 4  # Limit to 4 plots (2 plot types × 2 precip types)
-                if len(plot_types) * 2 > max_plots:
-                    return jsonify({
-                        'error': f'Too many plots requested. Maximum {max_plots} plots at a time (2 plot types). Please select fewer plot types.',
-                        'requested': len(plot_types) * 2,
-                        'limit': max_plots,
-                        'suggestion': 'Try selecting 1-2 plot types at a time'
-                    }), 400
-                for plot_type in plot_types:
-                    for precip_type in ['rain', 'snow']:
-                        key = f'{precip_type}_{plot_type}'
-                        try:
-                            if plot_type == 'monthly_heatmap':
-                                plots[key] = plot_gen.monthly_totals_heatmap(df, precip_type, month_filter)
-                            elif plot_type == 'monthly_climatology':
-                                plots[key] = plot_gen.monthly_climatology(df, precip_type, month_filter)
-                            elif plot_type == 'seasonal_boxplot':
-                                plots[key] = plot_gen.seasonal_boxplot(df, precip_type, season_filter)
-                            elif plot_type == 'annual_totals':
-                                plots[key] = plot_gen.annual_totals(df, precip_type)
-                            elif plot_type == 'monthly_distribution':
-                                plots[key] = plot_gen.monthly_distribution_boxplot(df, precip_type, month_filter)
-                            elif plot_type == 'monthly_histogram':
-                                plots[key] = plot_gen.monthly_histogram(df, precip_type, month_filter)
-                            # Force garbage collection after each plot to free memory
-                            gc.collect()
-                        except Exception as e:
-                            plots[key] = None
-                            tb_str = traceback.format_exc()
-                            error_msg = f"Error generating {key}: {str(e)}"
-                            print(error_msg, file=sys.stderr, flush=True)
-                            print(tb_str, file=sys.stderr, flush=True)
-                            plot_errors.append(f"{key}: {str(e)}")
+            for key, plot_type, precip_type in to_render:
+                try:
+                    plots[key] = render_plot(gen, data_file, df, plot_type, precip_type, month_filter, season_filter)
+                    plot_formats[key] = gen.mime_type(plot_type)
+                    plot_cache.put(source_id, plot_key(gen, plot_type, precip_type, month_filter, season_filter),
+                                   plots[key], plot_formats[key])
+                    # Force garbage collection after each plot to free memory
+                    gc.collect()
+                except Exception as e:
+                    plots[key] = None
+                    tb_str = traceback.format_exc()
+                    error_msg = f"Error generating {key}: {str(e)}"
+                    print(error_msg, file=sys.stderr, flush=True)
+                    print(tb_str, file=sys.stderr, flush=True)
+                    plot_errors.append(f"{key}: {str(e)}")
             # Force garbage collection after plot generation
             gc.collect()
         except Exception as e:
@@ -316,79 +734,68 @@ def process_data():
             tb_str = traceback.format_exc()
             print(error_msg, file=sys.stderr, flush=True)
             print(tb_str, file=sys.stderr, flush=True)
-            return jsonify({'error': error_msg}), 500
+            return {'error': error_msg}, 500
         
         # Generate comparison plots if enabled
         comparison_plots = {}
         comparison_stats = {}
         
-        if enable_comparison and op_start and op_end and clim_start and clim_end:
+        if enable_comparison and op_start and op_end and (baseline or (clim_start and clim_end)):
             try:
-                from scipy import stats
-                
                 try:
                     op_start_dt = pd.to_datetime(op_start)
                     op_end_dt = pd.to_datetime(op_end)
-                    clim_start_dt = pd.to_datetime(clim_start)
-                    clim_end_dt = pd.to_datetime(clim_end)
+                    if baseline:
+                        clim_start_dt, clim_end_dt = baseline.window_start, baseline.window_end
+                    else:
+                        clim_start_dt = pd.to_datetime(clim_start)
+                        clim_end_dt = pd.to_datetime(clim_end)
                 except Exception as e:
                     error_msg = f'Error parsing date strings: {str(e)}'
                     print(error_msg, file=sys.stderr, flush=True)
-                    return jsonify({'error': error_msg}), 400
+                    return {'error': error_msg}, 400
                 
-                # Filter data by periods
-                df_operating = df[(df['timestamp'] >= op_start_dt) & (df['timestamp'] <= op_end_dt)]
-                df_climatology = df[(df['timestamp'] >= clim_start_dt) & (df['timestamp'] <= clim_end_dt)]
+                # Filter data by periods; a stored baseline needs only the operating window
+                df_operating = source.window(op_start_dt, op_end_dt).execute()
+                if baseline:
+                    df_climatology = None
+                    clim_rows = baseline.rows_count
+                else:
+                    df_climatology = source.window(clim_start_dt, clim_end_dt).execute()
+                    clim_rows = len(df_climatology)
                 
-                if len(df_operating) > 0 and len(df_climatology) > 0:
+                if len(df_operating) > 0 and clim_rows > 0:
                     # Generate comparison plots for both rain and snow
                     for precip_type in ['rain', 'snow']:
                         try:
-                            comparison_plots[f'{precip_type}_comparison_histogram'] = plot_gen.operating_vs_climatology_histogram(
-                                df_operating, df_climatology, precip_type
+                            comparison_plots[f'{precip_type}_comparison_histogram'] = gen.operating_vs_climatology_histogram(
+                                df_operating, df_climatology, precip_type, baseline
                             )
-                            comparison_plots[f'{precip_type}_anomaly'] = plot_gen.precipitation_anomaly(
-                                df_operating, df_climatology, precip_type
+                            plot_formats[f'{precip_type}_comparison_histogram'] = gen.mime_type('comparison_histogram')
+                            comparison_plots[f'{precip_type}_anomaly'] = gen.precipitation_anomaly(
+                                df_operating, df_climatology, precip_type, baseline
                             )
+                            plot_formats[f'{precip_type}_anomaly'] = gen.mime_type('anomaly')
                             
                             # Calculate statistics
-                            col_name = 'Rain_mm' if precip_type == 'rain' else 'Snow_mm'
-                            monthly_op = df_operating.groupby(['Year', 'Month'])[col_name].sum().values
-                            monthly_clim = df_climatology.groupby(['Year', 'Month'])[col_name].sum().values
-                            
-                            # Statistical tests
-                            t_stat, t_pval = stats.ttest_ind(monthly_op, monthly_clim)
-                            u_stat, u_pval = stats.mannwhitneyu(monthly_op, monthly_clim, alternative='two-sided')
-                            ks_stat, ks_pval = stats.ks_2samp(monthly_op, monthly_clim)
-                            
-                            # Effect size (Cohen's d)
-                            pooled_std = np.sqrt((monthly_op.std()**2 + monthly_clim.std()**2) / 2)
-                            cohens_d = (monthly_op.mean() - monthly_clim.mean()) / pooled_std if pooled_std > 0 else 0
-                            
-                            comparison_stats[precip_type] = {
-                                'operating_mean': float(monthly_op.mean()),
-                                'operating_std': float(monthly_op.std()),
-                                'climatology_mean': float(monthly_clim.mean()),
-                                'climatology_std': float(monthly_clim.std()),
-                                't_test_pvalue': float(t_pval),
-                                'mannwhitney_pvalue': float(u_pval),
-                                'ks_test_pvalue': float(ks_pval),
-                                'cohens_d': float(cohens_d)
-                            }
+                            comparison_stats[precip_type] = comparison_statistics(
+                                data_file, df_operating, df_climatology,
+                                (op_start_dt, op_end_dt), (clim_start_dt, clim_end_dt), precip_type, baseline
+                            )
                         except Exception as e:
                             tb_str = traceback.format_exc()
                             print(f"Error generating comparison plots for {precip_type}: {str(e)}", file=sys.stderr, flush=True)
                             print(tb_str, file=sys.stderr, flush=True)
                 else:
-                    error_msg = f'No data in selected periods: operating={len(df_operating)}, climatology={len(df_climatology)}'
+                    error_msg = f'No data in selected periods: operating={len(df_operating)}, climatology={clim_rows}'
                     print(error_msg, file=sys.stderr, flush=True)
-                    return jsonify({'error': error_msg}), 400
+                    return {'error': error_msg}, 400
             except Exception as e:
                 error_msg = f'Error in comparison analysis: {str(e)}'
                 tb_str = traceback.format_exc()
                 print(error_msg, file=sys.stderr, flush=True)
                 print(tb_str, file=sys.stderr, flush=True)
-                return jsonify({'error': error_msg}), 500
+                return {'error': error_msg}, 500
         
         # Prepare response - filter out None values and ensure all values are serializable
         try:
@@ -401,46 +808,786 @@ def process_data():
             if len(cleaned_plots) == 0 and len(cleaned_comparison_plots) == 0 and len(failed_plots) > 0:
                 # Get first error message if available
                 first_error = plot_errors[0] if plot_errors else "Unknown error"
-                return jsonify({
+                return {
                     'error': f'All plots failed to generate. Please check your data and selections.',
                     'failed_plots': failed_plots[:5],  # Show first 5 failed plots
                     'first_error': first_error,
                     'suggestion': 'Check if your data file has the required columns (Rain_mm, Snow_mm, etc.)'
-                }), 500
+                }, 500
             
             # Check response size (estimate - base64 strings are roughly 4/3 of original size)
             total_size = sum(len(v) if isinstance(v, str) else 0 for v in list(cleaned_plots.values()) + list(cleaned_comparison_plots.values()))
             
             # If response is too large (> 5MB), return error
             if total_size > 5 * 1024 * 1024:
-                return jsonify({
+                return {
                     'error': 'Response too large. Please generate fewer plots at a time.',
                     'estimated_size_mb': round(total_size / (1024 * 1024), 2)
-                }), 413  # 413 Payload Too Large
+                }, 413  # 413 Payload Too Large
             
             response_data = {
                 'plots': cleaned_plots, 
                 'comparison_plots': cleaned_comparison_plots,
                 'comparison_stats': comparison_stats,
+                'baseline': baseline.to_dict() if baseline else None,
+                'plot_formats': {k: v for k, v in plot_formats.items()
+                                 if k in cleaned_plots or k in cleaned_comparison_plots},
+                'progressive': progressive,
                 'success': True
             }
             
             # Force garbage collection before returning response
             gc.collect()
             
-            return jsonify(response_data)
+            return response_data, 200
         except Exception as e:
             error_msg = f'Error serializing response: {str(e)}'
             tb_str = traceback.format_exc()
             print(error_msg, file=sys.stderr, flush=True)
             print(tb_str, file=sys.stderr, flush=True)
-            return jsonify({'error': error_msg}), 500
+            return {'error': error_msg}, 500
     
     except Exception as e:
         error_msg = str(e)
         tb_str = traceback.format_exc()
         print(f"Error in process_data: {error_msg}", file=sys.stderr, flush=True)
         print(tb_str, file=sys.stderr, flush=True)
+        return {'error': error_msg}, 500
+
+@app.route('/render_plot', methods=['POST'])
+def render_single_plot():
+    """Render one plot at full quality (used to replace progressive previews)"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data received'}), 400
+        
+        file_id = data.get('file_id')
+        plot_type = data.get('plot_type')
+        precip_type = data.get('precip_type', 'rain')
+        season_filter = data.get('seasons', [])
+        
+        if not file_id or not plot_type:
+            return jsonify({'error': 'file_id and plot_type are required'}), 400
+        if precip_type not in ('rain', 'snow'):
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        
+        try:
+            month_filter = [int(m) for m in data.get('months', [])]
+            gen = plot_gen.for_output(data.get('output_format', 'auto'), 'full')
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 1), request_tenant()):
+            plot = render_single(gen, data_file, data, plot_type, precip_type, month_filter, season_filter)
+        
+        return jsonify({
+            'success': True,
+            'key': f'{precip_type}_{plot_type}',
+            'plot': plot,
+            'format': gen.mime_type(plot_type)
+        })
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        tb_str = traceback.format_exc()
+        print(f"Error in render_plot: {error_msg}", file=sys.stderr, flush=True)
+        print(tb_str, file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+def render_single(gen, data_file, data, plot_type, precip_type, month_filter, season_filter):
+    """Render one plot for /render_plot (raises ValueError for invalid requests)"""
+    if plot_type not in ('comparison_histogram', 'anomaly'):
+        source_id = plot_source_id(data_file)
+        key = plot_key(gen, plot_type, precip_type, month_filter, season_filter)
+        cached = plot_cache.get(source_id, key)
+        if cached:
+            return cached[0]
+        df, _ = dataset_cache.get(data_file.file_path)
+        plot = render_plot(gen, data_file, df, plot_type, precip_type, month_filter, season_filter)
+        plot_cache.put(source_id, key, plot, gen.mime_type(plot_type))
+        return plot
+    
+    df, _ = dataset_cache.get(data_file.file_path)
+    baseline = baseline_for(data_file, data['baseline_id']) if data.get('baseline_id') else None
+    
+    try:
+        op_start_dt = pd.to_datetime(data.get('op_start'))
+        op_end_dt = pd.to_datetime(data.get('op_end'))
+        if not baseline:
+            clim_start_dt = pd.to_datetime(data.get('clim_start'))
+            clim_end_dt = pd.to_datetime(data.get('clim_end'))
+    except Exception as e:
+        raise ValueError(f'Error parsing date strings: {str(e)}')
+    df_operating = df[(df['timestamp'] >= op_start_dt) & (df['timestamp'] <= op_end_dt)]
+    df_climatology = None
+    if not baseline:
+        df_climatology = df[(df['timestamp'] >= clim_start_dt) & (df['timestamp'] <= clim_end_dt)]
+    if len(df_operating) == 0 or (df_climatology is not None and len(df_climatology) == 0):
+        raise ValueError('No data in selected periods')
+    if plot_type == 'comparison_histogram':
+        return gen.operating_vs_climatology_histogram(df_operating, df_climatology, precip_type, baseline)
+    return gen.precipitation_anomaly(df_operating, df_climatology, precip_type, baseline)
+
+@app.route('/export/<int:file_id>/<table>', methods=['GET'])
+def export_table(file_id, table):
+    """Stream a processed or aggregated table for a file as CSV or Parquet
+    
+    Tables: processed, monthly, seasonal, comparison.
+    Query parameters: format=csv|parquet, columns=a,b (processed only),
+    op_start/op_end and clim_start/clim_end or baseline_id (comparison only).
+    """
+    try:
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in exporter.EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported export format '{export_format}'. Choose one of: {', '.join(exporter.EXPORT_FORMATS)}"}), 400
+        if export_format == 'parquet' and not exporter.HAS_PYARROW:
+            return jsonify({'error': 'Parquet export is not available on this server (pyarrow is not installed)'}), 501
+        if table not in ('processed', 'monthly', 'seasonal', 'comparison'):
+            return jsonify({'error': f"Unknown table '{table}'. Choose one of: processed, monthly, seasonal, comparison"}), 404
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+            df, _ = dataset_cache.get(data_file.file_path)
+        
+            try:
+                if table == 'processed':
+                    columns = [c for c in request.args.get('columns', '').split(',') if c]
+                    result = exporter.processed_series(df, columns)
+                elif table == 'monthly':
+                    result = dataset_cache.aggregate(data_file.file_path, 'monthly', aggregates.monthly_totals)
+                elif table == 'seasonal':
+                    result = dataset_cache.aggregate(data_file.file_path, 'seasonal', aggregates.seasonal_totals)
+                else:
+                    baseline_id = request.args.get('baseline_id')
+                    period_names = ('op_start', 'op_end') if baseline_id else ('op_start', 'op_end', 'clim_start', 'clim_end')
+                    periods = [request.args.get(k) for k in period_names]
+                    if not all(periods):
+                        return jsonify({'error': 'op_start, op_end and either clim_start/clim_end or baseline_id are required for the comparison table'}), 400
+                    baseline = baseline_for(data_file, baseline_id) if baseline_id else None
+                    if baseline:
+                        op_start_dt, op_end_dt = [pd.to_datetime(p) for p in periods]
+                        clim_start_dt, clim_end_dt = baseline.window_start, baseline.window_end
+                    else:
+                        op_start_dt, op_end_dt, clim_start_dt, clim_end_dt = [pd.to_datetime(p) for p in periods]
+                    df_operating = df[(df['timestamp'] >= op_start_dt) & (df['timestamp'] <= op_end_dt)]
+                    df_climatology = None
+                    clim_rows = baseline.rows_count if baseline else None
+                    if not baseline:
+                        df_climatology = df[(df['timestamp'] >= clim_start_dt) & (df['timestamp'] <= clim_end_dt)]
+                        clim_rows = len(df_climatology)
+                    if len(df_operating) == 0 or clim_rows == 0:
+                        return jsonify({'error': f'No data in selected periods: operating={len(df_operating)}, climatology={clim_rows}'}), 400
+                    result = aggregates.comparison_table(
+                        df_operating, df_climatology,
+                        lambda precip_type: comparison_statistics(data_file, df_operating, df_climatology,
+                                                                  (op_start_dt, op_end_dt), (clim_start_dt, clim_end_dt),
+                                                                  precip_type, baseline))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        base_name = os.path.splitext(data_file.original_filename)[0]
+        download_name = secure_filename(f'{base_name}_{table}.{export_format}')
+        return Response(
+            exporter.iter_export(result, export_format, app.config['EXPORT_CHUNK_ROWS']),
+            mimetype=exporter.EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+        )
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        tb_str = traceback.format_exc()
+        print(f"Error in export: {error_msg}", file=sys.stderr, flush=True)
+        print(tb_str, file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/file_status/<int:file_id>', methods=['GET'])
+def file_status(file_id):
+    """Cache warming status of an uploaded file"""
+    data_file = DataFile.query.get(file_id)
+    if not data_file:
+        return jsonify({'error': f'File with ID {file_id} not found'}), 404
+    return jsonify({'file_id': data_file.id, 'warm_status': data_file.warm_status})
+
+def parse_year(name):
+    value = request.args.get(name)
+    return int(value) if value not in (None, '') else None
+
+def totals_file(file_id):
+    """Active DataFile with persisted totals (backfilled for older uploads), or None
+    
+    A backfill loads the dataset, so it is admitted like other dataset loads
+    and concurrent backfills of the same file are coalesced.
+    """
+    data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+    if data_file and os.path.exists(data_file.file_path) and not totals_store.has_totals(data_file.id):
+        def backfill():
+            with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+                return totals_store.ensure_totals(data_file, lambda: dataset_cache.get(data_file.file_path)[0])
+        totals_flight.do(request_key('totals_backfill', [data_file.id]), backfill)
+    return data_file
+
+@app.route('/totals/climatology', methods=['GET'])
+def totals_climatology():
+    """Monthly or seasonal climatology of one or more files from the stored totals
+    
+    Query parameters: file_ids=1,2 (or file_id), precip_type=rain|snow,
+    by=month|season, start_year, end_year.
+    """
+    try:
+        ids = request.args.get('file_ids') or request.args.get('file_id') or ''
+        precip_type = request.args.get('precip_type', 'rain')
+        if precip_type not in aggregates.PRECIP_COLUMNS:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        try:
+            file_ids = [int(i) for i in ids.split(',') if i.strip()]
+            start_year, end_year = parse_year('start_year'), parse_year('end_year')
+        except ValueError as e:
+            return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+        if not file_ids:
+            return jsonify({'error': 'file_ids is required'}), 400
+        missing = [i for i in file_ids if totals_file(i) is None]
+        if missing:
+            return jsonify({'error': f"Files not found: {', '.join(map(str, missing))}"}), 404
+        
+        rows = totals_store.climatology(file_ids, precip_type, request.args.get('by', 'month'), start_year, end_year)
+        return jsonify({'success': True, 'precip_type': precip_type, 'climatology': rows})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in totals climatology: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/totals/<int:file_id>/anomalies', methods=['GET'])
+def totals_anomalies(file_id):
+    """Monthly totals vs the monthly climatology of a file, from the stored totals
+    
+    Query parameters: precip_type, clim_start_year, clim_end_year, start_year, end_year.
+    """
+    try:
+        precip_type = request.args.get('precip_type', 'rain')
+        if precip_type not in aggregates.PRECIP_COLUMNS:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        try:
+            years = [parse_year(k) for k in ('clim_start_year', 'clim_end_year', 'start_year', 'end_year')]
+        except ValueError as e:
+            return jsonify({'error': f'Invalid year: {str(e)}'}), 400
+        if totals_file(file_id) is None:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        
+        rows = totals_store.monthly_anomalies(file_id, precip_type, *years)
+        return jsonify({'success': True, 'file_id': file_id, 'precip_type': precip_type, 'anomalies': rows})
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in totals anomalies: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/totals/<int:file_id>/daily', methods=['GET'])
+def totals_daily(file_id):
+    """Stored daily totals of a file (query parameters: precip_type, start, end)"""
+    try:
+        precip_type = request.args.get('precip_type', 'rain')
+        if precip_type not in aggregates.PRECIP_COLUMNS:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        if totals_file(file_id) is None:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        try:
+            daily = totals_store.daily_totals(file_id, precip_type, request.args.get('start'), request.args.get('end'))
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date: {str(e)}'}), 400
+        daily['date'] = daily['date'].astype(str)
+        return jsonify({'success': True, 'file_id': file_id, 'precip_type': precip_type,
+                        'daily': daily.to_dict(orient='records')})
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in totals daily: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/wind_rose/<int:file_id>', methods=['GET'])
+def wind_rose(file_id):
+    """Wind rose frequency table of a file as JSON
+    
+    Query parameters: months=1,2,12, precip_type=all|rain|snow|both,
+    sectors (default 16), speed_bins=0,10,20 (default depends on the file format).
+    """
+    try:
+        precip_type = request.args.get('precip_type', 'all')
+        if precip_type != 'all' and precip_type not in wind.PRECIP_FILTERS:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        try:
+            months = [int(m) for m in request.args.get('months', '').split(',') if m.strip()]
+            sectors = int(request.args.get('sectors', wind.DEFAULT_SECTORS))
+            speed_bins = wind.parse_speed_bins(request.args['speed_bins']) if request.args.get('speed_bins') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+            table = wind_table_for(data_file, months, precip_type, sectors, speed_bins)
+        return jsonify({'success': True, 'file_id': file_id, **table})
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in wind rose: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/event_wind/<int:file_id>', methods=['GET'])
+def event_wind_stats(file_id):
+    """Wind statistics around every rain or snow timestep of a file
+    
+    Query parameters: precip_type=rain|snow, hours_before (default 6),
+    hours_after (default 0), months=1,2,12, limit (events returned, default 500),
+    plot=1 to add a wind rose of the event-mean winds.
+    """
+    try:
+        precip_type = request.args.get('precip_type', 'rain')
+        try:
+            hours_before = float(request.args.get('hours_before', 6))
+            hours_after = float(request.args.get('hours_after', 0))
+            months = [int(m) for m in request.args.get('months', '').split(',') if m.strip()]
+            limit = max(0, int(request.args.get('limit', 500)))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        want_plot = request.args.get('plot') == '1'
+        with admission.admit(admission.estimate_cost(data_file.rows_count, int(want_plot)), request_tenant()):
+            name = request_key('event_wind', {'precip_type': precip_type, 'hours_before': hours_before,
+                                              'hours_after': hours_after, 'months': sorted(months)})
+            events = dataset_cache.aggregate(
+                data_file.file_path, name,
+                lambda df: event_wind.event_wind(df, precip_type, hours_before, hours_after, months))
+            summary = event_wind.summarize(events, data_file.file_format)
+            plot = None
+            if want_plot and summary['rose']['total']:
+                title = f'Average Wind {hours_before:g}h Before {precip_type.capitalize()}'
+                if hours_after:
+                    title = f'Average Wind {hours_before:g}h Before to {hours_after:g}h After {precip_type.capitalize()}'
+                plot = plot_gen.wind_rose(None, precip_type, table=summary['rose'], title=title)
+        
+        listed = events.head(limit).copy()
+        listed['event_time'] = listed['event_time'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        listed = listed.astype(object).where(listed.notna(), None)
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'precip_type': precip_type,
+            'hours_before': hours_before,
+            'hours_after': hours_after,
+            'months': sorted(months),
+            'summary': summary,
+            'events': listed.to_dict(orient='records'),
+            'plot': plot,
+            'format': plot_gen.mime_type('wind_rose') if plot else None
+        })
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in event wind: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/events/<int:file_id>', methods=['GET'])
+def precipitation_events(file_id):
+    """Precipitation events and dry spells of a file
+    
+    Query parameters: precip_type=rain|snow|total, min_gap_hours, threshold (mm per step),
+    start/end (e.g. the operating period), months=1,2,12, limit (events returned, default 500).
+    """
+    try:
+        precip_type = request.args.get('precip_type', 'rain')
+        if precip_type not in aggregates.PRECIP_TYPES:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        try:
+            min_gap_hours = float(request.args.get('min_gap_hours', Config.EVENT_MIN_GAP_HOURS))
+            threshold = float(request.args.get('threshold', Config.EVENT_THRESHOLD_MM))
+            months = [int(m) for m in request.args.get('months', '').split(',') if m.strip()]
+            limit = max(0, int(request.args.get('limit', 500)))
+            start = precip_events.naive_utc(request.args['start']) if request.args.get('start') else None
+            end = precip_events.naive_utc(request.args['end']) if request.args.get('end') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if min_gap_hours < 0 or threshold < 0:
+            return jsonify({'error': 'min_gap_hours and threshold must be non-negative'}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+            events = events_for(data_file, precip_type, min_gap_hours, threshold)
+        selected = precip_events.filter_events(events, start, end, months)
+        
+        # Length of the period covered by the data, for events per year
+        years = None
+        if data_file.date_range_start and data_file.date_range_end:
+            period_start = max(filter(None, [start, pd.Timestamp(data_file.date_range_start)]))
+            period_end = min(filter(None, [end, pd.Timestamp(data_file.date_range_end)]))
+            if period_end > period_start:
+                years = (period_end - period_start).days / 365.25 or None
+        
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'precip_type': precip_type,
+            'min_gap_hours': min_gap_hours,
+            'threshold': threshold,
+            'statistics': precip_events.event_statistics(selected, years),
+            'events': precip_events.events_to_records(selected.head(limit))
+        })
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in events: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/extremes/<int:file_id>', methods=['GET'])
+def precipitation_extremes(file_id):
+    """Annual maximum n-day totals and Gumbel return levels of a file
+    
+    Query parameters: precip_type=rain|snow|total, windows=1,3,7 (days),
+    return_periods=2,5,10,25,50,100 (years), min_coverage (fraction of a year
+    a year's data must cover to be used, default 0.8).
+    """
+    try:
+        precip_type = request.args.get('precip_type', 'rain')
+        if precip_type not in aggregates.PRECIP_TYPES:
+            return jsonify({'error': f"Invalid precip_type '{precip_type}'"}), 400
+        try:
+            windows_days = sorted(set(extremes.parse_list(request.args['windows']))) \
+                if request.args.get('windows') else list(extremes.DEFAULT_WINDOWS_DAYS)
+            return_periods = sorted(set(extremes.parse_list(request.args['return_periods']))) \
+                if request.args.get('return_periods') else list(extremes.DEFAULT_RETURN_PERIODS)
+            min_coverage = float(request.args.get('min_coverage', 0.8))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if any(p <= 1 for p in return_periods):
+            return jsonify({'error': 'Return periods must be longer than one year'}), 400
+        if not 0 <= min_coverage <= 1:
+            return jsonify({'error': 'min_coverage must be between 0 and 1'}), 400
+        if len(windows_days) > 10 or max(windows_days) > 366:
+            return jsonify({'error': 'Up to 10 windows of at most 366 days are supported'}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+            maxima = extremes_for(data_file, precip_type, windows_days, min_coverage)
+        report = extremes.extremes_report(maxima, return_periods)
+        return jsonify({'success': True, 'file_id': file_id, 'precip_type': precip_type, **report})
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in extremes: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/trends/<int:file_id>', methods=['GET'])
+def precipitation_trends(file_id):
+    """Mann-Kendall / Sen's slope trends of every month, season and the annual total
+    
+    Query parameters: precip_types=rain,snow (also total), alpha (default 0.05),
+    plot=0 to skip the trend heatmap, output_format for the heatmap.
+    """
+    try:
+        precip_types = [p.strip() for p in request.args.get('precip_types', 'rain,snow').split(',') if p.strip()]
+        invalid = [p for p in precip_types if p not in aggregates.PRECIP_TYPES]
+        if not precip_types or invalid:
+            return jsonify({'error': f"Invalid precip_types: {', '.join(invalid) or 'none given'}"}), 400
+        try:
+            alpha = float(request.args.get('alpha', 0.05))
+            gen = plot_gen.for_output(request.args.get('output_format', 'auto'), 'full')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 0 < alpha < 1:
+            return jsonify({'error': 'alpha must be between 0 and 1'}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        want_plot = request.args.get('plot', '1') != '0'
+        with admission.admit(admission.estimate_cost(data_file.rows_count, int(want_plot)), request_tenant()):
+            table = trends_for(data_file, precip_types, alpha)
+            plot = gen.trend_heatmap(table, alpha) if want_plot else None
+        
+        rows = table.astype(object).where(table.notna(), None).to_dict(orient='records')
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'alpha': alpha,
+            'trends': rows,
+            'plot': plot,
+            'format': gen.mime_type('trend_heatmap') if plot else None
+        })
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in trends: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/baselines', methods=['POST'])
+def create_baseline():
+    """Store a named climatology baseline of a file's window
+    
+    JSON body: file_id, start, end, name (optional). The baseline's id can be
+    passed as baseline_id to /process, /render_plot and the comparison export
+    instead of clim_start/clim_end. An existing baseline of the same window is
+    returned unchanged.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data received'}), 400
+        file_id = data.get('file_id')
+        if not file_id or not data.get('start') or not data.get('end'):
+            return jsonify({'error': 'file_id, start and end are required'}), 400
+        try:
+            start, end = pd.to_datetime(data['start']), pd.to_datetime(data['end'])
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': f'Error parsing date strings: {str(e)}'}), 400
+        
+        data_file = DataFile.query.filter_by(id=file_id, is_active=True).first()
+        if not data_file:
+            return jsonify({'error': f'File with ID {file_id} not found'}), 404
+        if not os.path.exists(data_file.file_path):
+            return jsonify({'error': 'File not found on server'}), 404
+        
+        with admission.admit(admission.estimate_cost(data_file.rows_count, 0), request_tenant()):
+            df, _ = dataset_cache.get(data_file.file_path)
+            series = uniform_series_for(data_file)
+            baseline, created = baselines.create_baseline(
+                data_file, df, start, end, data.get('name'),
+                lambda s, e: aggregates.window_monthly_totals(df, s, e, series=series))
+        
+        return jsonify({'success': True, 'created': created, 'baseline': baseline.to_dict(include_months=True)}), \
+            201 if created else 200
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error creating baseline: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/baselines', methods=['GET'])
+def list_baselines():
+    """Stored climatology baselines of a file (query parameter: file_id)"""
+    try:
+        file_id = request.args.get('file_id', type=int)
+        if not file_id:
+            return jsonify({'error': 'file_id is required'}), 400
+        return jsonify({'success': True, 'file_id': file_id,
+                        'baselines': [b.to_dict() for b in baselines.list_baselines(file_id)]})
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error listing baselines: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/baselines/<int:baseline_id>', methods=['GET'])
+def get_baseline(baseline_id):
+    """A stored baseline with its monthly means, stds, quantiles and sample counts"""
+    baseline = baselines.get_baseline(baseline_id)
+    if baseline is None:
+        return jsonify({'error': f'Baseline {baseline_id} not found'}), 404
+    return jsonify({'success': True, 'baseline': baseline.to_dict(include_months=True)})
+
+@app.route('/baselines/<int:baseline_id>', methods=['DELETE'])
+def delete_baseline(baseline_id):
+    """Delete a stored baseline"""
+    try:
+        if baselines.get_baseline(baseline_id) is None:
+            return jsonify({'error': f'Baseline {baseline_id} not found'}), 404
+        baselines.delete_baselines([baseline_id])
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'Baseline {baseline_id} deleted'})
+    except Exception as e:
+        db.session.rollback()
+        error_msg = str(e)
+        print(f"Error deleting baseline: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/process_multi', methods=['POST'])
+def process_multi():
+    """Compare several stations on their common months
+    
+    JSON body: file_ids (2 or more), precip_types (default rain and snow; also
+    total), reference_id (default: the first file), min_coverage, plots
+    (default true) and output_format. Files are loaded concurrently and
+    aligned on the months every file covers; the response holds side-by-side
+    climatologies, the aligned monthly series, correlation and bias
+    statistics against the reference file, and overlay plots.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data received'}), 400
+        try:
+            file_ids = list(dict.fromkeys(int(i) for i in data.get('file_ids') or []))
+            reference_id = int(data.get('reference_id', file_ids[0] if file_ids else 0))
+            min_coverage = float(data.get('min_coverage', Config.MULTI_STATION_MIN_COVERAGE))
+            gen = plot_gen.for_output(data.get('output_format', 'auto'), 'full')
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not 2 <= len(file_ids) <= Config.MULTI_STATION_MAX_FILES:
+            return jsonify({'error': f'Select between 2 and {Config.MULTI_STATION_MAX_FILES} different files'}), 400
+        if not 0 < min_coverage <= 1:
+            return jsonify({'error': 'min_coverage must be between 0 and 1'}), 400
+        precip_types = data.get('precip_types') or ['rain', 'snow']
+        invalid = [p for p in precip_types if p not in aggregates.PRECIP_TYPES]
+        if invalid:
+            return jsonify({'error': f"Invalid precip_types: {', '.join(map(str, invalid))}"}), 400
+        if reference_id not in file_ids:
+            return jsonify({'error': 'reference_id must be one of file_ids'}), 400
+        
+        files = {f.id: f for f in DataFile.query.filter(DataFile.id.in_(file_ids), DataFile.is_active.is_(True))}
+        missing = [i for i in file_ids if i not in files or not os.path.exists(files[i].file_path)]
+        if missing:
+            return jsonify({'error': f"File(s) not found: {', '.join(map(str, missing))}"}), 404
+        data_files = [files[i] for i in file_ids]
+        
+        want_plots = bool(data.get('plots', True))
+        n_plots = 2 * len(precip_types) if want_plots else 0
+        rows_count = sum(f.rows_count or 0 for f in data_files)
+        with admission.admit(admission.estimate_cost(rows_count, n_plots), request_tenant()):
+            tables = load_station_tables([f.file_path for f in data_files])
+            stations = [{'id': f.id, 'filename': f.original_filename, 'station': f.station,
+                         'file_format': f.file_format} for f in data_files]
+            report = multi_station.compare_stations(stations, tables, precip_types, min_coverage,
+                                                    file_ids.index(reference_id))
+            plots = {}
+            plot_formats = {}
+            if want_plots:
+                for precip_type in precip_types:
+                    for plot_type in ('station_climatology', 'station_series'):
+                        key = f'{precip_type}_{plot_type}'
+                        plots[key] = getattr(gen, plot_type)(report, precip_type)
+                        plot_formats[key] = gen.mime_type(plot_type)
+        
+        return jsonify(dict(report, success=True, plots=plots, plot_formats=plot_formats))
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in process_multi: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/storage/usage', methods=['GET'])
+def storage_usage():
+    """Disk used by uploads and derived artifacts, and the state of reclamation"""
+    try:
+        active_paths = {row.file_path for row in db.session.query(DataFile.file_path).filter(DataFile.is_active.is_(True))}
+        known_paths = {row.file_path for row in db.session.query(DataFile.file_path)}
+        uploads = {'active_bytes': 0, 'deleted_bytes': 0, 'unreferenced_bytes': 0, 'files': 0}
+        for entry in os.scandir(app.config['UPLOAD_FOLDER']):
+            if not entry.is_file() or entry.name == '.gitkeep':
+                continue
+            size = entry.stat().st_size
+            uploads['files'] += 1
+            if entry.path in active_paths:
+                uploads['active_bytes'] += size
+            elif entry.path in known_paths:
+                uploads['deleted_bytes'] += size  # Waiting for the retention period
+            else:
+                uploads['unreferenced_bytes'] += size
+        
+        return jsonify({
+            'uploads': uploads,
+            'plot_cache_bytes': plot_cache.size(),
+            'shared_datasets': shared_store.usage() if shared_store else None,
+            'coalescing_bytes': directory_size(os.path.join(Config.CACHE_FOLDER, 'single_flight')),
+            'database': {
+                'files_active': DataFile.query.filter_by(is_active=True).count(),
+                'files_deleted': DataFile.query.filter_by(is_active=False).count(),
+                'pending_reclamation': reclaimer.pending()
+            },
+            'reclamation': {
+                'enabled': app.config['RECLAIM_ENABLED'],
+                'retention_hours': app.config['RECLAIM_RETENTION_HOURS'],
+                'last_run': reclaimer.last_report
+            }
+        })
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in storage usage: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/storage/reclaim', methods=['POST'])
+def storage_reclaim():
+    """Run reclamation now and return its report"""
+    try:
+        report = reclaimer.run()
+        if report is None:
+            return jsonify({'error': 'Reclamation is already running in another worker'}), 409
+        return jsonify({'success': True, 'report': report})
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in reclamation: {error_msg}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
         return jsonify({'error': error_msg}), 500
 
 @app.route('/delete_file/<int:file_id>', methods=['DELETE'])
@@ -451,7 +1598,13 @@ def delete_file(file_id):
         if not data_file:
             return jsonify({'error': f'File with ID {file_id} not found'}), 404
         data_file.is_active = False
+        data_file.deleted_at = datetime.utcnow()
         db.session.commit()
+        process_flight.discard(file_id)
+        # Deduplicated uploads share a stored file; keep it cached while still in use
+        if not DataFile.query.filter_by(file_path=data_file.file_path, is_active=True).first():
+            dataset_cache.release(data_file.file_path)
+            plot_cache.invalidate(plot_source_id(data_file))
         return jsonify({'success': True})
     except Exception as e:
         error_msg = str(e)
@@ -461,6 +1614,7 @@ def delete_file(file_id):
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade_schema()
     print("=" * 60)
     print("Precipitation Data Analysis Web Application")
     print("=" * 60)
@@ -0,0 +1,201 @@
+"""
+Named climatology baselines persisted per file and window.
+
+A baseline stores, for each precip type and calendar month, the mean,
+standard deviation, quantiles and sample count of the monthly totals inside
+a fixed window (e.g. 2005-2019), along with the totals themselves for the
+significance tests. Comparisons and anomaly plots reference a baseline by
+id, so a request that only moves the operating period aggregates just the
+operating window. Loaded baselines are kept in a small in-process cache;
+every lookup checks the cached entry against its database row (id and
+created_at), so a baseline deleted or replaced by another worker is not
+served from a stale cache.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ClimatologyBaseline, BaselineMonth
+from aggregates import PRECIP_COLUMNS, window_monthly_totals
+
+QUANTILES = {'p10_mm': 0.1, 'p25_mm': 0.25, 'median_mm': 0.5, 'p75_mm': 0.75, 'p90_mm': 0.9}
+STAT_COLUMNS = ['samples', 'mean_mm', 'std_mm', 'min_mm'] + list(QUANTILES) + ['max_mm']
+
+# Loaded baselines kept in memory
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Baseline:
+    """A loaded baseline: per precip type, month statistics and the (year, month) totals"""
+
+    def __init__(self, record, month_rows):
+        self.id = record.id
+        self.file_id = record.file_id
+        self.name = record.name
+        self.window_start = record.window_start
+        self.window_end = record.window_end
+        self.created_at = record.created_at
+        self.rows_count = record.rows_count
+        self.months = {}
+        self._totals = {}
+        for precip_type in PRECIP_COLUMNS:
+            rows = [r for r in month_rows if r.precip_type == precip_type]
+            self.months[precip_type] = pd.DataFrame(
+                [{'month': r.month, **{c: getattr(r, c) for c in STAT_COLUMNS}} for r in rows],
+                columns=['month'] + STAT_COLUMNS).set_index('month').sort_index()
+            pairs = [(year, r.month, total) for r in rows for year, total in json.loads(r.totals or '[]')]
+            # Same Year/Month order as a groupby(['Year', 'Month']) of the window
+            pairs.sort()
+            self._totals[precip_type] = np.array([total for _, _, total in pairs], dtype=np.float64)
+
+    def monthly_means(self, precip_type='rain'):
+        """Climatological mean of each calendar month (Series indexed by month)"""
+        return self.months[precip_type]['mean_mm']
+
+    def monthly_totals(self, precip_type='rain'):
+        """Every monthly total in the window, in Year/Month order"""
+        return self._totals[precip_type]
+
+    def to_dict(self, include_months=False):
+        result = {
+            'id': self.id,
+            'file_id': self.file_id,
+            'name': self.name,
+            'start': self.window_start.isoformat(),
+            'end': self.window_end.isoformat(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'rows_count': self.rows_count,
+            'months_count': {p: int(len(t)) for p, t in self._totals.items()}
+        }
+        if include_months:
+            result['months'] = {
+                precip_type: [
+                    {'month': int(month), **{c: (None if pd.isna(v) else (int(v) if c == 'samples' else float(v)))
+                                             for c, v in row.items()}}
+                    for month, row in table.iterrows()
+                ]
+                for precip_type, table in self.months.items()
+            }
+        return result
+
+
+def month_statistics(monthly):
+    """BaselineMonth rows (without baseline_id) from a window's Year/Month totals"""
+    rows = []
+    for precip_type, col in PRECIP_COLUMNS.items():
+        for month, group in monthly[monthly[col].notna()].groupby('Month'):
+            values = group[col].to_numpy(dtype=np.float64)
+            quantiles = np.quantile(values, list(QUANTILES.values()))
+            rows.append({
+                'precip_type': precip_type,
+                'month': int(month),
+                'samples': int(len(values)),
+                'mean_mm': float(values.mean()),
+                'std_mm': float(values.std(ddof=1)) if len(values) > 1 else None,
+                'min_mm': float(values.min()),
+                **{name: float(q) for name, q in zip(QUANTILES, quantiles)},
+                'max_mm': float(values.max()),
+                'totals': json.dumps([[int(y), float(v)] for y, v in zip(group['Year'], values)])
+            })
+    return rows
+
+
+def find_baseline(file_id, start, end):
+    return ClimatologyBaseline.query.filter_by(file_id=file_id, window_start=start, window_end=end).first()
+
+
+def create_baseline(data_file, df, start, end, name=None, monthly_totals=None):
+    """Persist the baseline of a file's window; returns (Baseline, created)
+
+    monthly_totals(start, end) gives the window's Year/Month totals
+    (default: aggregates.window_monthly_totals of df's rows); pass the one
+    the operating period is compared with. A baseline already stored for the
+    same window, including one stored concurrently, is returned as is.
+    Raises ValueError for an empty or inverted window.
+    """
+    start, end = pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()
+    if start > end:
+        raise ValueError('Baseline start must not be after its end')
+    existing = find_baseline(data_file.id, start, end)
+    if existing:
+        return get_baseline(existing.id), False
+
+    df_window = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+    if len(df_window) == 0:
+        raise ValueError(f'No data between {start:%Y-%m-%d} and {end:%Y-%m-%d}')
+    record = ClimatologyBaseline(
+        file_id=data_file.id,
+        name=name or f'{start:%Y-%m-%d} to {end:%Y-%m-%d}',
+        window_start=start,
+        window_end=end,
+        rows_count=int(len(df_window))
+    )
+    if monthly_totals is None:
+        monthly = window_monthly_totals(df, start, end)
+    else:
+        monthly = monthly_totals(start, end)
+    rows = month_statistics(monthly)
+    try:
+        db.session.add(record)
+        db.session.flush()
+        db.session.execute(db.insert(BaselineMonth), [dict(row, baseline_id=record.id) for row in rows])
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored the same window first
+        db.session.rollback()
+        existing = find_baseline(data_file.id, start, end)
+        if existing is None:
+            raise
+        return get_baseline(existing.id), False
+    return get_baseline(record.id), True
+
+
+def get_baseline(baseline_id):
+    """Loaded baseline by id (cached while its row is unchanged), or None"""
+    record = db.session.get(ClimatologyBaseline, baseline_id)
+    with _cache_lock:
+        cached = _cache.pop(baseline_id, None)
+        if record is None:
+            return None
+        if cached is not None and cached.created_at == record.created_at:
+            _cache[baseline_id] = cached
+            return cached
+    month_rows = BaselineMonth.query.filter_by(baseline_id=baseline_id).all()
+    baseline = Baseline(record, month_rows)
+    with _cache_lock:
+        _cache[baseline_id] = baseline
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return baseline
+
+
+def list_baselines(file_id):
+    records = (ClimatologyBaseline.query.filter_by(file_id=file_id)
+               .order_by(ClimatologyBaseline.window_start, ClimatologyBaseline.window_end).all())
+    return [get_baseline(r.id) for r in records]
+
+
+def delete_baselines(baseline_ids):
+    """Delete baselines and their month rows (caller commits)"""
+    baseline_ids = list(baseline_ids)
+    if not baseline_ids:
+        return
+    db.session.execute(db.delete(BaselineMonth).where(BaselineMonth.baseline_id.in_(baseline_ids)))
+    db.session.execute(db.delete(ClimatologyBaseline).where(ClimatologyBaseline.id.in_(baseline_ids)))
+    with _cache_lock:
+        for baseline_id in baseline_ids:
+            _cache.pop(baseline_id, None)
+
+
+def delete_file_baselines(file_ids):
+    """Delete every baseline of the given files (caller commits)"""
+    ids = [row.id for row in db.session.query(ClimatologyBaseline.id)
+           .filter(ClimatologyBaseline.file_id.in_(list(file_ids)))]
+    delete_baselines(ids)
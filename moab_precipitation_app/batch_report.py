@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Headless batch report generator
+
+Runs DataProcessor and PlotGenerator over a directory or glob of station CSV
+files without the Flask server. Files are processed in parallel across a
+process pool; a file is skipped when its content hash and the requested plot
+set match the manifest written by a previous run.
+
+Usage:
+    python batch_report.py data/ -o reports/
+    python batch_report.py "exports/*.csv" -o reports/ --plots annual_totals,monthly_climatology
+"""
+import argparse
+import base64
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from storage import file_sha256
+
+INPUT_PATTERNS = ['*.csv', '*.csv.gz', '*.csv.zst', '*.zip']
+PLOT_TYPES = ['monthly_heatmap', 'monthly_climatology', 'seasonal_boxplot',
+              'annual_totals', 'monthly_distribution', 'monthly_histogram']
+FILE_EXTENSIONS = {'png': 'png', 'webp': 'webp', 'svg': 'svg'}
+MANIFEST_NAME = 'manifest.json'
+
+# One PlotGenerator per worker process
+_plot_gen = None
+
+
+def find_input_files(inputs):
+    """Expand directories and glob patterns into a sorted list of (possibly compressed) CSV files"""
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in INPUT_PATTERNS:
+                files.update(glob.glob(os.path.join(item, pattern)))
+        else:
+            files.update(p for p in glob.glob(item) if os.path.isfile(p))
+    return sorted(os.path.abspath(p) for p in files)
+
+
+def report_dir_for(filepath, output_dir):
+    """Report folder of an input file: its full file name plus a hash of its directory
+    
+    Keeps the reports of same-named files from different directories, and of
+    x.csv and x.csv.gz, apart.
+    """
+    filepath = os.path.abspath(filepath)
+    directory_hash = hashlib.sha1(os.path.dirname(filepath).encode()).hexdigest()[:8]
+    return os.path.join(output_dir, f'{os.path.basename(filepath)}-{directory_hash}')
+
+
+def load_manifest(report_dir):
+    try:
+        with open(os.path.join(report_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_up_to_date(manifest, content_hash, options, report_dir):
+    """A report is current if it was built from the same content with the same options"""
+    if not manifest or manifest.get('content_hash') != content_hash or manifest.get('options') != options:
+        return False
+    return all(os.path.exists(os.path.join(report_dir, name)) for name in manifest.get('images', []))
+
+
+def process_file(filepath, output_dir, options, force=False):
+    """Generate the report bundle for one file (runs in a worker process)"""
+    global _plot_gen
+    from data_processor import DataProcessor
+    from plot_generator import PlotGenerator
+    import aggregates
+
+    started = time.time()
+    report_dir = report_dir_for(filepath, output_dir)
+    summary = {'file': os.path.basename(filepath), 'path': filepath, 'report_dir': report_dir}
+
+    try:
+        content_hash = file_sha256(filepath)
+        manifest = load_manifest(report_dir)
+        if not force and is_up_to_date(manifest, content_hash, options, report_dir):
+            summary.update(manifest.get('summary', {}))
+            summary['status'] = 'skipped'
+            summary['seconds'] = round(time.time() - started, 2)
+            return summary
+
+        if _plot_gen is None:
+            _plot_gen = PlotGenerator()
+        gen = _plot_gen.for_output(options['output_format'], options['quality'])
+
+        processor = DataProcessor(filepath)
+        df, _ = processor.process()
+        if len(df) == 0:
+            raise ValueError('File contains no valid data rows')
+
+        os.makedirs(report_dir, exist_ok=True)
+        images = []
+        errors = []
+        for plot_type in options['plot_types']:
+            for precip_type in ['rain', 'snow']:
+                key = f'{precip_type}_{plot_type}'
+                try:
+                    img = gen.render(df, plot_type, precip_type)
+                    name = f'{key}.{FILE_EXTENSIONS[gen.resolve_format(plot_type)]}'
+                    with open(os.path.join(report_dir, name), 'wb') as f:
+                        f.write(base64.b64decode(img))
+                    images.append(name)
+                except Exception as e:
+                    errors.append(f'{key}: {e}')
+
+        # Aggregate tables next to the images
+        aggregates.monthly_totals(df).to_csv(os.path.join(report_dir, 'monthly_totals.csv'), index=False)
+        aggregates.seasonal_totals(df).to_csv(os.path.join(report_dir, 'seasonal_totals.csv'), index=False)
+
+        annual = df.groupby('Year')[['Rain_mm', 'Snow_mm']].sum()
+        file_summary = {
+            'format': processor.file_format,
+            'rows': int(len(df)),
+            'start': df['timestamp'].min().strftime('%Y-%m-%d'),
+            'end': df['timestamp'].max().strftime('%Y-%m-%d'),
+            'total_rain_mm': round(float(df['Rain_mm'].sum()), 2),
+            'total_snow_mm': round(float(df['Snow_mm'].sum()), 2),
+            'mean_annual_rain_mm': round(float(annual['Rain_mm'].mean()), 2),
+            'mean_annual_snow_mm': round(float(annual['Snow_mm'].mean()), 2),
+            'images': len(images),
+            'plot_errors': '; '.join(errors)
+        }
+
+        # Write the manifest last so an interrupted run is not treated as complete
+        manifest = {
+            'source': filepath,
+            'content_hash': content_hash,
+            'options': options,
+            'images': images,
+            'summary': file_summary,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        tmp_path = os.path.join(report_dir, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(report_dir, MANIFEST_NAME))
+
+        summary.update(file_summary)
+        summary['status'] = 'processed'
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        print(f"Error processing {filepath}: {e}", file=sys.stderr, flush=True)
+        print(traceback.format_exc(), file=sys.stderr, flush=True)
+
+    summary['seconds'] = round(time.time() - started, 2)
+    return summary
+
+
+def run_batch(files, output_dir, options, workers=None, force=False):
+    """Process files in parallel and return one summary row per file"""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(files), 1))) as pool:
+        futures = {pool.submit(process_file, f, output_dir, options, force): f for f in files}
+        for future in as_completed(futures):
+            summary = future.result()
+            results.append(summary)
+            print(f"[{len(results)}/{len(files)}] {summary['status']:<9} {summary['file']} ({summary['seconds']}s)", flush=True)
+    return sorted(results, key=lambda r: r['path'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate plot and table report bundles for a set of station CSV files')
+    parser.add_argument('inputs', nargs='+', help='CSV files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='Output directory for report bundles')
+    parser.add_argument('--plots', default=','.join(PLOT_TYPES),
+                        help=f"Comma-separated plot types (default: all of {', '.join(PLOT_TYPES)})")
+    parser.add_argument('--format', dest='output_format', default='png', choices=['auto', 'png', 'webp', 'svg'],
+                        help='Image format (default: png)')
+    parser.add_argument('--quality', default='full', choices=['full', 'preview'], help='Image quality tier')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Regenerate reports even if they are up to date')
+    args = parser.parse_args(argv)
+
+    plot_types = [p.strip() for p in args.plots.split(',') if p.strip()]
+    unknown = [p for p in plot_types if p not in PLOT_TYPES]
+    if unknown:
+        parser.error(f"Unknown plot types: {', '.join(unknown)}")
+
+    files = find_input_files(args.inputs)
+    if not files:
+        print('No CSV files found', file=sys.stderr)
+        return 1
+
+    options = {'plot_types': plot_types, 'output_format': args.output_format, 'quality': args.quality}
+
+    print("=" * 60)
+    print(f"Batch report: {len(files)} file(s) -> {args.output}")
+    print("=" * 60)
+    started = time.time()
+    results = run_batch(files, args.output, options, args.workers, args.force)
+
+    summary_path = os.path.join(args.output, 'summary.csv')
+    pd.DataFrame(results).to_csv(summary_path, index=False)
+
+    counts = pd.Series([r['status'] for r in results]).value_counts().to_dict()
+    print("=" * 60)
+    print(f"Done in {time.time() - started:.1f}s: " + ', '.join(f'{v} {k}' for k, v in counts.items()))
+    print(f"Summary table: {summary_path}")
+    print("=" * 60)
+    return 1 if counts.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+CSV parser benchmark
+
+Times DataProcessor with the pandas and Arrow CSV engines on synthetic
+MeteoBlue (hourly) and SynopticX (10-minute, local offsets) files of the
+requested sizes, or on given files, and checks that both engines return the
+same processed DataFrame. Reports the median read (load_data) and full
+process() time of each engine, rows per second and the Arrow speedup.
+
+Usage:
+    python benchmark_parsers.py
+    python benchmark_parsers.py --years 5,20 --repeats 5 -o parsers.json
+    python benchmark_parsers.py uploads/station.csv uploads/synoptic.csv.gz
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_processor
+from data_processor import DataProcessor
+from synthetic_data import synthetic_csv, synthetic_synopticx
+
+ENGINES = ['pandas', 'arrow']
+
+
+def time_engine(path, engine, repeats):
+    """Median read and process seconds of one engine, its processed DataFrame and the engine used"""
+    read_times, process_times = [], []
+    df = csv_engine = None
+    for _ in range(repeats):
+        processor = DataProcessor(path, engine=engine)
+        started = time.perf_counter()
+        processor.load_data()
+        read_times.append(time.perf_counter() - started)
+        processor = DataProcessor(path, engine=engine)
+        started = time.perf_counter()
+        df, _ = processor.process()
+        process_times.append(time.perf_counter() - started)
+        csv_engine = processor.csv_engine
+    return float(np.median(read_times)), float(np.median(process_times)), df, csv_engine
+
+
+def benchmark_file(path, label, repeats):
+    result = {'file': label, 'bytes': os.path.getsize(path), 'engines': {}}
+    frames = {}
+    for engine in ENGINES:
+        read_seconds, process_seconds, df, csv_engine = time_engine(path, engine, repeats)
+        frames[engine] = df
+        result['rows'] = len(df)
+        result['engines'][engine] = {
+            'read_seconds': round(read_seconds, 4),
+            'process_seconds': round(process_seconds, 4),
+            'rows_per_second': round(len(df) / read_seconds) if read_seconds > 0 else None,
+            'engine_used': csv_engine
+        }
+    try:
+        pd.testing.assert_frame_equal(frames['pandas'], frames['arrow'])
+        result['identical'] = True
+    except AssertionError as e:
+        result['identical'] = False
+        result['difference'] = str(e)[:500]
+    pandas_times, arrow_times = result['engines']['pandas'], result['engines']['arrow']
+    result['read_speedup'] = round(pandas_times['read_seconds'] / arrow_times['read_seconds'], 2)
+    result['process_speedup'] = round(pandas_times['process_seconds'] / arrow_times['process_seconds'], 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the pandas and Arrow CSV engines of DataProcessor')
+    parser.add_argument('files', nargs='*', help='Files to benchmark (default: synthetic MeteoBlue and SynopticX files)')
+    parser.add_argument('--years', default='1,10', help='Years of data per synthetic file (default: 1,10)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per engine; the median is reported')
+    parser.add_argument('-o', '--output', help='Also write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    if not data_processor.HAS_ARROW:
+        print('pyarrow is not installed; the arrow engine is unavailable (pip install pyarrow)', file=sys.stderr)
+        return 1
+    try:
+        years = [float(y) for y in args.years.split(',') if y.strip()]
+    except ValueError:
+        parser.error('--years must be a comma-separated list of numbers')
+
+    scratch_dir = tempfile.mkdtemp(prefix='precip_parsers_')
+    try:
+        files = [(os.path.abspath(f), os.path.basename(f)) for f in args.files]
+        if not files:
+            for y in years:
+                for name, generate in (('meteoblue', synthetic_csv), ('synopticx', synthetic_synopticx)):
+                    path = os.path.join(scratch_dir, f'{name}_{y:g}y.csv')
+                    with open(path, 'wb') as f:
+                        f.write(generate(y, seed=int(y * 100)))
+                    files.append((path, os.path.basename(path)))
+
+        results = []
+        print(f"{'file':<24} {'rows':>9} {'pandas s':>9} {'arrow s':>9} {'speedup':>8} {'process x':>10} identical")
+        for path, label in files:
+            result = benchmark_file(path, label, args.repeats)
+            results.append(result)
+            print(f"{label:<24} {result['rows']:>9} {result['engines']['pandas']['read_seconds']:>9.3f} "
+                  f"{result['engines']['arrow']['read_seconds']:>9.3f} {result['read_speedup']:>7.2f}x "
+                  f"{result['process_speedup']:>9.2f}x {result['identical']}", flush=True)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if args.output:
+        import pyarrow
+        report = {'cpu_count': os.cpu_count(), 'pandas': pd.__version__, 'pyarrow': pyarrow.__version__,
+                  'repeats': args.repeats, 'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if all(r['identical'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
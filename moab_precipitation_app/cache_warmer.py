@@ -0,0 +1,82 @@
+"""
+Background cache warming for newly uploaded files.
+
+Right after an upload, the processed DataFrame, its aggregate tables and the
+default plot set are built on a background thread, so the user's first
+analysis request is served from the caches instead of paying the full parse
+and render cost. Progress is recorded in DataFile.warm_status.
+"""
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db, DataFile
+
+WARM_PENDING = 'pending'
+WARM_RUNNING = 'warming'
+WARM_READY = 'ready'
+WARM_FAILED = 'failed'
+
+
+class CacheWarmer:
+    """Run warm_fn(data_file) for uploaded files on a small background pool.
+
+    Exceptions listed in `retry_on` (e.g. the server being busy) are retried
+    after their `retry_after` hint, up to `max_attempts` times.
+    """
+
+    def __init__(self, app, warm_fn, workers=1, retry_on=(), max_attempts=3):
+        self.app = app
+        self.warm_fn = warm_fn
+        self.retry_on = tuple(retry_on)
+        self.max_attempts = max_attempts
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-warmer')
+        self._queued = set()  # stored file paths with a job queued or running
+        self._lock = threading.Lock()
+
+    def enqueue(self, data_file):
+        """Mark a file as pending and schedule warming (no-op if already scheduled)"""
+        with self._lock:
+            if data_file.file_path in self._queued:
+                return False
+            self._queued.add(data_file.file_path)
+        self._set_status(data_file.file_path, WARM_PENDING)
+        self._pool.submit(self._run, data_file.id, data_file.file_path)
+        return True
+
+    def _set_status(self, file_path, status):
+        # Deduplicated uploads share a stored file and therefore its warm state
+        DataFile.query.filter_by(file_path=file_path).update({'warm_status': status})
+        db.session.commit()
+
+    def _run(self, file_id, file_path):
+        with self.app.app_context():
+            try:
+                data_file = DataFile.query.get(file_id)
+                if data_file is None or not data_file.is_active:
+                    self._set_status(file_path, None)
+                    return
+                self._set_status(file_path, WARM_RUNNING)
+                for attempt in range(1, self.max_attempts + 1):
+                    try:
+                        self.warm_fn(data_file)
+                        break
+                    except self.retry_on as e:
+                        if attempt == self.max_attempts:
+                            raise
+                        time.sleep(getattr(e, 'retry_after', 5))
+                self._set_status(file_path, WARM_READY)
+            except Exception as e:
+                print(f"Cache warming failed for file {file_id}: {e}", file=sys.stderr, flush=True)
+                print(traceback.format_exc(), file=sys.stderr, flush=True)
+                db.session.rollback()
+                self._set_status(file_path, WARM_FAILED)
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._queued.discard(file_path)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,85 @@
+"""
+Paginated, filterable listing of uploaded files.
+
+Pages are ordered newest first and use keyset pagination on
+(uploaded_at, id): the cursor holds the last row's sort key and the next
+page starts strictly after it, so every page is an index range scan on
+ix_data_file_active_uploaded_id no matter how deep into the catalog it is.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+import pandas as pd
+
+from models import db, DataFile
+
+
+def encode_cursor(data_file):
+    raw = f'{data_file.uploaded_at.isoformat()}|{data_file.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(uploaded_at, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        uploaded_at, file_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(uploaded_at), int(file_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+
+
+def parse_filters(args):
+    """Catalog filters from query parameters (raises ValueError for invalid values)
+
+    covers_start/covers_end: files whose data covers the whole range
+    format: meteoblue or synopticx; station: exact station name;
+    min_size/max_size: stored file size in bytes; q: filename substring.
+    """
+    filters = {}
+    for name in ('covers_start', 'covers_end'):
+        if args.get(name):
+            filters[name] = pd.Timestamp(args[name]).to_pydatetime()
+    for name in ('min_size', 'max_size'):
+        if args.get(name):
+            filters[name] = int(args[name])
+    for name in ('format', 'station', 'q'):
+        if args.get(name):
+            filters[name] = args[name].strip()
+    return filters
+
+
+def catalog_page(filters=None, limit=50, cursor=None):
+    """One page of active files: (files, next_cursor or None)"""
+    filters = filters or {}
+    query = DataFile.query.filter(DataFile.is_active.is_(True))
+
+    if 'covers_start' in filters:
+        query = query.filter(DataFile.date_range_start <= filters['covers_start'])
+    if 'covers_end' in filters:
+        # A file covers an end date when its last timestamp is on or after that day
+        query = query.filter(DataFile.date_range_end >= filters['covers_end'])
+    if 'format' in filters:
+        query = query.filter(DataFile.file_format == filters['format'])
+    if 'station' in filters:
+        query = query.filter(DataFile.station == filters['station'])
+    if 'min_size' in filters:
+        query = query.filter(DataFile.file_size >= filters['min_size'])
+    if 'max_size' in filters:
+        query = query.filter(DataFile.file_size <= filters['max_size'])
+    if 'q' in filters:
+        query = query.filter(DataFile.original_filename.ilike(f"%{filters['q']}%"))
+
+    if cursor:
+        uploaded_at, file_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            DataFile.uploaded_at < uploaded_at,
+            db.and_(DataFile.uploaded_at == uploaded_at, DataFile.id < file_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(DataFile.uploaded_at.desc(), DataFile.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
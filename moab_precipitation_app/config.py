@@ -1,5 +1,7 @@
 import os
 
+from data_processor import HAS_ZSTD
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
@@ -11,9 +13,83 @@ class Config:
     SQLALCHEMY_DATABASE_URI = database_url or 'sqlite:///precipitation_data.db'
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    # Connection pool sizing (PostgreSQL only; SQLite uses SQLAlchemy's defaults).
+    # Size it to the worker's thread count: each request thread holds at most one connection.
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # below typical server idle timeouts
+            'pool_pre_ping': True
+        }
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+    # Raw uploads (overridable, e.g. to give load tests a scratch folder)
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    # Derived artifacts shared between worker processes (locks, published results, ...)
+    CACHE_FOLDER = os.environ.get('CACHE_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
     
-    # Allowed file extensions
-    ALLOWED_EXTENSIONS = {'csv'}
+    # Allowed file extensions (CSV, optionally gzip/zstd compressed or in a zip archive);
+    # .zst only when the optional zstandard package is installed
+    ALLOWED_EXTENSIONS = {'csv', 'gz', 'zip'} | ({'zst'} if HAS_ZSTD else set())
+    # Limit on decompressed upload size, guards against decompression bombs
+    MAX_UNCOMPRESSED_LENGTH = 1024 * 1024 * 1024  # 1GB
+    
+    # Number of processed DataFrames kept in memory per worker
+    DATASET_CACHE_SIZE = int(os.environ.get('DATASET_CACHE_SIZE', 4))
+    # Aggregate tables memoized per cached DataFrame (least recently used are dropped)
+    AGGREGATE_CACHE_SIZE = int(os.environ.get('AGGREGATE_CACHE_SIZE', 32))
+    # Share processed columns between worker processes as memory-mapped files
+    # (SHARED_DATASET_DIR defaults to /dev/shm when available, else CACHE_FOLDER/datasets)
+    SHARED_DATASETS = os.environ.get('SHARED_DATASETS', '1') != '0'
+    SHARED_DATASET_DIR = os.environ.get('SHARED_DATASET_DIR')
+    
+    # Seconds a coalesced /process result stays visible to other worker processes
+    COALESCE_RESULT_TTL = 15
+    
+    # Admission control for /process and /render_plot (per worker process)
+    ADMISSION_MEMORY_BUDGET_MB = int(os.environ.get('ADMISSION_MEMORY_BUDGET_MB', 1024))
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 8))  # waiting requests before 503
+    ADMISSION_QUEUE_TIMEOUT = 25  # seconds; stays under typical 30s proxy timeouts
+    ADMISSION_BYTES_PER_ROW = 400  # processed DataFrame plus working copies
+    ADMISSION_CSV_BYTES_PER_ROW = 60  # raw CSV bytes per row, to estimate uploads before they are parsed
+    ADMISSION_PLOT_COST_MB = 40  # matplotlib figure and render buffers
+    
+    # Reclamation of deleted files: raw uploads and derived artifacts are removed
+    # RECLAIM_RETENTION_HOURS after deletion, checked every RECLAIM_INTERVAL_SECONDS
+    RECLAIM_ENABLED = os.environ.get('RECLAIM_ENABLED', '1') != '0'
+    RECLAIM_RETENTION_HOURS = float(os.environ.get('RECLAIM_RETENTION_HOURS', 72))
+    RECLAIM_INTERVAL_SECONDS = int(os.environ.get('RECLAIM_INTERVAL_SECONDS', 3600))
+    
+    # File catalog (/api/files and the home page file list)
+    CATALOG_PAGE_SIZE = 50
+    CATALOG_MAX_PAGE_SIZE = 500
+    
+    # Rows encoded per chunk by the streaming /export endpoints
+    EXPORT_CHUNK_ROWS = 100000
+
+    # Precipitation events: wet steps closer than this belong to the same event
+    EVENT_MIN_GAP_HOURS = float(os.environ.get('EVENT_MIN_GAP_HOURS', 6))
+    # Accumulation per timestep (mm) above which a step counts as wet
+    EVENT_THRESHOLD_MM = float(os.environ.get('EVENT_THRESHOLD_MM', 0.0))
+    
+    # Bootstrap/permutation resamples behind the comparison confidence intervals (0 disables)
+    RESAMPLE_COUNT = int(os.environ.get('RESAMPLE_COUNT', 10000))
+    # Fixed seed so repeated requests report identical intervals
+    RESAMPLE_SEED = int(os.environ.get('RESAMPLE_SEED', 42))
+    # Resamples drawn per batch; bounds memory at chunk x months values
+    RESAMPLE_CHUNK = int(os.environ.get('RESAMPLE_CHUNK', 2000))
+    
+    # Files compared by one /process_multi request
+    MULTI_STATION_MAX_FILES = int(os.environ.get('MULTI_STATION_MAX_FILES', 6))
+    # Worker processes parsing uncached files for /process_multi (0 parses on the request's threads)
+    MULTI_STATION_PROCESSES = int(os.environ.get('MULTI_STATION_PROCESSES', min(4, os.cpu_count() or 1)))
+    # Share of a month's timesteps every station needs for the month to be compared
+    MULTI_STATION_MIN_COVERAGE = float(os.environ.get('MULTI_STATION_MIN_COVERAGE', 0.8))
 
+    # Disk budget for rendered plots cached under CACHE_FOLDER/plots
+    PLOT_CACHE_MB = int(os.environ.get('PLOT_CACHE_MB', 200))
+    # Pre-render default plots and aggregates in the background after upload
+    WARM_CACHE_ON_UPLOAD = os.environ.get('WARM_CACHE_ON_UPLOAD', '1') != '0'
@@ -1,23 +1,188 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import csv
+import gzip
+import io
 import os
+import zipfile
+from uniform_series import detect_step
+
+# zstd support is optional
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+    zstandard = None
+
+# The multi-threaded Arrow CSV reader is optional (pyarrow is not a hard requirement)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+    pa = pc = pa_csv = None
+
+# CSV parser: 'arrow', 'pandas', or 'auto' (Arrow when installed, falling back to pandas if it fails)
+CSV_ENGINES = ('auto', 'arrow', 'pandas')
+DEFAULT_CSV_ENGINE = os.environ.get('CSV_ENGINE', 'auto')
+
+# Rows parsed per chunk when a time window is pushed down into the reader
+WINDOW_CHUNK_ROWS = 100000
+
+# Magic bytes of supported compression formats
+COMPRESSION_SIGNATURES = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+    b'PK\x03\x04': 'zip'
+}
+
+
+class _LimitedReader(io.RawIOBase):
+    """Read-through wrapper that fails once more than `limit` bytes have been read"""
+    
+    def __init__(self, raw, limit):
+        super().__init__()
+        self._raw = raw
+        self._limit = limit
+        self._count = 0
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        data = self._raw.read(len(b))
+        self._count += len(data)
+        if self._count > self._limit:
+            raise ValueError(f"Decompressed data exceeds the {self._limit // (1024 * 1024)} MB limit")
+        b[:len(data)] = data
+        return len(data)
+    
+    def close(self):
+        try:
+            self._raw.close()
+        finally:
+            super().close()
+
 
 class DataProcessor:
-    """Handle data cleaning and processing for multiple file formats"""
+    """Handle data cleaning and processing for multiple file formats
+    
+    `columns`, `start`/`end` and `fill_gaps` narrow what is read: only the
+    given (cleaned) columns plus the precipitation inputs are parsed, rows
+    outside [start, end] are dropped as soon as their timestamps are parsed,
+    and fill_gaps=False skips the gap filling of everything but the
+    precipitation inputs.
     
-    def __init__(self, filepath, header_row=None):
+    `engine` selects the CSV parser (see CSV_ENGINES); csv_engine records
+    the one that read the file.
+    """
+    
+    def __init__(self, filepath, header_row=None, member=None, max_uncompressed_bytes=None,
+                 columns=None, start=None, end=None, fill_gaps=True, engine=None):
         self.filepath = filepath
         self.header_row = header_row
+        self.member = member  # CSV member name when reading from a zip archive
+        self.max_uncompressed_bytes = max_uncompressed_bytes
+        self.columns = set(columns) if columns is not None else None
+        self.start = pd.Timestamp(start) if start is not None else None
+        self.end = pd.Timestamp(end) if end is not None else None
+        self.fill_gaps = fill_gaps
+        self.engine = engine or DEFAULT_CSV_ENGINE
+        if self.engine not in CSV_ENGINES:
+            raise ValueError(f"Unknown CSV engine '{self.engine}'. Choose one of: {', '.join(CSV_ENGINES)}")
+        if self.engine == 'arrow' and not HAS_ARROW:
+            raise ValueError("The arrow CSV engine requires the pyarrow package (pip install pyarrow)")
+        self.csv_engine = None  # 'arrow' or 'pandas' once the file is read
+        self.arrow_error = None  # Why the Arrow reader fell back to pandas, if it did
+        self.compression = None  # None, 'gzip', 'zstd' or 'zip'
         self.file_format = None  # 'meteoblue' or 'synopticx'
+        self.station = None  # Station or location name from the file header, if present
         self.time_granularity_minutes = 60  # Default to hourly (60 minutes)
         self.df = None
+    
+    def detect_compression(self):
+        """Detect gzip/zstd/zip compression from the file's magic bytes"""
+        with open(self.filepath, 'rb') as f:
+            head = f.read(4)
+        self.compression = None
+        for signature, compression in COMPRESSION_SIGNATURES.items():
+            if head.startswith(signature):
+                self.compression = compression
+                break
+        return self.compression
+    
+    def uncompressed_size(self):
+        """Size in bytes of the decompressed content (read from the gzip/zip/zstd headers, so
+        without decompressing), or the compressed size when the format does not record it"""
+        size = os.path.getsize(self.filepath)
+        compression = self.detect_compression()
+        try:
+            if compression == 'gzip':
+                # ISIZE trailer: length of the last member modulo 2**32
+                with open(self.filepath, 'rb') as f:
+                    f.seek(-4, os.SEEK_END)
+                    return max(int.from_bytes(f.read(4), 'little'), size)
+            if compression == 'zip':
+                with zipfile.ZipFile(self.filepath) as zf:
+                    return sum(info.file_size for info in zf.infolist())
+            if compression == 'zstd' and HAS_ZSTD:
+                with open(self.filepath, 'rb') as f:
+                    content_size = zstandard.frame_content_size(f.read(18))
+                if content_size > 0:
+                    return content_size
+        except (OSError, ValueError, zipfile.BadZipFile):
+            pass
+        return size
+    
+    def zip_members(self):
+        """CSV members of a zip archive, in name order"""
+        with zipfile.ZipFile(self.filepath) as zf:
+            members = [info for info in zf.infolist()
+                       if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                       and not os.path.basename(info.filename).startswith('.')]
+            if self.max_uncompressed_bytes and sum(m.file_size for m in members) > self.max_uncompressed_bytes:
+                raise ValueError(f"Decompressed archive exceeds the {self.max_uncompressed_bytes // (1024 * 1024)} MB limit")
+        csv_members = [m.filename for m in members if m.filename.lower().endswith('.csv')]
+        if not csv_members:
+            raise ValueError("Zip archive contains no CSV files")
+        return sorted(csv_members)
+    
+    def _open(self):
+        """Open the (decompressed) CSV content as a binary stream"""
+        if self.compression is None:
+            self.detect_compression()
+        
+        if self.compression == 'gzip':
+            stream = gzip.open(self.filepath, 'rb')
+        elif self.compression == 'zstd':
+            if not HAS_ZSTD:
+                raise ValueError("zstd compressed files require the zstandard package (pip install zstandard)")
+            raw = open(self.filepath, 'rb')
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        elif self.compression == 'zip':
+            if self.member is None:
+                self.member = self.zip_members()[0]
+            # The member stream keeps the underlying file open after the ZipFile is closed
+            with zipfile.ZipFile(self.filepath) as zf:
+                stream = zf.open(self.member)
+        else:
+            return open(self.filepath, 'rb')
+        
+        if self.max_uncompressed_bytes:
+            stream = _LimitedReader(stream, self.max_uncompressed_bytes)
+        return io.BufferedReader(stream) if isinstance(stream, io.RawIOBase) else stream
         
     def detect_file_format(self):
         """Detect if file is MeteoBlue or SynopticX format"""
-        with open(self.filepath, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        with io.TextIOWrapper(self._open(), encoding='utf-8-sig', errors='ignore') as f:
             first_lines = [f.readline().strip() for _ in range(15)]
         
+        self.station = self._header_station(first_lines)
+        
         # Check for SynopticX indicators - more comprehensive detection
         synopticx_indicators = [
             'STATION:' in line or 
@@ -48,6 +213,15 @@ class DataProcessor:
         if self.header_row is None:
             self.header_row = 9
     
+    def _header_station(self, lines):
+        """Station name from '# STATION: X' (SynopticX) or 'location,X' (MeteoBlue) header lines"""
+        for line in lines:
+            if 'STATION:' in line:
+                return line.split('STATION:', 1)[1].strip() or None
+            if line.lower().startswith('location,'):
+                return line.split(',', 1)[1].strip() or None
+        return None
+    
     def load_data(self):
         """Load CSV file (MeteoBlue or SynopticX format)"""
         # Detect file format first
@@ -58,15 +232,170 @@ class DataProcessor:
         else:
             return self._load_meteoblue()
     
+    def _keep_column(self, name):
+        """Whether a (cleaned) column is read under the column projection"""
+        if self.columns is None or name in self.columns:
+            return True
+        # Inputs of separate_precipitation() are always needed
+        return 'Precipitation' in name or 'Snowfall' in name
+    
+    def _in_window(self, timestamps):
+        mask = timestamps.notna()
+        if self.start is not None:
+            mask &= timestamps >= self.start
+        if self.end is not None:
+            mask &= timestamps <= self.end
+        return mask
+    
+    def _read_csv(self, f, parse_timestamps, **kwargs):
+        """read_csv with the timestamp column parsed and the time window applied
+        
+        With a window, rows are parsed in chunks and filtered as they are
+        read. Every chunk is read: a file in time order so far may still
+        hold earlier rows further down (e.g. appended years).
+        """
+        if self.start is None and self.end is None:
+            df = pd.read_csv(f, **kwargs)
+            df['timestamp'] = parse_timestamps(df)
+            return df
+        
+        kept = []
+        for chunk in pd.read_csv(f, chunksize=WINDOW_CHUNK_ROWS, **kwargs):
+            chunk['timestamp'] = parse_timestamps(chunk)
+            kept.append(chunk[self._in_window(chunk['timestamp'])])
+        return pd.concat(kept, ignore_index=True)
+    
+    def _header_names(self):
+        """Column names on the header row"""
+        with io.TextIOWrapper(self._open(), encoding='utf-8-sig', errors='ignore') as f:
+            for _ in range(self.header_row):
+                f.readline()
+            return next(csv.reader([f.readline()]))
+    
+    def _read_arrow(self, read):
+        """DataFrame from read(stream) with the Arrow engine, or None to read with pandas
+        
+        With engine='auto', any failure of the Arrow reader (a missing
+        dependency, ragged rows, an unexpected timestamp format) falls back
+        to pandas; with engine='arrow' it is raised.
+        """
+        if self.engine == 'pandas' or not HAS_ARROW:
+            self.csv_engine = 'pandas'
+            return None
+        try:
+            with self._open() as f:
+                table = read(f)
+        except (pa.ArrowException, ValueError, UnicodeDecodeError) as e:
+            if self.engine == 'arrow':
+                raise
+            self.arrow_error = str(e)
+            self.csv_engine = 'pandas'
+            return None
+        
+        self.csv_engine = 'arrow'
+        return table.to_pandas()
+    
+    def _arrow_window(self, table):
+        """Rows of an Arrow table with a valid timestamp inside [start, end]"""
+        timestamps = table.column('timestamp')
+        mask = pc.is_valid(timestamps)
+        if self.start is not None:
+            mask = pc.and_(mask, pc.greater_equal(timestamps, pa.scalar(self.start.to_datetime64(), pa.timestamp('us'))))
+        if self.end is not None:
+            mask = pc.and_(mask, pc.less_equal(timestamps, pa.scalar(self.end.to_datetime64(), pa.timestamp('us'))))
+        return table.filter(mask)
+    
+    def _arrow_table(self, f, options, prepare=None):
+        """Arrow table of a CSV stream; prepare(table) adds the timestamp column if the reader does not
+        
+        With a time window the file is streamed and each record batch is
+        filtered as it is read, so memory is bounded by the rows kept, as in
+        the chunked pandas read.
+        """
+        read_options, parse_options, convert_options = options
+        prepare = prepare or (lambda table: table)
+        if self.start is None and self.end is None:
+            return prepare(pa_csv.read_csv(f, read_options=read_options, parse_options=parse_options,
+                                           convert_options=convert_options))
+        reader = pa_csv.open_csv(f, read_options=read_options, parse_options=parse_options,
+                                 convert_options=convert_options)
+        kept = [self._arrow_window(prepare(pa.Table.from_batches([batch]))) for batch in reader]
+        if not kept:
+            return self._arrow_window(prepare(reader.schema.empty_table()))
+        return pa.concat_tables(kept)
+    
+    @staticmethod
+    def _arrow_options(skip_rows, include_columns, column_types=None, timestamp_parsers=None, skip_rows_after_names=0):
+        """(read, parse, convert) options of a multi-threaded Arrow CSV read"""
+        return (pa_csv.ReadOptions(skip_rows=skip_rows, skip_rows_after_names=skip_rows_after_names, use_threads=True),
+                pa_csv.ParseOptions(),
+                pa_csv.ConvertOptions(include_columns=include_columns, column_types=column_types or {},
+                                      timestamp_parsers=timestamp_parsers, strings_can_be_null=True))
+    
+    def _arrow_meteoblue(self, f):
+        """MeteoBlue table; timestamps are parsed by the reader threads"""
+        names = [c for c in self._header_names() if c == 'timestamp' or self._keep_column(self._clean_name(c))]
+        return self._arrow_table(f, self._arrow_options(
+            self.header_row, names, column_types={'timestamp': pa.timestamp('us')},
+            timestamp_parsers=['%Y%m%dT%H%M']))
+    
+    def _arrow_synopticx(self, f):
+        """SynopticX table with timestamp parsed from Date_Time (offsets such as -0600, in UTC)
+        
+        Date_Time is kept as read so both engines return the same columns;
+        its offsets are parsed in one vectorized strptime instead of per row.
+        If any value does not match that format (e.g. no seconds field), the
+        column is parsed with the pandas engine's parser instead, so both
+        engines always return the same rows.
+        """
+        names = [c for c in self._header_names()
+                 if self.columns is None or c in ('Date_Time', 'Station_ID')
+                 or self._keep_column(self.SYNOPTICX_COLUMNS.get(c, c))]
+        table = self._arrow_table(f, self._arrow_options(
+            self.header_row, names, column_types={'Date_Time': pa.string(), 'Station_ID': pa.string()},
+            skip_rows_after_names=1), self._arrow_synopticx_timestamps)
+        if table.num_rows == 0 and self.start is None and self.end is None:
+            raise ValueError("SynopticX file appears to be empty after reading")
+        return table
+    
+    def _arrow_synopticx_timestamps(self, table):
+        """SynopticX table with the timestamp column parsed from Date_Time"""
+        if 'Date_Time' not in table.column_names:
+            raise ValueError(f"Date_Time column not found after reading. Columns: {table.column_names}")
+        date_time = table.column('Date_Time')
+        timestamps = pc.strptime(date_time, format='%Y-%m-%dT%H:%M:%S%z', unit='us', error_is_null=True)
+        if timestamps.null_count > date_time.null_count:
+            parsed = self._synopticx_timestamps(date_time.to_pandas())
+            timestamps = pa.array(parsed.to_numpy(dtype='datetime64[us]'), type=pa.timestamp('us'))
+        return table.append_column('timestamp', timestamps.cast(pa.timestamp('us')))
+    
+    @staticmethod
+    def _synopticx_timestamps(values):
+        """Naive timestamps from SynopticX Date_Time strings such as 2020-09-30T02:40:00-0600"""
+        try:
+            timestamps = pd.to_datetime(values, errors='coerce', utc=True)
+            # Convert to naive datetime (remove timezone) for consistency
+            if timestamps.dt.tz is not None:
+                timestamps = timestamps.dt.tz_convert(None)
+            return timestamps
+        except Exception:
+            # Fallback: try parsing without UTC
+            return pd.to_datetime(values, errors='coerce')
+    
     def _load_meteoblue(self):
         """Load MeteoBlue CSV format"""
-        df = pd.read_csv(self.filepath, skiprows=self.header_row)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y%m%dT%H%M')
+        df = self._read_arrow(self._arrow_meteoblue)
+        if df is None:
+            with self._open() as f:
+                df = self._read_csv(
+                    f, lambda chunk: pd.to_datetime(chunk['timestamp'], format='%Y%m%dT%H%M'),
+                    skiprows=self.header_row,
+                    usecols=lambda col: col == 'timestamp' or self._keep_column(self._clean_name(col)))
         self.df = self._clean_column_names(df)
         return self.df
     
-    def _load_synopticx(self):
-        """Load SynopticX CSV format"""
+    def _read_synopticx_pandas(self):
+        """SynopticX rows read with the pandas parser"""
         # Header is on line with Date_Time (typically index 10)
         # Units row is right after header (skip it)
         # Data starts after units row
@@ -76,13 +405,19 @@ class DataProcessor:
         skip_rows_before = list(range(self.header_row))
         skip_rows_after = [self.header_row + 1]
         skip_rows = skip_rows_before + skip_rows_after
+        usecols = None
+        if self.columns is not None:
+            usecols = lambda col: (col in ('Date_Time', 'Station_ID')
+                                   or self._keep_column(self.SYNOPTICX_COLUMNS.get(col, col)))
         
         try:
             # Read CSV: skip rows before and after header, first remaining row is the header
-            df = pd.read_csv(self.filepath, skiprows=skip_rows, header=0, encoding='utf-8-sig')
+            with self._open() as f:
+                df = self._read_csv(f, lambda chunk: self._synopticx_timestamps(chunk['Date_Time']),
+                                    skiprows=skip_rows, header=0, encoding='utf-8-sig', usecols=usecols)
             
             # Validate that we got the Date_Time column
-            if df.empty:
+            if df.empty and self.start is None and self.end is None:
                 raise ValueError("SynopticX file appears to be empty after reading")
             if 'Date_Time' not in df.columns:
                 raise ValueError(f"Date_Time column not found after reading. Columns: {list(df.columns)}")
@@ -90,63 +425,71 @@ class DataProcessor:
             # Fallback: read header separately, then read data
             try:
                 # First, read just the header row
-                header_df = pd.read_csv(self.filepath, skiprows=skip_rows_before, nrows=1, encoding='utf-8-sig')
+                with self._open() as f:
+                    header_df = pd.read_csv(f, skiprows=skip_rows_before, nrows=1, encoding='utf-8-sig')
                 if 'Date_Time' not in header_df.columns:
                     raise ValueError(f"Date_Time column not found in header. Columns: {list(header_df.columns)}")
                 
                 # Now read the data, skipping header and units row
-                df = pd.read_csv(self.filepath, skiprows=skip_rows_before + skip_rows_after, 
-                                header=0, names=header_df.columns, encoding='utf-8-sig')
+                with self._open() as f:
+                    df = pd.read_csv(f, skiprows=skip_rows_before + skip_rows_after, 
+                                    header=0, names=header_df.columns, encoding='utf-8-sig', usecols=usecols)
             except Exception as e2:
                 raise ValueError(f"Error reading SynopticX file: {str(e)}. Fallback also failed: {str(e2)}")
         
+        return df
+    
+    def _load_synopticx(self):
+        """Load SynopticX CSV format"""
+        df = self._read_arrow(self._arrow_synopticx)
+        if df is None:
+            df = self._read_synopticx_pandas()
+        
         # Parse timestamp - SynopticX uses Date_Time column with format like "2020-09-30T02:40:00-0600"
         if 'Date_Time' in df.columns:
-            try:
-                df['timestamp'] = pd.to_datetime(df['Date_Time'], errors='coerce', utc=True)
-                # Convert to naive datetime (remove timezone) for consistency
-                if df['timestamp'].dt.tz is not None:
-                    df['timestamp'] = df['timestamp'].dt.tz_convert(None)
-                df = df.dropna(subset=['timestamp'])
-            except Exception as e:
-                # Fallback: try parsing without UTC
+            # The primary read has already parsed (and windowed) the timestamps
+            if 'timestamp' not in df.columns:
                 try:
-                    df['timestamp'] = pd.to_datetime(df['Date_Time'], errors='coerce')
-                    df = df.dropna(subset=['timestamp'])
-                except Exception as e2:
-                    raise ValueError(f"Could not parse Date_Time column: {str(e)}. Fallback also failed: {str(e2)}")
+                    df['timestamp'] = self._synopticx_timestamps(df['Date_Time'])
+                except Exception as e:
+                    raise ValueError(f"Could not parse Date_Time column: {str(e)}")
+                df = df[self._in_window(df['timestamp'])]
+            df = df.dropna(subset=['timestamp'])
             
-            # Detect time granularity
-            if len(df) > 1:
-                time_diff = df['timestamp'].diff().iloc[1]
-                self.time_granularity_minutes = time_diff.total_seconds() / 60
+            # Detect time granularity (robust to gaps, duplicates and unsorted rows)
+            step = detect_step(df['timestamp'])
+            if step is not None:
+                self.time_granularity_minutes = step.total_seconds() / 60
             else:
                 self.time_granularity_minutes = 60  # Default to hourly if can't determine
         else:
             raise ValueError(f"Date_Time column not found in SynopticX file. Columns: {list(df.columns)}")
         
+        if self.station is None and 'Station_ID' in df.columns and df['Station_ID'].notna().any():
+            self.station = str(df['Station_ID'].dropna().iloc[0])
+        
         # Standardize column names for SynopticX
         df = self._standardize_synopticx_columns(df)
         self.df = df
         return self.df
     
+    # Map SynopticX columns to standard names
+    SYNOPTICX_COLUMNS = {
+        'air_temp_set_1': 'Temperature_2m',
+        'relative_humidity_set_1': 'Relative_Humidity_2m',
+        'wind_speed_set_1': 'Wind_Speed_10m',
+        'wind_direction_set_1': 'Wind_Direction_10m',
+        'wind_gust_set_1': 'Wind_Gust',
+        'snow_depth_set_1': 'Snow_Depth',
+        'precip_accum_ten_minute_set_1': 'Precipitation_Total',
+        'estimated_snowfall_rate_set_1': 'Snowfall_Rate'  # Keep as rate for now
+    }
+    
     def _standardize_synopticx_columns(self, df):
         """Standardize SynopticX column names to match expected format"""
         rename_map = {}
         
-        # Map SynopticX columns to standard names
-        column_mapping = {
-            'air_temp_set_1': 'Temperature_2m',
-            'relative_humidity_set_1': 'Relative_Humidity_2m',
-            'wind_speed_set_1': 'Wind_Speed_10m',
-            'wind_direction_set_1': 'Wind_Direction_10m',
-            'wind_gust_set_1': 'Wind_Gust',
-            'snow_depth_set_1': 'Snow_Depth',
-            'precip_accum_ten_minute_set_1': 'Precipitation_Total',
-            'estimated_snowfall_rate_set_1': 'Snowfall_Rate'  # Keep as rate for now
-        }
-        
-        for old_col, new_col in column_mapping.items():
+        for old_col, new_col in self.SYNOPTICX_COLUMNS.items():
             if old_col in df.columns:
                 rename_map[old_col] = new_col
         
@@ -155,42 +498,49 @@ class DataProcessor:
         
         return df
     
+    @staticmethod
+    def _clean_name(col):
+        """Simplified name of a MeteoBlue column"""
+        new_name = col
+        if col.startswith('Moab '):
+            new_name = col.replace('Moab ', '')
+        
+        # Simplify bracketed qualifiers
+        if '[2 m elevation corrected]' in new_name:
+            new_name = new_name.replace(' [2 m elevation corrected]', '_2m')
+        elif '[850 mb]' in new_name:
+            new_name = new_name.replace(' [850 mb]', '_850mb')
+        elif '[700 mb]' in new_name:
+            new_name = new_name.replace(' [700 mb]', '_700mb')
+        elif '[10 m]' in new_name:
+            new_name = new_name.replace(' [10 m]', '_10m')
+        elif '[2 m]' in new_name:
+            new_name = new_name.replace(' [2 m]', '_2m')
+        elif '[sfc]' in new_name:
+            new_name = new_name.replace(' [sfc]', '')
+        elif '[MSL]' in new_name:
+            new_name = new_name.replace(' [MSL]', '')
+        
+        # Remove any remaining brackets
+        if '[' in new_name:
+            new_name = new_name.split('[')[0].strip()
+        
+        # Replace spaces with underscores
+        return new_name.replace(' ', '_')
+    
     def _clean_column_names(self, df):
         """Simplify column names"""
-        rename_map = {}
-        for col in df.columns:
-            new_name = col
-            if col.startswith('Moab '):
-                new_name = col.replace('Moab ', '')
-            
-            # Simplify bracketed qualifiers
-            if '[2 m elevation corrected]' in new_name:
-                new_name = new_name.replace(' [2 m elevation corrected]', '_2m')
-            elif '[850 mb]' in new_name:
-                new_name = new_name.replace(' [850 mb]', '_850mb')
-            elif '[700 mb]' in new_name:
-                new_name = new_name.replace(' [700 mb]', '_700mb')
-            elif '[10 m]' in new_name:
-                new_name = new_name.replace(' [10 m]', '_10m')
-            elif '[2 m]' in new_name:
-                new_name = new_name.replace(' [2 m]', '_2m')
-            elif '[sfc]' in new_name:
-                new_name = new_name.replace(' [sfc]', '')
-            elif '[MSL]' in new_name:
-                new_name = new_name.replace(' [MSL]', '')
-            
-            # Remove any remaining brackets
-            if '[' in new_name:
-                new_name = new_name.split('[')[0].strip()
-            
-            # Replace spaces with underscores
-            new_name = new_name.replace(' ', '_')
-            rename_map[col] = new_name
-        
-        return df.rename(columns=rename_map)
+        return df.rename(columns={col: self._clean_name(col) for col in df.columns})
     
-    def handle_missing_values(self, df):
-        """Handle missing values by variable type"""
+    def handle_missing_values(self, df, columns=None):
+        """Handle missing values by variable type (only in `columns` when given)"""
+        if columns is not None:
+            # Every variable is filled independently, so a subset can be filled on its own
+            filled = self.handle_missing_values(df[list(columns)].copy())
+            for col in columns:
+                df[col] = filled[col]
+            return df
+        
         # Define variable categories
         ACCUMULATION_VARS = ['Precipitation_Total', 'Snowfall_Amount', 'Snow_Depth']
         TEMPERATURE_VARS = ['Temperature_2m', 'Temperature_850mb', 'Temperature_700mb']
@@ -340,10 +690,44 @@ class DataProcessor:
         
         return df, precip_col
     
+    def _process_archive(self, members):
+        """Process every CSV member of a zip archive and combine them into one record"""
+        frames = []
+        precip_col = None
+        for member in members:
+            member_processor = DataProcessor(self.filepath, member=member,
+                                             max_uncompressed_bytes=self.max_uncompressed_bytes,
+                                             columns=self.columns, start=self.start, end=self.end,
+                                             fill_gaps=self.fill_gaps, engine=self.engine)
+            member_df, precip_col = member_processor.process()
+            if self.file_format is None:
+                self.file_format = member_processor.file_format
+                self.time_granularity_minutes = member_processor.time_granularity_minutes
+                self.station = member_processor.station
+            elif member_processor.file_format != self.file_format:
+                raise ValueError(f"Archive mixes {self.file_format} and {member_processor.file_format} files")
+            frames.append(member_df)
+        
+        df = pd.concat(frames, ignore_index=True)
+        # Members may overlap (e.g. yearly exports sharing a boundary timestamp)
+        df = df.sort_values('timestamp').drop_duplicates(subset='timestamp', keep='first').reset_index(drop=True)
+        self.df = df
+        return df, precip_col
+    
     def process(self):
         """Full processing pipeline"""
+        if self.detect_compression() == 'zip' and self.member is None:
+            members = self.zip_members()
+            if len(members) > 1:
+                return self._process_archive(members)
+            self.member = members[0]
+        
         df = self.load_data()
-        df = self.handle_missing_values(df)
+        if self.fill_gaps:
+            df = self.handle_missing_values(df)
+        else:
+            # Precipitation inputs are still filled since Rain_mm/Snow_mm are derived from them
+            df = self.handle_missing_values(df, [c for c in df.columns if 'Precipitation' in c or 'Snowfall' in c])
         df = self.create_time_columns(df)
         df, precip_col = self.separate_precipitation(df)
         return df, precip_col
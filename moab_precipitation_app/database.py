@@ -3,12 +3,13 @@ Database initialization script
 Run this to create the database tables
 """
 from app import app, db
-from models import DataFile
+from models import DataFile, upgrade_schema
 
 def init_db():
     """Initialize database and create tables"""
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         print("✓ Database initialized successfully!")
         print(f"✓ Database file: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
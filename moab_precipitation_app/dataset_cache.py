@@ -0,0 +1,133 @@
+"""
+In-process cache of processed DataFrames.
+
+Parsing and cleaning a CSV is the most expensive part of a request, and the
+same file is usually requested several times in a row (e.g. a preview render
+followed by lazy full-resolution renders), so processed results are kept in a
+small LRU cache keyed by file path, size and modification time. Aggregate
+tables derived from a cached DataFrame are memoized alongside it, in a
+bounded LRU per DataFrame since their names carry request parameters.
+
+With a SharedDatasetStore, cached DataFrames are read-only memory-mapped views
+of columns shared by all worker processes rather than private copies.
+"""
+import os
+import threading
+from collections import OrderedDict
+from data_processor import DataProcessor
+from shared_dataset import dataset_id
+
+
+class DatasetCache:
+    """LRU cache of (DataFrame, precip_col) results from DataProcessor.process()"""
+    
+    def __init__(self, max_entries=4, store=None, file_locks=None, max_aggregates=32):
+        self.max_entries = max_entries
+        self.max_aggregates = max_aggregates
+        self.store = store
+        self.file_locks = file_locks  # storage.FileLocks held while reading a stored file
+        self._entries = OrderedDict()
+        self._aggregates = {}  # cache key -> OrderedDict {name: table}
+        self._lock = threading.Lock()
+    
+    def _key(self, filepath):
+        st = os.stat(filepath)
+        return (os.path.abspath(filepath), st.st_mtime_ns, st.st_size)
+    
+    def get(self, filepath):
+        """Return (df, precip_col) for a file, processing it on a cache miss.
+        
+        The returned DataFrame is shared between requests and must not be
+        modified in place.
+        """
+        key = self._key(filepath)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        
+        if self.store is not None:
+            result = self.store.get_or_create(dataset_id(filepath), lambda: self._process(filepath))
+        else:
+            result = self._process(filepath)
+        self._store(key, result)
+        return result
+    
+    def contains(self, filepath):
+        """Whether a file's current contents are cached in this process"""
+        try:
+            key = self._key(filepath)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._entries
+    
+    def _process(self, filepath):
+        if self.file_locks is None:
+            return DataProcessor(filepath).process()
+        with self.file_locks.reading(filepath):
+            return DataProcessor(filepath).process()
+    
+    def put(self, filepath, result):
+        """Seed the cache with a result already processed elsewhere (e.g. at upload)"""
+        if self.store is not None:
+            result = self.store.get_or_create(dataset_id(filepath), lambda: result)
+        self._store(self._key(filepath), result)
+    
+    def _store(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._aggregates.pop(evicted, None)
+    
+    def aggregate(self, filepath, name, fn):
+        """Return fn(df) for a file, computed once per cached DataFrame.
+        
+        Like the DataFrame itself, the returned table is shared and must not
+        be modified in place.
+        """
+        df, _ = self.get(filepath)
+        key = self._key(filepath)
+        with self._lock:
+            tables = self._aggregates.get(key)
+            if tables is not None and name in tables:
+                tables.move_to_end(name)
+                return tables[name]
+        
+        table = fn(df)
+        
+        with self._lock:
+            # Only memoize while the DataFrame is still cached
+            if key in self._entries:
+                tables = self._aggregates.setdefault(key, OrderedDict())
+                tables[name] = table
+                tables.move_to_end(name)
+                while len(tables) > self.max_aggregates:
+                    tables.popitem(last=False)
+        return table
+    
+    def invalidate(self, filepath):
+        """Drop every cached entry for a file"""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+                self._aggregates.pop(key, None)
+    
+    def release(self, filepath):
+        """Drop a file from this cache and from the shared store (when no DataFile uses it anymore).
+        
+        Returns the bytes freed in the shared store.
+        """
+        freed = 0
+        if self.store is not None and os.path.exists(filepath):
+            freed = self.store.release(dataset_id(filepath))
+        self.invalidate(filepath)
+        return freed
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._aggregates.clear()
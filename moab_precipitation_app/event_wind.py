@@ -0,0 +1,131 @@
+"""
+Wind conditions around precipitation events.
+
+Vectorized version of the Wind Rose notebook's lead-window analysis
+(build_lead_wind_dataset_from). Every wet timestep of the chosen
+precipitation type is an event; its window [event - hours_before,
+event + hours_after) is located in the sorted timestamps with two
+searchsorted calls for all events at once. Window means come from
+differences of cumulative sums and window maxima/minima from one
+reduceat pass, so the cost is O(rows + events) instead of a time slice
+of the whole record per event.
+"""
+import numpy as np
+import pandas as pd
+
+import wind
+from aggregates import PRECIP_COLUMNS
+from precip_series import check_precip_type, sorted_series
+
+GUST_COLUMN = 'Wind_Gust'
+
+# Longest window either side of an event
+MAX_WINDOW_HOURS = 72
+
+
+def _window_sums(values, lo, hi):
+    """Sum and count of the finite values in each [lo, hi) window"""
+    valid = np.isfinite(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    return sums[hi] - sums[lo], counts[hi] - counts[lo]
+
+
+def _window_extreme(values, lo, hi, ufunc):
+    """np.fmax/np.fmin of each [lo, hi) window (NaN for empty windows)"""
+    if len(lo) == 0:
+        return np.empty(0)
+    # A NaN sentinel keeps index len(values) valid for windows ending at the last row
+    padded = np.append(values, np.nan)
+    bounds = np.empty(2 * len(lo), dtype=np.intp)
+    bounds[0::2] = lo
+    bounds[1::2] = hi
+    result = ufunc.reduceat(padded, bounds)[0::2]
+    result[hi <= lo] = np.nan
+    return result
+
+
+def _mean(sums, counts):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def event_wind(df, precip_type='rain', hours_before=6, hours_after=0, month_filter=None):
+    """Wind statistics in the window around every rain or snow timestep
+
+    Windows are taken from all (month-filtered) rows, dry ones included, as
+    in the notebook. Returns a DataFrame with one row per event.
+    """
+    check_precip_type(precip_type, PRECIP_COLUMNS)
+    if not wind.has_wind(df):
+        raise ValueError('File has no 10 m wind speed/direction data')
+    if hours_before < 0 or hours_after < 0 or hours_before + hours_after <= 0:
+        raise ValueError('hours_before/hours_after must be non-negative and span a window')
+    if max(hours_before, hours_after) > MAX_WINDOW_HOURS:
+        raise ValueError(f'Windows are limited to {MAX_WINDOW_HOURS} hours either side of an event')
+
+    mask = wind.filter_mask(df, month_filter)
+    times, precip, order = sorted_series(df, precip_type, mask)
+    times = times.astype(np.int64)
+
+    def column(name):
+        values = df[name].to_numpy(dtype=np.float64)[mask]
+        return values[order] if order is not None else values
+
+    speed = column(wind.SPEED_COLUMN)
+    direction = np.deg2rad(column(wind.DIRECTION_COLUMN))
+    wet = np.flatnonzero(precip > 0)
+    event_times = times[wet]
+
+    hour_ns = 3600 * 10**9
+    lo = np.searchsorted(times, event_times - int(hours_before * hour_ns), side='left')
+    hi = np.searchsorted(times, event_times + int(hours_after * hour_ns), side='left')
+
+    speed_sum, samples = _window_sums(speed, lo, hi)
+    # Vector mean direction from the summed unit vectors
+    paired = np.isfinite(direction) & np.isfinite(speed)
+    sin_sum, _ = _window_sums(np.where(paired, np.sin(direction), np.nan), lo, hi)
+    cos_sum, _ = _window_sums(np.where(paired, np.cos(direction), np.nan), lo, hi)
+    mean_direction = np.mod(np.rad2deg(np.arctan2(sin_sum, cos_sum)) + 360, 360)
+
+    events = pd.DataFrame({
+        'event_time': pd.to_datetime(event_times),
+        'precip_mm': precip[wet],
+        'samples': samples,
+        'mean_speed': _mean(speed_sum, samples),
+        'min_speed': _window_extreme(speed, lo, hi, np.fmin),
+        'max_speed': _window_extreme(speed, lo, hi, np.fmax),
+        'mean_direction': np.where(samples > 0, mean_direction, np.nan)
+    })
+    if GUST_COLUMN in df.columns:
+        gust = column(GUST_COLUMN)
+        gust_sum, gust_count = _window_sums(gust, lo, hi)
+        events['mean_gust'] = _mean(gust_sum, gust_count)
+        events['max_gust'] = _window_extreme(gust, lo, hi, np.fmax)
+    return events
+
+
+def summarize(events, file_format=None, sectors=wind.DEFAULT_SECTORS):
+    """Summary statistics and a wind rose of the event-mean winds"""
+    with_wind = events[events['samples'] > 0]
+
+    def stat(column, fn):
+        if column not in with_wind.columns or with_wind[column].isna().all():
+            return None
+        return float(fn(with_wind[column].dropna()))
+
+    return {
+        'events': int(len(events)),
+        'events_with_wind': int(len(with_wind)),
+        'mean_speed': stat('mean_speed', np.mean),
+        'median_max_speed': stat('max_speed', np.median),
+        'max_speed': stat('max_speed', np.max),
+        'min_speed': stat('min_speed', np.min),
+        'max_gust': stat('max_gust', np.max),
+        'mean_direction': (wind.vector_average_direction(with_wind['mean_direction'].to_numpy())
+                           if len(with_wind) else None),
+        'speed_unit': wind.SPEED_UNITS.get(file_format),
+        'rose': wind.rose_table(with_wind['mean_direction'].to_numpy(dtype=np.float64),
+                                with_wind['mean_speed'].to_numpy(dtype=np.float64),
+                                sectors, file_format=file_format)
+    }
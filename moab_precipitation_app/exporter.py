@@ -0,0 +1,103 @@
+"""
+Streaming CSV/Parquet export of processed and aggregated tables.
+
+Tables are serialized in row chunks and yielded as they are encoded, so the
+encoded output of a multi-million-row export is never held in memory at once.
+"""
+import io
+
+# Parquet support is optional (pyarrow is not a hard requirement)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken out between writes"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_csv(df, chunk_rows=100000):
+    """Yield a DataFrame as CSV text, one chunk of rows at a time"""
+    if len(df) == 0:
+        yield df.to_csv(index=False)
+        return
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=(start == 0), date_format='%Y-%m-%dT%H:%M:%S')
+
+
+def iter_parquet(df, chunk_rows=100000):
+    """Yield a DataFrame as Parquet bytes, one row group per chunk"""
+    if not HAS_PYARROW:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_export(df, export_format='csv', chunk_rows=100000):
+    """Streaming encoder for the requested export format"""
+    if export_format == 'csv':
+        return iter_csv(df, chunk_rows)
+    elif export_format == 'parquet':
+        if not HAS_PYARROW:
+            raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+        return iter_parquet(df, chunk_rows)
+    raise ValueError(f"Unsupported export format '{export_format}'. Choose one of: {', '.join(EXPORT_FORMATS)}")
+
+
+def processed_series(df, columns=None):
+    """Processed time series with timestamp first, optionally projected to some columns"""
+    if columns:
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        columns = ['timestamp'] + [c for c in columns if c != 'timestamp']
+    else:
+        columns = ['timestamp'] + [c for c in df.columns if c != 'timestamp']
+    return df[columns]
@@ -0,0 +1,149 @@
+"""
+Rolling n-day accumulations, annual maxima and return levels.
+
+Rolling totals over any window length come from differences of one
+cumulative sum: the window (t - length, t] of every timestep is located
+with searchsorted on the sorted timestamps, so gaps and any sampling
+interval are handled and each window length is a single O(n) pass. Annual
+maxima are reduced per calendar year with np.maximum.reduceat, and a Gumbel
+distribution is fitted by L-moments to all window lengths at once (one
+sorted matrix of years x windows).
+"""
+import numpy as np
+import pandas as pd
+
+from precip_series import sorted_series
+from uniform_series import detect_step
+
+DEFAULT_WINDOWS_DAYS = (1, 3, 7)
+DEFAULT_RETURN_PERIODS = (2, 5, 10, 25, 50, 100)
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def window_label(days):
+    return f'{days:g}d'
+
+
+def rolling_totals(times, values, window_hours):
+    """Total of every window (t - window_hours, t] ending at each timestep"""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    ns = times.astype(np.int64)
+    lo = np.searchsorted(ns, ns - int(window_hours * 3600e9), side='right')
+    return cumulative[1:] - cumulative[lo]
+
+
+def annual_maxima(df, precip_type='rain', windows_days=DEFAULT_WINDOWS_DAYS, min_coverage=0.8):
+    """Annual maximum n-day totals for each window length
+
+    Years whose timesteps cover less than `min_coverage` of the year (e.g. a
+    partial first or last year) are excluded, since their maxima are biased
+    low. Returns {'years', 'excluded_years', 'windows_days', 'maxima'
+    (windows x years array), 'times' (matching timestamps of the maxima)}.
+    """
+    times, values, _ = sorted_series(df, precip_type)
+    if len(times) == 0:
+        raise ValueError('No data')
+    step = detect_step(times) or pd.Timedelta(hours=1)
+
+    first_year = int(str(times[0].astype('datetime64[Y]')))
+    last_year = int(str(times[-1].astype('datetime64[Y]')))
+    year_starts = np.arange(first_year, last_year + 2).astype(str).astype('datetime64[Y]').astype('datetime64[ns]')
+    bounds = np.searchsorted(times, year_starts)
+    counts = np.diff(bounds)
+    days_in_year = np.diff(year_starts).astype('timedelta64[D]').astype(np.float64)
+    coverage = counts / (days_in_year * 86400 / step.total_seconds())
+    keep = (counts > 0) & (coverage >= min_coverage)
+    years = np.arange(first_year, last_year + 1)
+
+    maxima = np.empty((len(windows_days), int(keep.sum())))
+    max_times = np.empty(maxima.shape, dtype='datetime64[ns]')
+    for i, days in enumerate(windows_days):
+        totals = rolling_totals(times, values, days * 24)
+        # Empty years give meaningless segments here and are dropped by `keep`
+        year_max = np.maximum.reduceat(totals, bounds[:-1])
+        # Timestamp of each maximum: first step per year that equals the year's maximum
+        hits = np.flatnonzero(totals == np.repeat(year_max, counts))
+        hit_years, first = np.unique(np.searchsorted(bounds, hits, side='right') - 1, return_index=True)
+        at = np.empty(len(year_max), dtype=np.intp)
+        at[hit_years] = hits[first]
+        maxima[i] = year_max[keep]
+        max_times[i] = times[at[keep]]
+    return {
+        'years': years[keep].tolist(),
+        'excluded_years': years[(counts > 0) & ~keep].tolist(),
+        'coverage': dict(zip(years[counts > 0].tolist(), np.round(coverage[counts > 0], 3).tolist())),
+        'windows_days': list(windows_days),
+        'maxima': maxima,
+        'times': max_times
+    }
+
+
+def fit_gumbel(maxima):
+    """Gumbel location and scale of each row of annual maxima, by L-moments
+
+    `maxima` is windows x years; all rows are fitted in one batch.
+    """
+    maxima = np.atleast_2d(np.asarray(maxima, dtype=np.float64))
+    n = maxima.shape[1]
+    if n < 2:
+        raise ValueError('At least two complete years are needed to fit return levels')
+    ordered = np.sort(maxima, axis=1)
+    weights = np.arange(n) / (n - 1)
+    b0 = ordered.mean(axis=1)
+    b1 = (ordered * weights).mean(axis=1)
+    scale = (2 * b1 - b0) / np.log(2)
+    location = b0 - EULER_GAMMA * scale
+    return location, scale
+
+
+def return_levels(location, scale, return_periods=DEFAULT_RETURN_PERIODS):
+    """Return level of every (window, return period): windows x periods array"""
+    periods = np.asarray(return_periods, dtype=np.float64)
+    reduced = -np.log(-np.log(1 - 1 / periods))
+    return location[:, None] + scale[:, None] * reduced[None, :]
+
+
+def plotting_positions(n):
+    """Empirical return periods of the sorted (descending) annual maxima (Gringorten)"""
+    ranks = np.arange(1, n + 1)
+    return (n + 0.12) / (ranks - 0.44)
+
+
+def parse_list(value, cast=float):
+    """Positive values from '1,3,7' (raises ValueError)"""
+    values = [cast(v) for v in str(value).split(',') if v.strip()]
+    if not values or any(v <= 0 for v in values):
+        raise ValueError(f"Expected a comma-separated list of positive numbers, got '{value}'")
+    return values
+
+
+def extremes_report(maxima_table, return_periods=DEFAULT_RETURN_PERIODS):
+    """JSON-ready annual maxima and fitted return levels per window length"""
+    years = maxima_table['years']
+    report = {
+        'years': years,
+        'excluded_years': maxima_table['excluded_years'],
+        'coverage': maxima_table['coverage'],
+        'return_periods': list(return_periods),
+        'windows': {}
+    }
+    fitted = len(years) >= 2
+    if fitted:
+        location, scale = fit_gumbel(maxima_table['maxima'])
+        levels = return_levels(location, scale, return_periods)
+    else:
+        report['warning'] = 'At least two complete years are needed to fit return levels'
+    for i, days in enumerate(maxima_table['windows_days']):
+        window = {
+            'days': days,
+            'annual_maxima': [
+                {'year': year, 'total_mm': float(value), 'time': pd.Timestamp(at).isoformat()}
+                for year, value, at in zip(years, maxima_table['maxima'][i], maxima_table['times'][i])
+            ]
+        }
+        if fitted:
+            window['gumbel'] = {'location': float(location[i]), 'scale': float(scale[i])}
+            window['return_levels'] = {f'{period:g}': float(level) for period, level in zip(return_periods, levels[i])}
+        report['windows'][window_label(days)] = window
+    return report
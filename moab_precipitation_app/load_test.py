@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness
+
+Starts the app (one or more worker processes on consecutive ports) against a
+scratch database, upload folder and cache, uploads synthetic MeteoBlue
+datasets of the requested sizes, then replays a mixed workload of /upload,
+/process (random plot types, month/season filters and comparison windows)
+and /delete_file from concurrent clients. The JSON report holds p50/p95/p99
+latency, throughput and error rate per endpoint, and the peak RSS of every
+worker process and its children sampled from /proc, so runs before and after
+a change can be compared.
+
+Usage:
+    python load_test.py --concurrency 12 --duration 60 -o report.json
+    python load_test.py --workers 2 --sizes 1,5,20 --mix upload=1,process=8,delete=1
+    python load_test.py --url http://localhost:5000 --requests 200
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from synthetic_data import FIRST_YEAR, synthetic_csv
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+OPERATIONS = ['upload', 'process', 'delete']
+DEFAULT_MIX = 'upload=1,process=8,delete=1'
+PLOT_TYPES = ['monthly_heatmap', 'monthly_climatology', 'monthly_distribution', 'monthly_histogram',
+              'seasonal_boxplot', 'annual_totals', 'wind_rose', 'event_frequency', 'event_scatter',
+              'dry_spells', 'return_levels']
+SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
+# Plot types only requested for datasets with at least two years (return levels fit annual
+# maxima; the event plots compare events across years), so they do not count as server errors
+MULTI_YEAR_PLOTS = {'return_levels', 'event_frequency', 'event_scatter', 'dry_spells'}
+
+# Seconds to wait for a worker to answer after it is started
+STARTUP_TIMEOUT = 120
+# Seconds between /proc memory samples
+RSS_SAMPLE_INTERVAL = 0.2
+
+
+def multipart_body(field, filename, content):
+    """(body, content type) of a multipart/form-data request with one file"""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def call(base_url, method, path, payload=None, body=None, content_type=None, timeout=120):
+    """(status, JSON payload or None, seconds) of one request; connection errors give status 0"""
+    headers = {}
+    if payload is not None:
+        body = json.dumps(payload).encode()
+        content_type = 'application/json'
+    if content_type:
+        headers['Content-Type'] = content_type
+    req = urllib.request.Request(base_url + path, data=body, method=method, headers=headers)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, raw = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    except (urllib.error.URLError, OSError) as e:
+        return 0, {'error': str(e)}, time.perf_counter() - started
+    elapsed = time.perf_counter() - started
+    try:
+        return status, json.loads(raw), elapsed
+    except ValueError:
+        return status, None, elapsed
+
+
+# Worker processes
+
+def start_workers(count, port, scratch_dir, log_dir):
+    """Start `count` app processes sharing one scratch database, upload folder and cache"""
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(scratch_dir, 'loadtest.db')}",
+               UPLOAD_FOLDER=os.path.join(scratch_dir, 'uploads'),
+               CACHE_FOLDER=os.path.join(scratch_dir, 'cache'),
+               SHARED_DATASET_DIR=os.path.join(scratch_dir, 'datasets'),
+               PYTHONUNBUFFERED='1')
+    workers = []
+    try:
+        # One at a time, so only one process creates the database tables
+        for i in range(count):
+            log = open(os.path.join(log_dir, f'worker_{i}.log'), 'w')
+            process = subprocess.Popen([sys.executable, 'app.py'], cwd=APP_DIR, env=dict(env, PORT=str(port + i)),
+                                       stdout=log, stderr=subprocess.STDOUT)
+            worker = {'process': process, 'url': f'http://127.0.0.1:{port + i}', 'log': log}
+            workers.append(worker)
+            wait_until_ready(worker)
+    except Exception:
+        stop_workers(workers)
+        raise
+    return workers
+
+
+def wait_until_ready(worker):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if worker['process'].poll() is not None:
+            raise RuntimeError(f"Worker on {worker['url']} exited with code {worker['process'].returncode} "
+                               f"(see {worker['log'].name})")
+        status, _, _ = call(worker['url'], 'GET', '/api/files?limit=1', timeout=5)
+        if status == 200:
+            return
+        time.sleep(0.5)
+    raise RuntimeError(f"Worker on {worker['url']} did not start within {STARTUP_TIMEOUT}s")
+
+
+def stop_workers(workers):
+    for worker in workers:
+        worker['process'].terminate()
+    for worker in workers:
+        try:
+            worker['process'].wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker['process'].kill()
+            worker['process'].wait()
+        worker['log'].close()
+
+
+def read_status_kb(pid, field):
+    """A memory field of /proc/<pid>/status in kB, or None once the process is gone"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def child_pids(pid):
+    """Direct children of a process (from /proc/<pid>/task/*/children)"""
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+class MemorySampler:
+    """Samples the resident memory of worker processes and their descendants"""
+
+    def __init__(self, pids, interval=RSS_SAMPLE_INTERVAL):
+        self.pids = pids
+        self.interval = interval
+        self.peak_kb = {pid: 0 for pid in pids}  # VmHWM of the worker itself
+        self.peak_tree_kb = {pid: 0 for pid in pids}  # Largest sampled RSS of worker plus children
+        self.peak_children = {pid: 0 for pid in pids}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        for pid in self.pids:
+            self.peak_kb[pid] = max(self.peak_kb[pid], read_status_kb(pid, 'VmHWM') or 0)
+            tree, pending = [], [pid]
+            while pending:
+                current = pending.pop()
+                tree.append(current)
+                pending.extend(child_pids(current))
+            total = sum(read_status_kb(p, 'VmRSS') or 0 for p in tree)
+            self.peak_tree_kb[pid] = max(self.peak_tree_kb[pid], total)
+            self.peak_children[pid] = max(self.peak_children[pid], len(tree) - 1)
+
+    def report(self, workers):
+        return [{
+            'pid': w['process'].pid,
+            'url': w['url'],
+            'peak_rss_mb': round(self.peak_kb[w['process'].pid] / 1024, 1),
+            'peak_rss_with_children_mb': round(self.peak_tree_kb[w['process'].pid] / 1024, 1),
+            'max_child_processes': self.peak_children[w['process'].pid]
+        } for w in workers]
+
+
+# Workload
+
+class Workload:
+    """Random mix of operations over the files uploaded by the harness"""
+
+    def __init__(self, urls, sizes, mix, seed, comparison_share=0.3):
+        self.urls = urls
+        self.sizes = sizes
+        self.mix = mix
+        self.comparison_share = comparison_share
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.files = {}  # file_id -> years of data
+        self.deletable = []  # Files uploaded during the run
+        self.next_seed = seed * 1000
+        self.calls = 0
+
+    def _pick(self, fn):
+        with self.lock:
+            return fn(self.rng)
+
+    def url(self):
+        with self.lock:
+            self.calls += 1
+            return self.urls[self.calls % len(self.urls)]
+
+    def upload(self, deletable=True):
+        with self.lock:
+            self.next_seed += 1
+            seed = self.next_seed
+            years = self.rng.choice(self.sizes)
+        body, content_type = multipart_body('file', f'loadtest_{seed}_{years}y.csv', synthetic_csv(years, seed))
+        status, payload, elapsed = call(self.url(), 'POST', '/upload', body=body, content_type=content_type)
+        if status == 200 and payload and payload.get('file_id'):
+            with self.lock:
+                self.files[payload['file_id']] = years
+                if deletable:
+                    self.deletable.append(payload['file_id'])
+        return status, payload, elapsed
+
+    def process_params(self):
+        """Random /process request over a random dataset"""
+        def build(rng):
+            file_id = rng.choice(list(self.files))
+            years = self.files[file_id]
+            plot_types = [p for p in PLOT_TYPES if years >= 2 or p not in MULTI_YEAR_PLOTS]
+            params = {'file_id': file_id, 'plot_types': rng.sample(plot_types, rng.choice([1, 2])),
+                      'months': [], 'seasons': []}
+            roll = rng.random()
+            if roll < 0.3:
+                params['months'] = [str(m) for m in sorted(rng.sample(range(1, 13), rng.randint(1, 6)))]
+            elif roll < 0.5:
+                params['seasons'] = [rng.choice(SEASONS)]
+            last_year = FIRST_YEAR + max(int(years), 1) - 1
+            if rng.random() < self.comparison_share and last_year > FIRST_YEAR:
+                op_years = rng.randint(1, max((last_year - FIRST_YEAR) // 2, 1))
+                params.update(enable_comparison=True,
+                              op_start=f'{last_year - op_years + 1}-01-01', op_end=f'{last_year}-12-31',
+                              clim_start=f'{FIRST_YEAR}-01-01', clim_end=f'{last_year - op_years}-12-31')
+            return params
+        return self._pick(build)
+
+    def process(self):
+        with self.lock:
+            if not self.files:
+                return None
+        return call(self.url(), 'POST', '/process', payload=self.process_params())
+
+    def delete(self):
+        with self.lock:
+            if not self.deletable:
+                return None
+            file_id = self.deletable.pop(self.rng.randrange(len(self.deletable)))
+            del self.files[file_id]
+        return call(self.url(), 'DELETE', f'/delete_file/{file_id}')
+
+    def choose(self):
+        return self._pick(lambda rng: rng.choices(OPERATIONS, weights=[self.mix[op] for op in OPERATIONS])[0])
+
+    def run_one(self):
+        """(operation, status, payload, seconds) of one random operation"""
+        operation = self.choose()
+        result = getattr(self, operation)()
+        if result is None:
+            # Nothing to delete (or process) yet
+            operation, result = 'upload', self.upload()
+        return (operation,) + result
+
+
+def run_clients(workload, concurrency, duration=None, total_requests=None):
+    """Run the workload from `concurrency` threads; returns the samples and the wall time"""
+    samples = []
+    samples_lock = threading.Lock()
+    remaining = [total_requests]
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def take_request():
+        with samples_lock:
+            if remaining[0] is None:
+                return True
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def client():
+        while (deadline is None or time.perf_counter() < deadline) and take_request():
+            offset = time.perf_counter() - started
+            operation, status, payload, elapsed = workload.run_one()
+            error = payload.get('error') if isinstance(payload, dict) and status != 200 else None
+            with samples_lock:
+                samples.append({'operation': operation, 'status': status, 'seconds': elapsed,
+                                'offset': offset, 'error': error})
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='client') as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+def latency_stats(samples, wall_seconds):
+    seconds = np.array([s['seconds'] for s in samples], dtype=np.float64)
+    errors = sum(1 for s in samples if s['status'] != 200)
+    stats = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else None,
+        'rejected_503': sum(1 for s in samples if s['status'] == 503),
+        'throughput_rps': round(len(samples) / wall_seconds, 3) if wall_seconds > 0 else None,
+        'latency_ms': None
+    }
+    if len(seconds):
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+        stats['latency_ms'] = {'mean': round(seconds.mean() * 1000, 1), 'p50': round(p50, 1),
+                               'p95': round(p95, 1), 'p99': round(p99, 1), 'max': round(seconds.max() * 1000, 1)}
+    return stats
+
+
+def build_report(config, samples, wall_seconds, setup, memory):
+    status_codes = {}
+    error_messages = {}
+    for s in samples:
+        status_codes[str(s['status'])] = status_codes.get(str(s['status']), 0) + 1
+        if s['error']:
+            key = f"{s['operation']} {s['status']}: {s['error'][:200]}"
+            error_messages[key] = error_messages.get(key, 0) + 1
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'config': config,
+        'setup': setup,
+        'wall_seconds': round(wall_seconds, 3),
+        'overall': latency_stats(samples, wall_seconds),
+        'endpoints': {op: latency_stats([s for s in samples if s['operation'] == op], wall_seconds)
+                      for op in OPERATIONS if any(s['operation'] == op for s in samples)},
+        'status_codes': status_codes,
+        'errors': [{'error': key, 'count': count}
+                   for key, count in sorted(error_messages.items(), key=lambda item: -item[1])[:20]],
+        'workers': memory
+    }
+
+
+def parse_mix(text):
+    mix = {op: 0.0 for op in OPERATIONS}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in mix:
+            raise ValueError(f"Unknown operation '{name.strip()}'. Choose from: {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight)
+    if sum(mix.values()) <= 0 or min(mix.values()) < 0:
+        raise ValueError('Operation weights must be non-negative and not all zero')
+    return mix
+
+
+def print_summary(report, out=sys.stderr):
+    print("=" * 60, file=out)
+    print(f"{'endpoint':<10} {'requests':>8} {'errors':>7} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=out)
+    for name, stats in list(report['endpoints'].items()) + [('overall', report['overall'])]:
+        latency = stats['latency_ms'] or {}
+        print(f"{name:<10} {stats['requests']:>8} {stats['errors']:>7} {stats['throughput_rps'] or 0:>7.2f} "
+              f"{latency.get('p50', 0):>9.1f} {latency.get('p95', 0):>9.1f} {latency.get('p99', 0):>9.1f}", file=out)
+    for worker in report['workers'] or []:
+        print(f"worker {worker['pid']} ({worker['url']}): peak RSS {worker['peak_rss_mb']} MB, "
+              f"{worker['peak_rss_with_children_mb']} MB with child processes", file=out)
+    for entry in report['errors'][:5]:
+        print(f"  {entry['count']} x {entry['error']}", file=out)
+    print("=" * 60, file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a concurrent mixed workload against the app and report '
+                                                 'latency percentiles, throughput, errors and peak memory')
+    parser.add_argument('--url', help='Test a running server instead of starting workers (no memory figures)')
+    parser.add_argument('--workers', type=int, default=1, help='App processes to start on consecutive ports')
+    parser.add_argument('--port', type=int, default=5100, help='Port of the first started worker (default: 5100)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Seconds to run (default: 60, or no limit with --requests)')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests instead')
+    parser.add_argument('--sizes', default='1,5,15', help='Years of hourly data per synthetic dataset (default: 1,5,15)')
+    parser.add_argument('--datasets', type=int, default=3, help='Datasets uploaded before the run (default: 3)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--comparison-share', type=float, default=0.3,
+                        help='Share of /process requests with comparison windows (default: 0.3)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the workload and datasets')
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file (default: stdout)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory (database, uploads, logs)')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+        sizes = [float(s) for s in args.sizes.split(',') if s.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    if not sizes or min(sizes) <= 0:
+        parser.error('Dataset sizes must be positive numbers of years')
+    if args.concurrency < 1 or args.workers < 1:
+        parser.error('--concurrency and --workers must be at least 1')
+    if args.duration is None and args.requests is None:
+        args.duration = 60
+
+    config = {'url': args.url, 'workers': None if args.url else args.workers, 'concurrency': args.concurrency,
+              'duration': args.duration, 'requests': args.requests, 'sizes_years': sizes,
+              'datasets': args.datasets, 'mix': mix, 'comparison_share': args.comparison_share, 'seed': args.seed}
+    scratch_dir = tempfile.mkdtemp(prefix='precip_loadtest_')
+    workers = []
+    try:
+        if args.url:
+            urls = [args.url.rstrip('/')]
+        else:
+            print(f"Starting {args.workers} worker(s) in {scratch_dir} ...", file=sys.stderr, flush=True)
+            workers = start_workers(args.workers, args.port, scratch_dir, scratch_dir)
+            urls = [w['url'] for w in workers]
+
+        workload = Workload(urls, sizes, mix, args.seed, args.comparison_share)
+        setup_started = time.perf_counter()
+        for _ in range(args.datasets):
+            status, payload, _ = workload.upload(deletable=False)
+            if status != 200:
+                raise RuntimeError(f"Setup upload failed ({status}): {(payload or {}).get('error')}")
+        setup = {'datasets': dict(sorted(workload.files.items())),
+                 'seconds': round(time.perf_counter() - setup_started, 3)}
+
+        print(f"Running {args.concurrency} clients ...", file=sys.stderr, flush=True)
+        if workers:
+            with MemorySampler([w['process'].pid for w in workers]) as sampler:
+                samples, wall_seconds = run_clients(workload, args.concurrency, args.duration, args.requests)
+            memory = sampler.report(workers)
+        else:
+            samples, wall_seconds = run_clients(workload, args.concurrency, args.duration, args.requests)
+            memory = None
+    except RuntimeError as e:
+        print(f"Load test failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        stop_workers(workers)
+        if args.keep:
+            print(f"Scratch directory kept: {scratch_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    report = build_report(config, samples, wall_seconds, setup, memory)
+    print_summary(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 1 if report['overall']['requests'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
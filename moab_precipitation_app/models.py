@@ -9,12 +9,161 @@ class DataFile(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     original_filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     rows_count = db.Column(db.Integer)
     date_range_start = db.Column(db.DateTime)
     date_range_end = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
+    # Set by /delete_file; stored data is reclaimed once the retention period has passed
+    deleted_at = db.Column(db.DateTime, index=True)
+    # SHA-256 of the uploaded content; rows with the same hash share one stored file
+    content_hash = db.Column(db.String(64), index=True)
+    # Background cache warming after upload: pending, warming, ready or failed
+    warm_status = db.Column(db.String(16))
+    # Catalog metadata used by the /api/files filters
+    file_format = db.Column(db.String(16), index=True)  # meteoblue or synopticx
+    station = db.Column(db.String(100), index=True)
+    file_size = db.Column(db.BigInteger)  # stored (possibly compressed) size in bytes
+    
+    __table_args__ = (
+        # Catalog listing: active files, newest first, keyset pagination on (uploaded_at, id)
+        db.Index('ix_data_file_active_uploaded_id', 'is_active', 'uploaded_at', 'id'),
+        db.Index('ix_data_file_active_range', 'is_active', 'date_range_start', 'date_range_end'),
+    )
     
     def __repr__(self):
         return f'<DataFile {self.original_filename}>'
+    
+    def to_catalog_dict(self):
+        """Catalog entry returned by /api/files"""
+        return {
+            'id': self.id,
+            'filename': self.original_filename,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+            'rows_count': self.rows_count,
+            'date_range_start': self.date_range_start.strftime('%Y-%m-%d') if self.date_range_start else None,
+            'date_range_end': self.date_range_end.strftime('%Y-%m-%d') if self.date_range_end else None,
+            'file_format': self.file_format,
+            'station': self.station,
+            'file_size': self.file_size,
+            'warm_status': self.warm_status
+        }
+
+
+class MonthlyTotal(db.Model):
+    """Precipitation total of one file, precip type and calendar month"""
+    __tablename__ = 'monthly_total'
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('data_file.id'), nullable=False)
+    precip_type = db.Column(db.String(8), nullable=False)  # rain or snow
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    season = db.Column(db.String(3))
+    total_mm = db.Column(db.Float, nullable=False)
+    observations = db.Column(db.Integer)
+    
+    __table_args__ = (
+        # Per-file series and climatologies (GROUP BY month / season within a file);
+        # unique so a concurrent backfill cannot store a month twice
+        db.Index('ix_monthly_total_file_precip_year_month', 'file_id', 'precip_type', 'year', 'month', unique=True),
+        db.Index('ix_monthly_total_file_precip_season', 'file_id', 'precip_type', 'season', 'year'),
+        # Cross-file comparisons of the same months
+        db.Index('ix_monthly_total_precip_year_month', 'precip_type', 'year', 'month'),
+    )
+
+
+class DailyTotal(db.Model):
+    """Precipitation total of one file, precip type and day"""
+    __tablename__ = 'daily_total'
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('data_file.id'), nullable=False)
+    precip_type = db.Column(db.String(8), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    season = db.Column(db.String(3))
+    total_mm = db.Column(db.Float, nullable=False)
+    observations = db.Column(db.Integer)
+    
+    __table_args__ = (
+        db.Index('ix_daily_total_file_precip_date', 'file_id', 'precip_type', 'date', unique=True),
+        db.Index('ix_daily_total_file_precip_year_month', 'file_id', 'precip_type', 'year', 'month'),
+    )
 
+
+class ClimatologyBaseline(db.Model):
+    """Named climatology of one file over a fixed window, referenced by id in comparisons"""
+    __tablename__ = 'climatology_baseline'
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('data_file.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    rows_count = db.Column(db.Integer)  # processed rows inside the window
+    
+    __table_args__ = (
+        # One baseline per file and window
+        db.Index('ix_climatology_baseline_file_window', 'file_id', 'window_start', 'window_end', unique=True),
+    )
+
+
+class BaselineMonth(db.Model):
+    """Monthly-total statistics of one baseline, precip type and calendar month"""
+    __tablename__ = 'baseline_month'
+    id = db.Column(db.Integer, primary_key=True)
+    baseline_id = db.Column(db.Integer, db.ForeignKey('climatology_baseline.id'), nullable=False)
+    precip_type = db.Column(db.String(8), nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    samples = db.Column(db.Integer, nullable=False)  # years with a total for this month
+    mean_mm = db.Column(db.Float)
+    std_mm = db.Column(db.Float)
+    min_mm = db.Column(db.Float)
+    p10_mm = db.Column(db.Float)
+    p25_mm = db.Column(db.Float)
+    median_mm = db.Column(db.Float)
+    p75_mm = db.Column(db.Float)
+    p90_mm = db.Column(db.Float)
+    max_mm = db.Column(db.Float)
+    totals = db.Column(db.Text)  # JSON [[year, total_mm], ...] used by the significance tests
+    
+    __table_args__ = (
+        db.Index('ix_baseline_month_baseline_precip_month', 'baseline_id', 'precip_type', 'month'),
+    )
+
+
+def upgrade_schema():
+    """Add columns introduced after a table was first created.
+    
+    db.create_all() only creates missing tables, so databases created by an
+    older version of the app are upgraded here with nullable ADD COLUMNs and
+    any indexes added since. Indexes made unique since are rebuilt after
+    removing rows that repeat their key (keeping the first). Must be called
+    inside an application context.
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+                if column.index:
+                    conn.execute(db.text(f'CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} '
+                                         f'ON {table.name} ({column.name})'))
+        existing_indexes = {ix['name']: ix for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            current = existing_indexes.get(index.name)
+            if current is None:
+                index.create(db.engine, checkfirst=True)
+            elif index.unique and not current.get('unique'):
+                columns = ', '.join(column.name for column in index.columns)
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(f'DELETE FROM {table.name} WHERE id NOT IN '
+                                         f'(SELECT MIN(id) FROM {table.name} GROUP BY {columns})'))
+                index.drop(db.engine)
+                index.create(db.engine)
@@ -0,0 +1,178 @@
+"""
+Side-by-side comparison of several stations on a common monthly grid.
+
+Every file is reduced to monthly totals with the coverage of each month
+(observed / expected timesteps). Files already cached in this process are
+reduced from the cached DataFrame on an I/O thread; the others are parsed
+in a process pool with the projection pushed down to the precipitation
+inputs, so the request takes about as long as its slowest file. The monthly
+tables are aligned on the months every station covers, and one stations x
+months matrix per precip type gives the climatologies, correlations and
+bias statistics of all station pairs at once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregates import PRECIP_TYPES
+from data_processor import DataProcessor
+from uniform_series import detect_step
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Fewest common months needed for correlations and biases
+MIN_COMMON_MONTHS = 3
+
+
+def monthly_coverage(df):
+    """Monthly rain, snow and total of a processed DataFrame with observation counts and coverage"""
+    step = detect_step(df['timestamp']) or pd.Timedelta(hours=1)
+    monthly = (df.groupby(['Year', 'Month'])
+                 .agg(Rain_mm=('Rain_mm', 'sum'), Snow_mm=('Snow_mm', 'sum'), observations=('timestamp', 'size'))
+                 .reset_index())
+    monthly['Precip_Total_mm'] = monthly['Rain_mm'] + monthly['Snow_mm']
+    days = pd.to_datetime(pd.DataFrame({'year': monthly['Year'], 'month': monthly['Month'], 'day': 1})).dt.days_in_month
+    expected = days.to_numpy() * 86400 / step.total_seconds()
+    monthly['coverage'] = np.minimum(monthly['observations'].to_numpy() / expected, 1.0)
+    return monthly
+
+
+def load_monthly(path, file_locks=None):
+    """monthly_coverage() of a file read with only its precipitation inputs (runs in a worker process)
+
+    file_locks (a storage.FileLocks) keeps the reclaimer from removing the
+    file while it is read.
+    """
+    if file_locks is None:
+        df, _ = DataProcessor(path, columns=[], fill_gaps=False).process()
+    else:
+        with file_locks.reading(path):
+            df, _ = DataProcessor(path, columns=[], fill_gaps=False).process()
+    return monthly_coverage(df)
+
+
+def load_stations(paths, cached_monthly=None, process_pool=None, file_locks=None):
+    """monthly_coverage() tables of several files, loaded concurrently
+
+    cached_monthly(path) returns the table of a file already in memory, or
+    None; other files are parsed in `process_pool` (on the I/O threads when
+    it is None).
+    """
+    def load(path):
+        table = cached_monthly(path) if cached_monthly is not None else None
+        if table is not None:
+            return table
+        if process_pool is None:
+            return load_monthly(path, file_locks)
+        return process_pool.submit(load_monthly, path, file_locks).result()
+
+    with ThreadPoolExecutor(max_workers=max(len(paths), 1), thread_name_prefix='station-loader') as threads:
+        return list(threads.map(load, paths))
+
+
+def align(tables, min_coverage=0.8):
+    """Months covered by every station (a Year/Month MultiIndex) and {precip_type: stations x months}"""
+    keyed = [t[t['coverage'] >= min_coverage].set_index(['Year', 'Month']) for t in tables]
+    common = keyed[0].index
+    for table in keyed[1:]:
+        common = common.intersection(table.index)
+    common = common.sort_values()
+    matrices = {precip_type: np.vstack([t.loc[common, col].to_numpy(dtype=np.float64) for t in keyed])
+                for precip_type, col in PRECIP_TYPES.items()}
+    return common, matrices
+
+
+def climatologies(months, matrix):
+    """Mean of each calendar month per station over the common months (stations x 12, NaN if absent)"""
+    month_numbers = months.get_level_values('Month').to_numpy()
+    one_hot = np.eye(12)[month_numbers - 1]
+    counts = one_hot.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, (matrix @ one_hot) / counts, np.nan)
+
+
+def pairwise_statistics(matrix):
+    """Pearson and Spearman correlation, bias, MAE and RMSE of every station pair
+
+    Each result is a stations x stations array; bias[i, j] is the mean of
+    station i minus station j and relative_bias[i, j] expresses it as a
+    percentage of station j's mean.
+    """
+    from scipy import stats
+
+    diffs = matrix[:, None, :] - matrix[None, :, :]
+    means = matrix.mean(axis=1)
+    bias = diffs.mean(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_bias = np.where(means[None, :] > 0, bias / means[None, :] * 100, np.nan)
+        pearson = np.corrcoef(matrix)
+        spearman = np.corrcoef(stats.rankdata(matrix, axis=1))
+    return {
+        'pearson': np.atleast_2d(pearson),
+        'spearman': np.atleast_2d(spearman),
+        'bias_mm': bias,
+        'relative_bias_pct': relative_bias,
+        'mae_mm': np.abs(diffs).mean(axis=2),
+        'rmse_mm': np.sqrt((diffs ** 2).mean(axis=2))
+    }
+
+
+def _clean(values):
+    """JSON-ready nested lists with NaN as None"""
+    array = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(array), np.round(array, 4), None).tolist()
+
+
+def compare_stations(stations, tables, precip_types=('rain', 'snow'), min_coverage=0.8, reference=0):
+    """Coverage, aligned series, climatologies and pairwise statistics of several stations
+
+    `stations` are JSON-ready descriptions (with an 'id') in the order of
+    `tables`; statistics against the reference station are listed per
+    station. Raises ValueError when the stations share too few months.
+    """
+    months, matrices = align(tables, min_coverage)
+    if len(months) < MIN_COMMON_MONTHS:
+        raise ValueError(f'The files share {len(months)} month(s) with at least {min_coverage:.0%} coverage; '
+                         f'{MIN_COMMON_MONTHS} are needed for a comparison')
+
+    station_rows = []
+    for station, table in zip(stations, tables):
+        covered = table[table['coverage'] >= min_coverage]
+        station_rows.append(dict(
+            station,
+            months=int(len(table)),
+            covered_months=int(len(covered)),
+            first_month=f"{int(table['Year'].iloc[0])}-{int(table['Month'].iloc[0]):02d}" if len(table) else None,
+            last_month=f"{int(table['Year'].iloc[-1])}-{int(table['Month'].iloc[-1]):02d}" if len(table) else None
+        ))
+
+    ids = [station['id'] for station in stations]
+    labels = [f'{y}-{m:02d}' for y, m in months]
+    result = {
+        'stations': station_rows,
+        'reference_id': ids[reference],
+        'min_coverage': min_coverage,
+        'common_months': len(months),
+        'first_month': labels[0],
+        'last_month': labels[-1],
+        'months': labels,
+        'precip': {}
+    }
+    for precip_type in precip_types:
+        matrix = matrices[precip_type]
+        pairs = pairwise_statistics(matrix)
+        vs_reference = []
+        for i, file_id in enumerate(ids):
+            if i == reference:
+                continue
+            vs_reference.append({'file_id': file_id, **{name: _clean(values[i, reference])
+                                                        for name, values in pairs.items()}})
+        result['precip'][precip_type] = {
+            'series': {file_id: _clean(row) for file_id, row in zip(ids, matrix)},
+            'climatology': {file_id: _clean(row) for file_id, row in zip(ids, climatologies(months, matrix))},
+            'mean_monthly_mm': {file_id: _clean(row.mean()) for file_id, row in zip(ids, matrix)},
+            'correlation': _clean(pairs['pearson']),
+            'vs_reference': vs_reference
+        }
+    return result
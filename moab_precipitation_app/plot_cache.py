@@ -0,0 +1,131 @@
+"""
+Disk cache of rendered plots.
+
+Rendered images are stored per source file (keyed by its content hash) so
+they are shared by every worker process and survive restarts. Entries are
+plain JSON files holding the base64 image and its MIME type; the least
+recently used entries are removed once the cache grows past its size limit.
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from single_flight import request_key
+from storage import directory_size
+
+# Version of the plot rendering code; bump it whenever a plot's output changes so
+# images rendered by an older deploy are not served from the cache
+PLOT_CACHE_VERSION = 1
+
+
+def plot_cache_key(gen, plot_type, precip_type, month_filter=None, season_filter=None, settings=None):
+    """Key for one rendered plot: everything that changes the encoded image
+
+    `settings` holds server-side parameters the plot is computed with (e.g.
+    the event gap), so changing them does not serve images built with the
+    old values.
+    """
+    return request_key('plot', {
+        'version': PLOT_CACHE_VERSION,
+        'plot_type': plot_type,
+        'precip_type': precip_type,
+        'months': sorted(int(m) for m in (month_filter or [])),
+        'seasons': sorted(str(s) for s in (season_filter or [])),
+        'format': gen.resolve_format(plot_type),
+        'quality': gen.quality,
+        'annotate': gen.annotate,
+        'settings': settings or {}
+    })
+
+
+class PlotCache:
+    """Rendered plots on disk, grouped by source file and pruned by last use"""
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._written = 0  # bytes written since the last prune
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, source_id, key):
+        return os.path.join(self.cache_dir, source_id, f'{key}.json')
+
+    def get(self, source_id, key):
+        """Return (plot, mime_type) or None on a miss"""
+        path = self._path(source_id, key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used
+            return entry['plot'], entry['mime']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, source_id, key, plot, mime_type):
+        if not plot:
+            return
+        path = self._path(source_id, key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'mime': mime_type, 'plot': plot}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Caching is best effort
+            print(f"Plot cache write failed: {e}", file=sys.stderr, flush=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._written += len(plot)
+            should_prune = self._written > self.max_bytes // 10
+            if should_prune:
+                self._written = 0
+        if should_prune:
+            self.prune()
+
+    def has_all(self, source_id, keys):
+        return all(os.path.exists(self._path(source_id, key)) for key in keys)
+
+    def invalidate(self, source_id):
+        """Remove every cached plot of a source file; returns the bytes freed"""
+        directory = os.path.join(self.cache_dir, source_id)
+        freed = directory_size(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        return freed
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def prune(self):
+        """Remove least recently used plots until the cache fits in max_bytes"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for path, size, mtime in sorted(entries, key=lambda e: e[2]):
+            # Stale temp files from interrupted writes are always removed
+            if total <= self.max_bytes and not (path.endswith('.tmp') and now - mtime > 60):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -5,7 +5,11 @@ import seaborn as sns
 import numpy as np
 import pandas as pd
 import base64
+import copy
 import io
+import wind
+import precip_events
+import extremes
 # Import scipy.stats only when needed (in comparison functions)
 try:
     from scipy import stats
@@ -17,7 +21,50 @@ except ImportError:
 class PlotGenerator:
     """Generate plots as base64 encoded images"""
     
-    def __init__(self):
+    # Supported image encoders and the MIME type the browser needs to display them
+    OUTPUT_FORMATS = {
+        'png': 'image/png',
+        'webp': 'image/webp',
+        'svg': 'image/svg+xml'
+    }
+    
+    # DPI per quality tier (ignored by SVG, which is resolution independent)
+    QUALITY_DPI = {
+        'preview': 40,
+        'full': 70
+    }
+    
+    # WebP encoder quality per tier (0-100)
+    WEBP_QUALITY = {
+        'preview': 60,
+        'full': 85
+    }
+    
+    # Cheapest encoder per plot type when output_format is 'auto':
+    # dense color fields compress best as WebP, simple bar/line/box charts as SVG
+    DEFAULT_FORMATS = {
+        'monthly_heatmap': 'webp',
+        'monthly_climatology': 'svg',
+        'seasonal_boxplot': 'svg',
+        'annual_totals': 'svg',
+        'monthly_distribution': 'svg',
+        'monthly_histogram': 'svg',
+        'comparison_histogram': 'svg',
+        'anomaly': 'svg',
+        'wind_rose': 'svg',
+        'event_frequency': 'svg',
+        'event_scatter': 'webp',
+        'dry_spells': 'svg',
+        'return_levels': 'svg',
+        'trend_heatmap': 'svg',
+        'station_climatology': 'svg',
+        'station_series': 'svg'
+    }
+    
+    # Plots drawn from a precip_events.segment_events() table
+    EVENT_PLOTS = ('event_frequency', 'event_scatter', 'dry_spells')
+    
+    def __init__(self, output_format='auto', quality='full', annotate=True):
         # Try different matplotlib styles for compatibility
         try:
             plt.style.use('seaborn-v0_8-whitegrid')
@@ -28,16 +75,61 @@ class PlotGenerator:
                 pass  # Use default style
         
         sns.set_palette('husl')
+        self._set_output(output_format, quality, annotate)
+    
+    def _set_output(self, output_format, quality, annotate=True):
+        """Validate and store the requested output format and quality tier"""
+        output_format = (output_format or 'auto').lower()
+        quality = (quality or 'full').lower()
+        if output_format != 'auto' and output_format not in self.OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{output_format}'. "
+                             f"Choose one of: auto, {', '.join(self.OUTPUT_FORMATS)}")
+        if quality not in self.QUALITY_DPI:
+            raise ValueError(f"Unsupported quality '{quality}'. Choose one of: {', '.join(self.QUALITY_DPI)}")
+        self.output_format = output_format
+        self.quality = quality
+        # Value labels and legends are skipped for fast preview renders
+        self.annotate = annotate
+    
+    def for_output(self, output_format='auto', quality='full', annotate=True):
+        """Return a copy of this generator that encodes with the given format and quality"""
+        gen = copy.copy(self)
+        gen._set_output(output_format, quality, annotate)
+        return gen
+    
+    def resolve_format(self, plot_type=None):
+        """Encoder used for a plot type ('auto' picks the cheapest one per plot type)"""
+        if self.output_format != 'auto':
+            return self.output_format
+        if self.quality == 'preview':
+            # SVG size does not shrink with DPI, so previews are always rasterized
+            return 'webp'
+        return self.DEFAULT_FORMATS.get(plot_type, 'png')
+    
+    def mime_type(self, plot_type=None):
+        """MIME type of the images produced for a plot type"""
+        return self.OUTPUT_FORMATS[self.resolve_format(plot_type)]
         
-    def _fig_to_base64(self, fig):
-        """Convert matplotlib figure to base64 string"""
+    def _fig_to_base64(self, fig, plot_type=None):
+        """Convert matplotlib figure to base64 string in the negotiated format"""
         buf = None
         try:
             buf = io.BytesIO()
-            # Use lower DPI to reduce memory usage and response size (important for multiple plots)
-            # DPI 70 is a good balance between quality and file size for web display
-            fig.savefig(buf, format='png', dpi=70, bbox_inches='tight', 
-                       facecolor='white', edgecolor='none', optimize=True)
+            fmt = self.resolve_format(plot_type)
+            dpi = self.QUALITY_DPI[self.quality]
+            if fmt == 'svg':
+                # Keep text as <text> elements instead of glyph paths, which is much smaller
+                with plt.rc_context({'svg.fonttype': 'none'}):
+                    fig.savefig(buf, format='svg', bbox_inches='tight',
+                               facecolor='white', edgecolor='none', metadata={'Date': None})
+            elif fmt == 'webp':
+                fig.savefig(buf, format='webp', dpi=dpi, bbox_inches='tight',
+                           facecolor='white', edgecolor='none',
+                           pil_kwargs={'quality': self.WEBP_QUALITY[self.quality], 'method': 4})
+            else:
+                # DPI 70 ('full') is a good balance between quality and file size for web display
+                fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', 
+                           facecolor='white', edgecolor='none')
             buf.seek(0)
             img_base64 = base64.b64encode(buf.read()).decode('utf-8')
             return img_base64
@@ -72,14 +164,14 @@ class PlotGenerator:
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                        'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
         
-        sns.heatmap(monthly_pivot, annot=True, fmt='.1f', cmap='Blues',
+        sns.heatmap(monthly_pivot, annot=self.annotate, fmt='.1f', cmap='Blues',
                    cbar_kws={'label': f'{precip_type.capitalize()} (mm)'},
                    xticklabels=month_names, ax=ax)
         ax.set_xlabel('Month')
         ax.set_ylabel('Year')
         ax.set_title(f'Monthly Total {precip_type.capitalize()} Heatmap - Moab, Utah')
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'monthly_heatmap')
     
     def monthly_climatology(self, df, precip_type='rain', month_filter=None):
         """Monthly climatology bar chart"""
@@ -117,20 +209,18 @@ class PlotGenerator:
         ax.set_title(f'Monthly {precip_type.capitalize()} Climatology with Standard Deviation - Moab, Utah')
         
         # Add value labels
-        for i, (mean, std) in enumerate(zip(means, stds)):
-            ax.text(x_vals[i], mean + std + max(means) * 0.02, f'{mean:.1f}', 
-                   ha='center', va='bottom', fontsize=9)
+        if self.annotate:
+            for i, (mean, std) in enumerate(zip(means, stds)):
+                ax.text(x_vals[i], mean + std + max(means) * 0.02, f'{mean:.1f}', 
+                       ha='center', va='bottom', fontsize=9)
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'monthly_climatology')
     
     def seasonal_boxplot(self, df, precip_type='rain', season_filter=None):
         """Seasonal distribution boxplot"""
-        def assign_season_year(row):
-            if row['Month'] == 12:
-                return row['Year'] + 1
-            return row['Year']
-        
-        df['SeasonYear'] = df.apply(assign_season_year, axis=1)
+        # December belongs to the following year's DJF season.
+        # Use assign() so the (possibly cached) input frame is not modified.
+        df = df.assign(SeasonYear=np.where(df['Month'] == 12, df['Year'] + 1, df['Year']))
         col_name = 'Rain_mm' if precip_type == 'rain' else 'Snow_mm'
         
         if col_name not in df.columns:
@@ -162,7 +252,10 @@ class PlotGenerator:
             raise ValueError("No seasonal data available")
         
         fig, ax = plt.subplots(figsize=(10, 6))
-        bp = ax.boxplot(boxplot_data, patch_artist=True, labels=labels)
+        bp = ax.boxplot(boxplot_data, patch_artist=True)
+        # Set tick labels explicitly (boxplot's labels= keyword was renamed in newer matplotlib)
+        ax.set_xticks(range(1, len(labels) + 1))
+        ax.set_xticklabels(labels)
         
         for patch, color in zip(bp['boxes'], colors_list):
             patch.set_facecolor(color)
@@ -172,7 +265,7 @@ class PlotGenerator:
         ax.set_ylabel(f'{precip_type.capitalize()} (mm)')
         ax.set_title(f'Seasonal {precip_type.capitalize()} Distribution - Moab, Utah\n(DJF=Winter, MAM=Spring, JJA=Summer, SON=Fall)')
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'seasonal_boxplot')
     
     def annual_totals(self, df, precip_type='rain'):
         """Annual totals time series"""
@@ -199,10 +292,11 @@ class PlotGenerator:
         ax.set_xlabel('Year')
         ax.set_ylabel(f'{precip_type.capitalize()} (mm)')
         ax.set_title(f'Annual Total {precip_type.capitalize()} - Moab, Utah')
-        ax.legend()
+        if self.annotate:
+            ax.legend()
         ax.set_xticks(annual.index[::max(1, len(annual)//10)])  # Show every Nth year
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'annual_totals')
     
     def monthly_distribution_boxplot(self, df, precip_type='rain', month_filter=None):
         """Monthly precipitation distribution boxplot"""
@@ -228,7 +322,9 @@ class PlotGenerator:
             else:
                 boxplot_data.append([])
         
-        bp = ax.boxplot(boxplot_data, patch_artist=True, labels=month_names)
+        bp = ax.boxplot(boxplot_data, patch_artist=True)
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(month_names)
         
         # Color the boxes
         colors = plt.cm.Blues(np.linspace(0.3, 0.8, 12))
@@ -239,7 +335,7 @@ class PlotGenerator:
         ax.set_ylabel(f'Monthly Total {precip_type.capitalize()} (mm)')
         ax.set_title(f'Monthly {precip_type.capitalize()} Distribution - Moab, Utah')
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'monthly_distribution')
     
     def monthly_histogram(self, df, precip_type='rain', month_filter=None):
         """Histogram of precipitation for selected individual months"""
@@ -312,7 +408,8 @@ class PlotGenerator:
             ax.set_xlabel(f'{precip_type.capitalize()} (mm)', fontsize=10)
             ax.set_ylabel('Frequency', fontsize=10)
             ax.set_title(f'{month_names[month-1]} - {precip_type.capitalize()} Distribution', fontsize=11, fontweight='bold')
-            ax.legend(fontsize=9)
+            if self.annotate:
+                ax.legend(fontsize=9)
             ax.grid(True, alpha=0.3)
         
         # Hide unused subplots
@@ -320,10 +417,14 @@ class PlotGenerator:
             axes[idx].axis('off')
         
         plt.tight_layout()
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'monthly_histogram')
     
-    def operating_vs_climatology_histogram(self, df_op, df_clim, precip_type='rain'):
-        """Overlay histogram comparing operating period vs climatology"""
+    def operating_vs_climatology_histogram(self, df_op, df_clim, precip_type='rain', baseline=None):
+        """Overlay histogram comparing operating period vs climatology
+        
+        With a stored `baseline` (baselines.Baseline) its monthly totals are
+        used and `df_clim` may be None.
+        """
         try:
             from scipy import stats
         except ImportError:
@@ -332,7 +433,10 @@ class PlotGenerator:
         
         # Calculate monthly totals
         monthly_op = df_op.groupby(['Year', 'Month'])[col_name].sum().values
-        monthly_clim = df_clim.groupby(['Year', 'Month'])[col_name].sum().values
+        if baseline is not None:
+            monthly_clim = baseline.monthly_totals(precip_type)
+        else:
+            monthly_clim = df_clim.groupby(['Year', 'Month'])[col_name].sum().values
         
         # Determine common bin edges
         all_data = np.concatenate([monthly_op, monthly_clim])
@@ -353,15 +457,18 @@ class PlotGenerator:
         ax.set_title(f'Monthly {precip_type.capitalize()} Distribution: Operating Period vs Climatology', fontsize=14)
         ax.legend(fontsize=11)
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'comparison_histogram')
     
-    def precipitation_anomaly(self, df_op, df_clim, precip_type='rain'):
-        """Anomaly plot showing departure from climatology"""
+    def precipitation_anomaly(self, df_op, df_clim, precip_type='rain', baseline=None):
+        """Anomaly plot showing departure from climatology (or from a stored baseline's monthly means)"""
         col_name = 'Rain_mm' if precip_type == 'rain' else 'Snow_mm'
         
         # Calculate climatological mean for each month
-        monthly_clim = df_clim.groupby(['Year', 'Month'])[col_name].sum().reset_index()
-        clim_monthly_means = monthly_clim.groupby('Month')[col_name].mean()
+        if baseline is not None:
+            clim_monthly_means = baseline.monthly_means(precip_type)
+        else:
+            monthly_clim = df_clim.groupby(['Year', 'Month'])[col_name].sum().reset_index()
+            clim_monthly_means = monthly_clim.groupby('Month')[col_name].mean()
         
         # Calculate anomalies for operating period
         monthly_op = df_op.groupby(['Year', 'Month'])[col_name].sum().reset_index()
@@ -391,7 +498,258 @@ class PlotGenerator:
                            Patch(facecolor='#3498db', alpha=0.8, label='Below Normal')]
         ax.legend(handles=legend_elements, loc='upper right')
         
-        return self._fig_to_base64(fig)
+        return self._fig_to_base64(fig, 'anomaly')
+    
+    def wind_rose(self, df, precip_type='rain', month_filter=None, table=None, title=None):
+        """Wind rose during rain or snow, drawn from a wind.wind_rose_table() table"""
+        if table is None:
+            table = wind.wind_rose_table(df, month_filter, precip_type)
+        if table['total'] == 0:
+            raise ValueError(f"No wind data during {precip_type} for the selected months")
+        
+        frequency = np.array(table['frequency'])
+        width = 2 * np.pi / table['sectors']
+        theta = np.deg2rad(table['sector_centers'])
+        colors = plt.cm.viridis(np.linspace(0, 1, frequency.shape[1]))
+        
+        fig = plt.figure(figsize=(9, 9))
+        ax = fig.add_subplot(projection='polar')
+        ax.set_theta_zero_location('N')
+        ax.set_theta_direction(-1)
+        bottom = np.zeros(len(theta))
+        unit = f" {table['speed_unit']}" if table['speed_unit'] else ''
+        for i, label in enumerate(table['speed_labels']):
+            ax.bar(theta, frequency[:, i], width=width * 0.8, bottom=bottom, color=colors[i],
+                   edgecolor='black', linewidth=0.5, label=f'{label}{unit}')
+            bottom += frequency[:, i]
+        ax.set_xticks(np.deg2rad([0, 45, 90, 135, 180, 225, 270, 315]))
+        ax.set_xticklabels(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'])
+        ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda v, _: f'{v:.0f}%'))
+        title = title or f"Wind During {precip_type.capitalize()} - Moab, Utah"
+        ax.set_title(f"{title} ({table['total']} observations)", pad=20)
+        if self.annotate:
+            ax.legend(title='Wind speed', loc='center left', bbox_to_anchor=(1.08, 0.5))
+        
+        return self._fig_to_base64(fig, 'wind_rose')
+    
+    def _events(self, df, precip_type, month_filter, events):
+        """Event table for an event plot, limited to the selected months"""
+        if events is None:
+            events = precip_events.segment_events(df, precip_type)
+        events = precip_events.filter_events(events, month_filter=month_filter)
+        if len(events) == 0:
+            raise ValueError(f"No {precip_type} events for the selected months")
+        return events
+    
+    def event_frequency(self, df, precip_type='rain', month_filter=None, events=None):
+        """Average number of events per calendar month and their median size"""
+        events = self._events(df, precip_type, month_filter, events)
+        months = events['start'].dt.month
+        n_years = max(1, events['start'].dt.year.nunique())
+        per_month = months.value_counts().reindex(range(1, 13), fill_value=0) / n_years
+        median_total = events.groupby(months)['total_mm'].median().reindex(range(1, 13))
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        ax.bar(range(1, 13), per_month.values, color='steelblue', alpha=0.8, edgecolor='white',
+               label='Events per month')
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(month_names)
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Average number of events')
+        
+        ax2 = ax.twinx()
+        ax2.plot(range(1, 13), median_total.values, color='darkorange', marker='o', linewidth=2,
+                 label='Median event total')
+        ax2.set_ylabel('Median event total (mm)')
+        ax2.grid(False)
+        ax.set_title(f'{precip_type.capitalize()} Events per Month - Moab, Utah ({len(events)} events)')
+        if self.annotate:
+            handles = ax.get_legend_handles_labels()[0] + ax2.get_legend_handles_labels()[0]
+            ax.legend(handles=handles, loc='upper left')
+        
+        return self._fig_to_base64(fig, 'event_frequency')
+    
+    def event_scatter(self, df, precip_type='rain', month_filter=None, events=None):
+        """Event duration vs event total, colored by peak rate"""
+        events = self._events(df, precip_type, month_filter, events)
+        
+        fig, ax = plt.subplots(figsize=(12, 7))
+        points = ax.scatter(events['duration_hours'], events['total_mm'], c=events['peak_rate_mm_h'],
+                            cmap='viridis', alpha=0.7, s=25, edgecolors='none')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Event duration (hours)')
+        ax.set_ylabel(f'Event total {precip_type} (mm)')
+        ax.set_title(f'{precip_type.capitalize()} Event Duration vs Total - Moab, Utah')
+        if self.annotate:
+            plt.colorbar(points, ax=ax, label='Peak rate (mm/h)')
+        
+        return self._fig_to_base64(fig, 'event_scatter')
+    
+    def dry_spells(self, df, precip_type='rain', month_filter=None, events=None):
+        """Distribution of dry-spell lengths between events"""
+        events = self._events(df, precip_type, month_filter, events)
+        dry_days = events['dry_before_hours'].dropna() / 24
+        if len(dry_days) == 0:
+            raise ValueError(f"Need at least two {precip_type} events for dry spells")
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        n_bins = min(40, max(10, len(dry_days) // 5))
+        low = max(dry_days.min(), 1 / 144)  # 10 minutes
+        if dry_days.max() > 20 * max(dry_days.median(), low):
+            # Long-tailed (e.g. seasonal snow): log-spaced bins keep short spells visible
+            bins = np.geomspace(low, dry_days.max(), n_bins + 1)
+            ax.set_xscale('log')
+            dry_days = dry_days.clip(lower=low)
+        else:
+            bins = np.histogram_bin_edges(dry_days, bins=n_bins)
+        ax.hist(dry_days, bins=bins, color='sandybrown', alpha=0.8, edgecolor='white')
+        median_val = dry_days.median()
+        ax.axvline(median_val, color='red', linestyle='--', linewidth=2, label=f'Median: {median_val:.1f} days')
+        ax.axvline(dry_days.max(), color='black', linestyle=':', linewidth=2,
+                   label=f'Longest: {dry_days.max():.1f} days')
+        ax.set_xlabel('Dry spell length (days)')
+        ax.set_ylabel('Number of dry spells')
+        ax.set_title(f'Dry Spells Between {precip_type.capitalize()} Events - Moab, Utah')
+        if self.annotate:
+            ax.legend()
+        
+        return self._fig_to_base64(fig, 'dry_spells')
+    
+    def return_levels(self, df, precip_type='rain', maxima=None):
+        """Gumbel return level curves of the annual maximum 1/3/7-day totals"""
+        if maxima is None:
+            maxima = extremes.annual_maxima(df, precip_type)
+        n_years = len(maxima['years'])
+        if n_years < 2:
+            raise ValueError('At least two complete years are needed for return levels')
+        
+        location, scale = extremes.fit_gumbel(maxima['maxima'])
+        periods = np.geomspace(1.05, 200, 100)
+        curves = extremes.return_levels(location, scale, periods)
+        empirical = extremes.plotting_positions(n_years)
+        
+        fig, ax = plt.subplots(figsize=(12, 7))
+        colors = sns.color_palette('husl', len(maxima['windows_days']))
+        for i, days in enumerate(maxima['windows_days']):
+            label = f'{days:g}-day'
+            ax.plot(periods, curves[i], color=colors[i], linewidth=2, label=f'{label} (Gumbel fit)')
+            ax.scatter(empirical, np.sort(maxima['maxima'][i])[::-1], color=colors[i], s=30,
+                       edgecolors='black', linewidths=0.5, zorder=3)
+        ax.set_xscale('log')
+        ax.set_xticks([2, 5, 10, 25, 50, 100, 200])
+        ax.set_xticklabels(['2', '5', '10', '25', '50', '100', '200'])
+        ax.xaxis.set_minor_formatter(matplotlib.ticker.NullFormatter())
+        ax.set_xlabel('Return period (years)')
+        ax.set_ylabel(f'Maximum {precip_type} total (mm)')
+        ax.set_title(f'{precip_type.capitalize()} Return Levels - Moab, Utah ({n_years} years)')
+        if self.annotate:
+            ax.legend(loc='upper left')
+        
+        return self._fig_to_base64(fig, 'return_levels')
+    
+    def trend_heatmap(self, table, alpha=0.05):
+        """Sen's slope (% of the mean per decade) per precip type and period from trends.trend_table()"""
+        pivot = table.pivot(index='precip_type', columns='period', values='percent_per_decade')
+        significant = table.pivot(index='precip_type', columns='period', values='p_value') < alpha
+        periods = list(dict.fromkeys(table['period']))
+        rows = list(dict.fromkeys(table['precip_type']))
+        pivot = pivot.reindex(index=rows, columns=periods)
+        significant = significant.reindex(index=rows, columns=periods).fillna(False)
+        
+        labels = pivot.map(lambda v: '' if pd.isna(v) else f'{v:+.0f}%')
+        labels = labels.where(~significant, labels + '*')
+        limit = np.nanmax(np.abs(pivot.to_numpy(dtype=np.float64))) if pivot.notna().any().any() else 1.0
+        limit = max(1.0, min(limit, 100.0))
+        
+        fig, ax = plt.subplots(figsize=(16, 1.6 + 1.1 * len(rows)))
+        sns.heatmap(pivot.astype(float), annot=labels.to_numpy() if self.annotate else False, fmt='',
+                    cmap='BrBG', center=0, vmin=-limit, vmax=limit, linewidths=0.5,
+                    cbar_kws={'label': 'Trend (% of mean per decade)'}, ax=ax)
+        ax.set_facecolor('#dddddd')  # Periods without enough years
+        ax.grid(False)
+        ax.set_xlabel('')
+        ax.set_ylabel('')
+        ax.set_yticklabels([r.capitalize() for r in rows], rotation=0)
+        ax.set_title(f"Precipitation Trends (Sen's slope, * Mann-Kendall p < {alpha:g}) - Moab, Utah")
+        
+        return self._fig_to_base64(fig, 'trend_heatmap')
+    
+    def _station_labels(self, report):
+        """Legend label of each station: its name, or its file name when names are missing or shared"""
+        names = [s.get('station') for s in report['stations']]
+        labels = {}
+        for s in report['stations']:
+            name = s.get('station')
+            labels[s['id']] = name if name and names.count(name) == 1 else (s.get('filename') or f"File {s['id']}")
+        return labels
+    
+    def station_climatology(self, report, precip_type='rain'):
+        """Monthly climatologies of several stations over their common months (multi_station.compare_stations())"""
+        labels = self._station_labels(report)
+        climatology = report['precip'][precip_type]['climatology']
+        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        x = np.arange(12)
+        for file_id, means in climatology.items():
+            values = np.array([np.nan if v is None else v for v in means], dtype=np.float64)
+            ax.plot(x, values, marker='o', linewidth=2, label=labels[file_id])
+        ax.set_xticks(x)
+        ax.set_xticklabels(month_names)
+        ax.set_xlabel('Month')
+        ax.set_ylabel(f'{precip_type.capitalize()} (mm)')
+        ax.set_title(f"Monthly {precip_type.capitalize()} Climatology by Station\n"
+                     f"({report['common_months']} common months, {report['first_month']} to {report['last_month']})")
+        ax.legend()
+        
+        return self._fig_to_base64(fig, 'station_climatology')
+    
+    def station_series(self, report, precip_type='rain'):
+        """Monthly totals of several stations on their common monthly grid (multi_station.compare_stations())"""
+        labels = self._station_labels(report)
+        precip = report['precip'][precip_type]
+        dates = pd.to_datetime(report['months'])
+        stats = {row['file_id']: row for row in precip['vs_reference']}
+        
+        fig, ax = plt.subplots(figsize=(14, 6))
+        # Months missing from the common grid are left as gaps rather than joined
+        grid = pd.date_range(dates.min(), dates.max(), freq='MS')
+        for file_id, series in precip['series'].items():
+            values = pd.Series([np.nan if v is None else v for v in series], index=dates, dtype=np.float64)
+            label = labels[file_id]
+            if self.annotate and file_id in stats and stats[file_id]['pearson'] is not None:
+                label += f" (r = {stats[file_id]['pearson']:.2f}, bias {stats[file_id]['bias_mm']:+.1f} mm)"
+            ax.plot(grid, values.reindex(grid).to_numpy(), marker='.', linewidth=1.5, label=label)
+        ax.set_xlabel('Date')
+        ax.set_ylabel(f'Monthly {precip_type.capitalize()} (mm)')
+        ax.set_title(f'Monthly {precip_type.capitalize()} by Station (common months)')
+        ax.legend(fontsize=9)
+        
+        return self._fig_to_base64(fig, 'station_series')
+    
+    def render(self, df, plot_type, precip_type='rain', month_filter=None, season_filter=None):
+        """Render a single plot type for one precipitation type"""
+        if plot_type == 'monthly_heatmap':
+            return self.monthly_totals_heatmap(df, precip_type, month_filter)
+        elif plot_type == 'monthly_climatology':
+            return self.monthly_climatology(df, precip_type, month_filter)
+        elif plot_type == 'seasonal_boxplot':
+            return self.seasonal_boxplot(df, precip_type, season_filter)
+        elif plot_type == 'annual_totals':
+            return self.annual_totals(df, precip_type)
+        elif plot_type == 'monthly_distribution':
+            return self.monthly_distribution_boxplot(df, precip_type, month_filter)
+        elif plot_type == 'monthly_histogram':
+            return self.monthly_histogram(df, precip_type, month_filter)
+        elif plot_type == 'wind_rose':
+            return self.wind_rose(df, precip_type, month_filter)
+        elif plot_type == 'return_levels':
+            return self.return_levels(df, precip_type)
+        elif plot_type in self.EVENT_PLOTS:
+            return getattr(self, plot_type)(df, precip_type, month_filter)
+        raise ValueError(f"Unknown plot type '{plot_type}'")
     
     def generate_all_plots(self, df, month_filter=None, season_filter=None):
         """Generate all plots for both rain and snow"""
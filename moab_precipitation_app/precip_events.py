@@ -0,0 +1,137 @@
+"""
+Precipitation event segmentation and dry spells.
+
+An event is a run of wet timesteps (precipitation above a threshold) whose
+wet steps are never separated by more than `min_gap_hours`; longer dry
+stretches between events are dry spells. Segmentation is run-length
+encoding of the wet mask in one pass: the indices of the wet steps are
+split wherever the dry time between consecutive ones exceeds the gap, and event
+totals, peaks and step counts are np.add/np.maximum.reduceat over those
+runs. The resulting event table is small and cached per file; statistics,
+period filters and plots all work from it.
+"""
+import numpy as np
+import pandas as pd
+
+from precip_series import sorted_series
+from uniform_series import detect_step
+
+EVENT_COLUMNS = ['start', 'end', 'duration_hours', 'wet_steps', 'total_mm', 'peak_mm',
+                 'peak_rate_mm_h', 'mean_intensity_mm_h', 'dry_before_hours']
+
+
+def segment_events(df, precip_type='rain', min_gap_hours=6, threshold=0.0):
+    """Event table of a processed DataFrame, one row per event in time order
+
+    start/end are the first and last wet timestamps, duration_hours counts
+    whole timesteps (a single wet hour lasts one hour) and dry_before_hours
+    is the dry spell since the previous event (NaN for the first one).
+    """
+    if min_gap_hours < 0:
+        raise ValueError('min_gap_hours must be non-negative')
+    times, values, _ = sorted_series(df, precip_type)
+
+    step = detect_step(times) or pd.Timedelta(hours=1)
+    step_hours = step.total_seconds() / 3600
+
+    wet = np.flatnonzero(values > threshold)
+    if len(wet) == 0:
+        return pd.DataFrame({col: pd.Series(dtype='datetime64[ns]' if col in ('start', 'end') else 'float64')
+                             for col in EVENT_COLUMNS})
+
+    wet_times = times[wet].astype(np.int64)
+    # A new event starts where the dry time before the next wet step (one step less than
+    # their spacing, as in dry_before_hours) is longer than the gap
+    breaks = np.flatnonzero(np.diff(wet_times) - step.value > int(min_gap_hours * 3600 * 1e9))
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(wet) - 1]])
+
+    wet_values = values[wet]
+    totals = np.add.reduceat(wet_values, starts)
+    peaks = np.maximum.reduceat(wet_values, starts)
+    start_ns = wet_times[starts]
+    end_ns = wet_times[ends]
+    durations = (end_ns - start_ns) / 3600e9 + step_hours
+    dry_before = np.concatenate([[np.nan], (start_ns[1:] - end_ns[:-1]) / 3600e9 - step_hours])
+
+    return pd.DataFrame({
+        'start': start_ns.astype('datetime64[ns]'),
+        'end': end_ns.astype('datetime64[ns]'),
+        'duration_hours': durations,
+        'wet_steps': ends - starts + 1,
+        'total_mm': totals,
+        'peak_mm': peaks,
+        'peak_rate_mm_h': peaks / step_hours,
+        'mean_intensity_mm_h': totals / durations,
+        'dry_before_hours': dry_before
+    })
+
+
+def naive_utc(value):
+    """pd.Timestamp of a date/time, with a UTC offset converted away to match the naive UTC data"""
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    return value
+
+
+def filter_events(events, start=None, end=None, month_filter=None):
+    """Events starting within [start, end] (dates are inclusive) and in the given months"""
+    mask = np.ones(len(events), dtype=bool)
+    if start is not None:
+        mask &= (events['start'] >= naive_utc(start)).to_numpy()
+    if end is not None:
+        end = naive_utc(end)
+        if end == end.normalize():
+            end = end + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+        mask &= (events['start'] <= end).to_numpy()
+    if month_filter:
+        mask &= events['start'].dt.month.isin([int(m) for m in month_filter]).to_numpy()
+    return events[mask]
+
+
+def event_statistics(events, years=None):
+    """Counts, durations, intensities and dry-spell lengths of an event table
+
+    `years` is the length of the period the events were taken from; without
+    it, events per year are averaged over the calendar years with events.
+    """
+    if len(events) == 0:
+        return {'events': 0}
+
+    def summary(series):
+        series = series.dropna()
+        if len(series) == 0:
+            return None
+        return {'mean': float(series.mean()), 'median': float(series.median()),
+                'p90': float(series.quantile(0.9)), 'max': float(series.max())}
+
+    if not years:
+        years = events['start'].dt.year.nunique()
+    dry = events['dry_before_hours']
+    longest_dry = None
+    if dry.notna().any():
+        longest = dry.idxmax()
+        longest_dry = {'hours': float(dry[longest]), 'ended_at': events.loc[longest, 'start'].isoformat()}
+    return {
+        'events': int(len(events)),
+        'first_event': events['start'].iloc[0].isoformat(),
+        'last_event': events['start'].iloc[-1].isoformat(),
+        'events_per_year': float(len(events) / years),
+        'events_per_month': {int(m): int(n) for m, n in events['start'].dt.month.value_counts().sort_index().items()},
+        'total_mm': float(events['total_mm'].sum()),
+        'duration_hours': summary(events['duration_hours']),
+        'event_total_mm': summary(events['total_mm']),
+        'peak_rate_mm_h': summary(events['peak_rate_mm_h']),
+        'mean_intensity_mm_h': summary(events['mean_intensity_mm_h']),
+        'dry_spell_hours': summary(dry),
+        'longest_dry_spell': longest_dry
+    }
+
+
+def events_to_records(events):
+    """JSON-ready event rows"""
+    records = events.copy()
+    for col in ('start', 'end'):
+        records[col] = records[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return records.astype(object).where(records.notna(), None).to_dict(orient='records')
@@ -0,0 +1,36 @@
+"""
+Precipitation values of a processed DataFrame in time order.
+
+The event, extremes and event-wind analyses all work on int64/datetime64
+timestamps sorted once, with the rain and/or snow columns of the chosen
+precip type summed per row (missing values count as dry).
+"""
+import numpy as np
+
+from aggregates import PRECIP_COLUMNS, PRECIP_TYPES
+
+
+def check_precip_type(precip_type, allowed=PRECIP_TYPES):
+    if precip_type not in allowed:
+        raise ValueError(f"Invalid precip_type '{precip_type}'. Choose one of: {', '.join(allowed)}")
+
+
+def sorted_series(df, precip_type, mask=None):
+    """Sorted datetime64[ns] timestamps, the matching precipitation values and the sort order
+
+    `mask` selects rows first. The order is None when the rows were already
+    sorted; apply it to any other column read from the same rows.
+    """
+    check_precip_type(precip_type)
+    times = df['timestamp'].to_numpy().astype('datetime64[ns]')
+    values = np.zeros(len(df))
+    cols = PRECIP_COLUMNS.values() if precip_type == 'total' else [PRECIP_COLUMNS[precip_type]]
+    for col in cols:
+        values += np.nan_to_num(df[col].to_numpy(dtype=np.float64))
+    if mask is not None:
+        times, values = times[mask], values[mask]
+    order = None
+    if len(times) > 1 and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+    return times, values, order
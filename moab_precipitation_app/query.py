@@ -0,0 +1,274 @@
+"""
+Lazy queries over processed precipitation data.
+
+A Query names a source (a stored file, optionally with its DataFile id, or
+an already processed DataFrame), a column projection, a time window,
+month/season filters and an aggregation level. Nothing is read until
+execute(), which picks the cheapest plan for the whole query:
+
+1. monthly, seasonal or annual precipitation totals come from persisted
+   monthly aggregates when the window covers whole months: the
+   DatasetCache's memoized monthly table if the file is cached, else the
+   stored monthly_total rows;
+2. otherwise the cached processed DataFrame is filtered if the file is in
+   the cache (or the query needs the whole record anyway);
+3. otherwise DataProcessor reads the file with the projection and window
+   pushed down into the CSV reader, and gap filling is skipped when only
+   precipitation is asked for.
+
+Notebooks and scripts use it directly, e.g.
+
+    Query.from_file('moab.csv').select('Rain_mm').window('2005-01', '2019-12').aggregate('monthly').execute()
+
+and /process loads its data through the same engine. explain() lists the
+chosen plan.
+"""
+import copy
+import re
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from data_processor import DataProcessor
+
+TIME_COLUMNS = ['timestamp', 'Year', 'Month', 'Day', 'Season', 'WarmCold']
+SEASON_MONTHS = {'DJF': [12, 1, 2], 'MAM': [3, 4, 5], 'JJA': [6, 7, 8], 'SON': [9, 10, 11]}
+MONTH_SEASONS = {m: season for season, months in SEASON_MONTHS.items() for m in months}
+LEVELS = ('daily', 'monthly', 'seasonal', 'annual')
+GROUP_COLUMNS = {'daily': ['date'], 'monthly': ['Year', 'Month'], 'seasonal': ['SeasonYear', 'Season'],
+                 'annual': ['Year']}
+
+# Plan steps
+FROM_FRAME = 'frame'
+FROM_CACHED_MONTHLY = 'cached_monthly_totals'
+FROM_STORED_MONTHLY = 'stored_monthly_totals'
+FROM_CACHED_DATASET = 'cached_dataset'
+FROM_FILE = 'read_file'
+
+
+def window_bound(value, side='start'):
+    """Window bound as a Timestamp; 'YYYY' and 'YYYY-MM' cover the whole year or month"""
+    if value is None:
+        return None
+    if isinstance(value, str) and re.fullmatch(r'\d{4}(-\d{2})?', value.strip()):
+        period = pd.Period(value.strip(), freq='M' if '-' in value else 'Y')
+        return period.start_time if side == 'start' else period.end_time
+    return pd.Timestamp(value)
+
+
+class Query:
+    """Lazy, immutable query; every builder method returns a new Query"""
+
+    def __init__(self, path=None, frame=None, file_id=None, cache=None):
+        if (path is None) == (frame is None):
+            raise ValueError('A query needs exactly one source: a file path or a processed DataFrame')
+        self.path = path
+        self.frame = frame
+        self.file_id = file_id
+        self.cache = cache  # DatasetCache consulted for cached datasets and aggregates
+        self.columns = None
+        self.start = None
+        self.end = None
+        self.month_filter = None
+        self.level = None
+        self.fill = None  # None: fill gaps unless only precipitation is needed
+
+    @classmethod
+    def from_file(cls, path, cache=None):
+        return cls(path=path, cache=cache)
+
+    @classmethod
+    def from_data_file(cls, data_file, cache=None):
+        """Query over a stored upload; its persisted monthly totals can answer aggregate queries"""
+        return cls(path=data_file.file_path, file_id=data_file.id, cache=cache)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Query over a DataFrame already returned by DataProcessor.process()"""
+        return cls(frame=df)
+
+    def _with(self, **changes):
+        query = copy.copy(self)
+        query.__dict__.update(changes)
+        return query
+
+    def select(self, *columns):
+        """Project onto these variables (time columns are always kept)"""
+        return self._with(columns=list(columns) or None)
+
+    def window(self, start=None, end=None):
+        """Keep start <= timestamp <= end; 'YYYY' or 'YYYY-MM' bounds cover whole years/months"""
+        start, end = window_bound(start, 'start'), window_bound(end, 'end')
+        if start is not None and end is not None and start > end:
+            raise ValueError('Window start must not be after its end')
+        return self._with(start=start, end=end)
+
+    def months(self, *months):
+        months = sorted({int(m) for m in months})
+        if any(not 1 <= m <= 12 for m in months):
+            raise ValueError('Months must be between 1 and 12')
+        return self._with(month_filter=self._combine_months(months))
+
+    def seasons(self, *seasons):
+        unknown = [s for s in seasons if s not in SEASON_MONTHS]
+        if unknown:
+            raise ValueError(f"Unknown season(s): {', '.join(unknown)}. Choose from: {', '.join(SEASON_MONTHS)}")
+        return self._with(month_filter=self._combine_months(sorted({m for s in seasons for m in SEASON_MONTHS[s]})))
+
+    def _combine_months(self, months):
+        if self.month_filter is None:
+            return months or None
+        return [m for m in self.month_filter if m in months]
+
+    def aggregate(self, level):
+        """Totals per day, month, season or year (None for timestep rows)
+
+        Precipitation columns are summed and any other selected variable is
+        averaged; without a projection all precipitation columns are returned.
+        """
+        if level is not None and level not in LEVELS:
+            raise ValueError(f"Unknown aggregation level '{level}'. Choose one of: {', '.join(LEVELS)}")
+        return self._with(level=level)
+
+    def fill_gaps(self, enabled=True):
+        return self._with(fill=enabled)
+
+    # Planning
+
+    def _precip_only(self):
+        return self.columns is None or set(self.columns) <= set(aggregates.PRECIP_TYPES.values())
+
+    def _whole_months(self):
+        """Whether the window starts and ends on month boundaries"""
+        if self.start is not None and self.start != self.start.to_period('M').start_time:
+            return False
+        # Any timestamp in the last minute of the month counts as the month's end
+        if self.end is not None and self.end < self.end.to_period('M').end_time.floor('min'):
+            return False
+        return True
+
+    def _stored_monthly(self):
+        """Persisted monthly totals of the source file, or None"""
+        if self.file_id is None:
+            return None
+        import totals_store
+        try:
+            return totals_store.monthly_table(self.file_id)
+        except RuntimeError:
+            # No application context (e.g. a notebook without the app database)
+            return None
+
+    def _source(self):
+        """(plan step, table) for the cheapest source of this query"""
+        if self.frame is not None:
+            return FROM_FRAME, self.frame
+        if self.level in ('monthly', 'seasonal', 'annual') and self._precip_only() and self._whole_months():
+            if self.cache is not None and self.cache.contains(self.path):
+                return FROM_CACHED_MONTHLY, self.cache.aggregate(self.path, 'monthly', aggregates.monthly_totals)
+            stored = self._stored_monthly()
+            if stored is not None:
+                return FROM_STORED_MONTHLY, stored
+        whole_record = self.columns is None and self.start is None and self.end is None
+        if self.cache is not None and (whole_record or self.cache.contains(self.path)):
+            df, _ = self.cache.get(self.path)
+            return FROM_CACHED_DATASET, df
+        return FROM_FILE, None
+
+    def _fill_gaps(self):
+        return self.fill if self.fill is not None else not (self._precip_only() and self.columns is not None)
+
+    def explain(self):
+        """The plan execute() would run, as a list of steps"""
+        step, _ = self._source()
+        steps = [step]
+        if step == FROM_FILE:
+            steps.append(f"pushdown(columns={self.columns or 'all'}, start={self.start}, end={self.end}, "
+                         f"fill_gaps={self._fill_gaps()})")
+        elif self.start is not None or self.end is not None:
+            steps.append(f'window({self.start}, {self.end})')
+        if self.month_filter:
+            steps.append(f'months({self.month_filter})')
+        if self.columns and step not in (FROM_CACHED_MONTHLY, FROM_STORED_MONTHLY):
+            steps.append(f'select({self.columns})')
+        if self.level:
+            steps.append(f'aggregate({self.level})')
+        return steps
+
+    # Execution
+
+    def execute(self):
+        """Run the query and return a DataFrame
+
+        Results drawn from cached data are shared with the cache and must not
+        be modified in place.
+        """
+        step, table = self._source()
+        if step in (FROM_CACHED_MONTHLY, FROM_STORED_MONTHLY):
+            return self._from_monthly(table)
+        if step == FROM_FILE:
+            # Derived precipitation columns are not read from the file
+            columns = None if self.columns is None else [c for c in self.columns if c not in aggregates.PRECIP_TYPES.values()]
+            table, _ = DataProcessor(self.path, columns=columns, start=self.start, end=self.end,
+                                     fill_gaps=self._fill_gaps()).process()
+        return self._from_rows(table)
+
+    def _output_columns(self, available):
+        columns = self.columns or (list(aggregates.PRECIP_TYPES.values()) if self.level else None)
+        if columns is None:
+            return None
+        missing = [c for c in columns if c not in available and c != 'Precip_Total_mm']
+        if missing:
+            raise ValueError(f"Unknown column(s): {', '.join(missing)}")
+        return list(columns)
+
+    def _from_rows(self, df):
+        mask = None
+        if self.start is not None:
+            mask = (df['timestamp'] >= self.start).to_numpy()
+        if self.end is not None:
+            end_mask = (df['timestamp'] <= self.end).to_numpy()
+            mask = end_mask if mask is None else mask & end_mask
+        if self.month_filter:
+            month_mask = np.isin(df['Month'].to_numpy(), self.month_filter)
+            mask = month_mask if mask is None else mask & month_mask
+        if mask is not None:
+            df = df[mask]
+
+        columns = self._output_columns(df.columns)
+        if columns is None and self.level is None:
+            # The whole processed frame; returned as is when nothing was filtered
+            return df
+        if 'Precip_Total_mm' in columns:
+            df = df.assign(Precip_Total_mm=df['Rain_mm'] + df['Snow_mm'])
+        if self.level is None:
+            return df[[c for c in TIME_COLUMNS if c in df.columns] + [c for c in columns if c not in TIME_COLUMNS]]
+
+        if self.level == 'daily':
+            df = df.assign(date=df['timestamp'].dt.normalize())
+        elif self.level == 'seasonal':
+            df = df.assign(SeasonYear=np.where(df['Month'] == 12, df['Year'] + 1, df['Year']))
+        return self._group(df, columns)
+
+    def _from_monthly(self, monthly):
+        month_starts = pd.to_datetime(pd.DataFrame({'year': monthly['Year'], 'month': monthly['Month'], 'day': 1}))
+        mask = np.ones(len(monthly), dtype=bool)
+        if self.start is not None:
+            mask &= (month_starts >= self.start).to_numpy()
+        if self.end is not None:
+            mask &= (month_starts <= self.end).to_numpy()
+        if self.month_filter:
+            mask &= np.isin(monthly['Month'].to_numpy(), self.month_filter)
+        monthly = monthly[mask]
+
+        columns = self._output_columns(monthly.columns)
+        if self.level == 'monthly':
+            return monthly[['Year', 'Month'] + columns].reset_index(drop=True)
+        if self.level == 'seasonal':
+            monthly = monthly.assign(SeasonYear=np.where(monthly['Month'] == 12, monthly['Year'] + 1, monthly['Year']),
+                                     Season=monthly['Month'].map(MONTH_SEASONS))
+        return self._group(monthly, columns)
+
+    def _group(self, df, columns):
+        how = {c: ('sum' if c in aggregates.PRECIP_TYPES.values() else 'mean') for c in columns}
+        return df.groupby(GROUP_COLUMNS[self.level])[columns].agg(how).reset_index()
@@ -0,0 +1,165 @@
+"""
+Background reclamation of soft-deleted files.
+
+/delete_file only marks a DataFile inactive. Once a file has been deleted
+for longer than the retention period, this job removes its database rows
+(file entry, stored totals and climatology baselines), the raw upload and every artifact derived
+from it (shared processed dataset, cached plots). A stored file shared by
+deduplicated uploads is only removed when no remaining entry uses it, and a
+file that a request is currently reading is skipped until the next run.
+Stale partial uploads are cleaned up as well.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from models import db, DataFile, MonthlyTotal, DailyTotal
+from storage import FileLocks
+import baselines
+
+# Partial uploads (.upload-*.part) older than this are abandoned
+STALE_PART_SECONDS = 3600
+
+# File locks are only available on POSIX; without them every worker may run the job
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class Reclaimer:
+    """Periodic removal of files deleted longer than `retention` ago.
+
+    `release_artifacts(data_file)` removes the derived artifacts of a stored
+    file and returns {category: bytes freed}. Across worker processes only
+    one run happens at a time (guarded by a lock file).
+    """
+
+    def __init__(self, app, upload_folder, lock_dir, release_artifacts, retention, interval):
+        self.app = app
+        self.upload_folder = upload_folder
+        self.release_artifacts = release_artifacts
+        self.retention = retention
+        self.interval = interval
+        self.file_locks = FileLocks(os.path.join(lock_dir, 'files'))
+        self._run_lock_path = os.path.join(lock_dir, 'reclaim.lock')
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_report = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='reclaimer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.run()
+            except Exception as e:
+                print(f"Reclamation failed: {e}", file=sys.stderr, flush=True)
+                print(traceback.format_exc(), file=sys.stderr, flush=True)
+
+    def run(self, now=None):
+        """Reclaim expired files now; returns a report, or None if another worker is running"""
+        with open(self._run_lock_path, 'a') as run_lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(run_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            try:
+                report = self._reclaim(now or datetime.utcnow())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(run_lock, fcntl.LOCK_UN)
+        self.last_report = report
+        print(f"Reclaimed {report['bytes_reclaimed']} bytes: {report['rows_removed']} file entries, "
+              f"{report['files_removed']} stored files ({report['skipped_in_use']} in use)", flush=True)
+        return report
+
+    def _reclaim(self, now):
+        started = time.time()
+        cutoff = now - self.retention
+        report = {
+            'started_at': now.isoformat(),
+            'rows_removed': 0,
+            'files_removed': 0,
+            'skipped_in_use': 0,
+            'bytes_by_category': {'uploads': 0, 'partial_uploads': 0},
+        }
+
+        # Entries deleted before deletion times were recorded start their retention now
+        DataFile.query.filter(DataFile.is_active.is_(False), DataFile.deleted_at.is_(None)).update(
+            {'deleted_at': now}, synchronize_session=False)
+        db.session.commit()
+
+        expired = (DataFile.query
+                   .filter(DataFile.is_active.is_(False), DataFile.deleted_at <= cutoff)
+                   .order_by(DataFile.id)
+                   .all())
+        by_path = {}
+        for data_file in expired:
+            by_path.setdefault(data_file.file_path, []).append(data_file)
+
+        for file_path, rows in by_path.items():
+            expired_ids = [r.id for r in rows]
+            # Keep a stored file while any other entry (active or recently deleted) uses it
+            still_used = (DataFile.query
+                          .filter(DataFile.file_path == file_path, DataFile.id.notin_(expired_ids))
+                          .first() is not None)
+            if not still_used:
+                with self.file_locks.removing(file_path) as free:
+                    if not free:
+                        report['skipped_in_use'] += 1
+                        continue
+                    if os.path.exists(file_path):
+                        for category, freed in self.release_artifacts(rows[0]).items():
+                            report['bytes_by_category'][category] = report['bytes_by_category'].get(category, 0) + freed
+                        size = os.path.getsize(file_path)
+                        os.remove(file_path)
+                        report['bytes_by_category']['uploads'] += size
+                        report['files_removed'] += 1
+            for model in (MonthlyTotal, DailyTotal):
+                db.session.execute(db.delete(model).where(model.file_id.in_(expired_ids)))
+            baselines.delete_file_baselines(expired_ids)
+            db.session.execute(db.delete(DataFile).where(DataFile.id.in_(expired_ids)))
+            db.session.commit()
+            report['rows_removed'] += len(expired_ids)
+
+        report['bytes_by_category']['partial_uploads'] += self._remove_stale_parts()
+        report['bytes_reclaimed'] = sum(report['bytes_by_category'].values())
+        report['seconds'] = round(time.time() - started, 2)
+        return report
+
+    def _remove_stale_parts(self):
+        freed = 0
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.upload_folder))
+        except OSError:
+            return 0
+        for entry in entries:
+            if not (entry.name.startswith('.upload-') and entry.name.endswith('.part')):
+                continue
+            try:
+                st = entry.stat()
+                if now - st.st_mtime > STALE_PART_SECONDS:
+                    os.remove(entry.path)
+                    freed += st.st_size
+            except OSError:
+                pass
+        return freed
+
+    def pending(self, now=None):
+        """Number of deleted entries waiting for the retention period to pass"""
+        cutoff = (now or datetime.utcnow()) - self.retention
+        return DataFile.query.filter(DataFile.is_active.is_(False), DataFile.deleted_at > cutoff).count()
+
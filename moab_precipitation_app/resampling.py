@@ -0,0 +1,89 @@
+"""
+Batched bootstrap and permutation resampling for two-sample comparisons.
+
+All resample indices of a chunk are drawn in a single NumPy call and the
+statistics of every resample are computed with axis-wise reductions, so
+10,000 resamples of a few hundred monthly totals take milliseconds rather
+than a Python loop per resample. Chunking bounds peak memory at
+chunk_size x sample_size values. Results are reproducible for a given seed.
+"""
+import numpy as np
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _chunks(n_resamples, chunk_size):
+    for start in range(0, n_resamples, chunk_size):
+        yield min(chunk_size, n_resamples - start)
+
+
+def _cohens_d(mean_a, std_a, mean_b, std_b):
+    """Cohen's d with the pooled std used by aggregates (population std of each sample)"""
+    pooled = np.sqrt((std_a ** 2 + std_b ** 2) / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(pooled > 0, (mean_a - mean_b) / pooled, 0.0)
+
+
+def bootstrap_differences(a, b, n_resamples=DEFAULT_RESAMPLES, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bootstrap distributions of mean(a) - mean(b) and Cohen's d, resampling each sample independently"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    diffs = np.empty(n_resamples)
+    ds = np.empty(n_resamples)
+    pos = 0
+    for size in _chunks(n_resamples, chunk_size):
+        sample_a = a[rng.integers(0, len(a), size=(size, len(a)))]
+        sample_b = b[rng.integers(0, len(b), size=(size, len(b)))]
+        mean_a, mean_b = sample_a.mean(axis=1), sample_b.mean(axis=1)
+        diffs[pos:pos + size] = mean_a - mean_b
+        ds[pos:pos + size] = _cohens_d(mean_a, sample_a.std(axis=1), mean_b, sample_b.std(axis=1))
+        pos += size
+    return diffs, ds
+
+
+def permutation_pvalue(a, b, n_resamples=DEFAULT_RESAMPLES, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Two-sided permutation p-value for a difference in means.
+
+    Each resample shuffles the pooled values (one batched Generator.permuted
+    call per chunk) and splits them into groups of the original sizes. The
+    +1 correction keeps the p-value away from an impossible zero.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    pooled = np.concatenate([a, b])
+    observed = abs(a.mean() - b.mean())
+    rng = np.random.default_rng(seed)
+    n_a = len(a)
+    extreme = 0
+    for size in _chunks(n_resamples, chunk_size):
+        shuffled = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+        diffs = shuffled[:, :n_a].mean(axis=1) - shuffled[:, n_a:].mean(axis=1)
+        # Tolerance so ties with the observed statistic count despite float rounding
+        extreme += int(np.count_nonzero(np.abs(diffs) >= observed - 1e-12))
+    return (extreme + 1) / (n_resamples + 1)
+
+
+def resampled_statistics(a, b, n_resamples=DEFAULT_RESAMPLES, seed=0, chunk_size=DEFAULT_CHUNK_SIZE,
+                         confidence=0.95):
+    """Percentile bootstrap intervals and a permutation p-value for two samples"""
+    if len(a) < 2 or len(b) < 2 or n_resamples < 1:
+        return {}
+    # Independent streams for the bootstrap and the permutation test
+    boot_seed, perm_seed = np.random.SeedSequence(seed).spawn(2)
+    diffs, ds = bootstrap_differences(a, b, n_resamples, boot_seed, chunk_size)
+    tail = (1 - confidence) / 2 * 100
+    diff_low, diff_high = np.percentile(diffs, [tail, 100 - tail])
+    d_low, d_high = np.percentile(ds, [tail, 100 - tail])
+    return {
+        'mean_difference': float(np.mean(a) - np.mean(b)),
+        'mean_difference_ci_low': float(diff_low),
+        'mean_difference_ci_high': float(diff_high),
+        'cohens_d_ci_low': float(d_low),
+        'cohens_d_ci_high': float(d_high),
+        'permutation_pvalue': float(permutation_pvalue(a, b, n_resamples, perm_seed, chunk_size)),
+        'confidence_level': confidence,
+        'n_resamples': n_resamples,
+        'seed': seed
+    }
@@ -0,0 +1,175 @@
+"""
+Processed datasets shared between worker processes.
+
+The first process to need a processed file writes its columns as .npy files
+to a shared directory (tmpfs such as /dev/shm when available, otherwise a
+file-backed cache directory). Every worker then memory-maps those files
+read-only, so numeric and timestamp columns live once in the OS page cache
+instead of once per worker. Text columns are stored as integer codes plus a
+small label table and rebuilt per process.
+
+A dataset is removed with release() once no active DataFile uses its file;
+workers that still have it mapped keep a valid view until they drop it.
+
+Sharing is best-effort: when the directory is full (ENOSPC on /dev/shm) or
+not writable, the error is logged and the worker keeps its private copy.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from storage import directory_size
+
+# File locks are only available on POSIX; elsewhere two workers may build the same dataset
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+META_NAME = 'meta.json'
+# Version of the processed frame layout; bump it whenever DataProcessor.process()
+# output changes (columns, dtypes, cleaning) so datasets left in /dev/shm by an
+# older deploy are rebuilt instead of mapped
+SCHEMA_VERSION = 1
+
+
+def default_shared_dir(cache_folder):
+    """tmpfs-backed directory when the OS has one, else a directory under the cache folder"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return os.path.join('/dev/shm', 'moab_precipitation_datasets')
+    return os.path.join(cache_folder, 'datasets')
+
+
+def dataset_id(filepath):
+    """Stable id of a stored file's current contents (path, size and modification time)
+    as processed by the current SCHEMA_VERSION"""
+    st = os.stat(filepath)
+    key = f'{os.path.abspath(filepath)}:{st.st_mtime_ns}:{st.st_size}:v{SCHEMA_VERSION}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+class SharedDatasetStore:
+    """Directory of memory-mappable processed datasets, one subdirectory per dataset id"""
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def _dir(self, ds_id):
+        return os.path.join(self.root_dir, ds_id)
+
+    def exists(self, ds_id):
+        return os.path.exists(os.path.join(self._dir(ds_id), META_NAME))
+
+    def load(self, ds_id):
+        """Return (df, precip_col) backed by read-only memory maps, or None if not stored"""
+        directory = self._dir(ds_id)
+        try:
+            with open(os.path.join(directory, META_NAME)) as f:
+                meta = json.load(f)
+            columns = {}
+            for col in meta['columns']:
+                values = np.load(os.path.join(directory, f"{col['file']}.npy"), mmap_mode='r')
+                if col['kind'] == 'labels':
+                    labels = np.array(col['labels'], dtype=object)
+                    values = pd.array(labels[values], dtype=col['dtype'])
+                columns[col['name']] = values
+        except (OSError, ValueError, KeyError):
+            return None
+        return pd.DataFrame(columns, copy=False), meta.get('precip_col')
+
+    def save(self, ds_id, df, precip_col):
+        """Write a processed DataFrame; a dataset written concurrently by another worker wins
+        
+        Returns whether the dataset is stored. Write failures (a full or
+        read-only directory) are logged and the partial files removed.
+        """
+        final_dir = self._dir(ds_id)
+        tmp_dir = os.path.join(self.root_dir, f'.{ds_id}.{uuid.uuid4().hex}.tmp')
+        try:
+            os.makedirs(tmp_dir)
+            meta = {'precip_col': precip_col, 'rows': int(len(df)), 'columns': []}
+            for i, name in enumerate(df.columns):
+                series = df[name]
+                col = {'name': name, 'file': f'c{i}', 'dtype': str(series.dtype)}
+                if series.dtype.kind in 'biufcmM':
+                    values = series.to_numpy()
+                    col['kind'] = 'array'
+                else:
+                    codes, labels = pd.factorize(series, use_na_sentinel=False)
+                    values = codes.astype(np.int32)
+                    col['kind'] = 'labels'
+                    col['labels'] = [None if pd.isna(v) else str(v) for v in labels]
+                np.save(os.path.join(tmp_dir, f"{col['file']}.npy"), np.ascontiguousarray(values))
+                meta['columns'].append(col)
+            # meta.json is written last and marks the dataset as complete
+            with open(os.path.join(tmp_dir, META_NAME), 'w') as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, final_dir)
+        except OSError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if self.exists(ds_id):
+                return True
+            print(f"Shared dataset write failed, keeping a private copy: {e}", file=sys.stderr, flush=True)
+            return False
+        return True
+
+    def get_or_create(self, ds_id, build_fn):
+        """Load a dataset, building it with build_fn() -> (df, precip_col) if no worker has yet"""
+        result = self.load(ds_id)
+        if result is not None:
+            return result
+        lock_path = os.path.join(self.root_dir, f'.{ds_id}.lock')
+        try:
+            lock_file = open(lock_path, 'a')
+        except OSError as e:
+            print(f"Shared dataset lock unavailable, keeping a private copy: {e}", file=sys.stderr, flush=True)
+            return build_fn()
+        with lock_file:
+            if fcntl is not None:
+                # Other workers wait here instead of processing the same file
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                result = self.load(ds_id)
+                if result is None:
+                    df, precip_col = build_fn()
+                    if self.save(ds_id, df, precip_col):
+                        result = self.load(ds_id)
+                    if result is None:
+                        # Not shared; serve the in-process frame
+                        result = (df, precip_col)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return result
+
+    def release(self, ds_id):
+        """Remove a dataset and return the bytes freed; existing memory maps stay valid until dropped"""
+        freed = directory_size(self._dir(ds_id))
+        shutil.rmtree(self._dir(ds_id), ignore_errors=True)
+        try:
+            os.remove(os.path.join(self.root_dir, f'.{ds_id}.lock'))
+        except OSError:
+            pass
+        return freed
+
+    def usage(self):
+        """Number of stored datasets and their total size in bytes"""
+        count = 0
+        total = 0
+        for entry in os.scandir(self.root_dir):
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            count += 1
+            for f in os.scandir(entry.path):
+                try:
+                    total += f.stat().st_size
+                except OSError:
+                    pass
+        return {'datasets': count, 'bytes': total}
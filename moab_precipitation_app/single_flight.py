@@ -0,0 +1,169 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+When several identical requests arrive together (e.g. a team opening the same
+dashboard), only one of them runs the computation and the others receive its
+result. Within a process this uses a per-key event; across worker processes
+the leader holds an exclusive lock file for the key and publishes its result
+to a shared directory for a short time, where processes that were already
+waiting on the lock pick it up instead of recomputing. Later requests never
+reuse a published result, so they always see current state.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+# File locks are only available on POSIX; elsewhere coalescing is per process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def request_key(name, params):
+    """Stable key for a request name and its normalized (JSON-serializable) parameters"""
+    payload = json.dumps([name, params], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """An in-flight computation that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time and share its result.
+
+    `lock_dir` enables cross-process coalescing; results are stored there as
+    JSON for `result_ttl` seconds, so computations must return
+    JSON-serializable values. `publish_if` can restrict which results are
+    shared across processes (e.g. only successful responses). Results
+    published under a tag (e.g. a file id) can be dropped with discard().
+    """
+
+    def __init__(self, lock_dir=None, result_ttl=15, publish_if=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.result_ttl = result_ttl
+        self.publish_if = publish_if
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, tag=None):
+        """Return fn()'s result, sharing it with concurrent callers using the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_shared(key, fn, tag)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run_shared(self, key, fn, tag=None):
+        """Coordinate with other processes through a lock file and a published result"""
+        if not self.lock_dir:
+            return fn()
+
+        lock_path = os.path.join(self.lock_dir, f'{key}.lock')
+        result_path = os.path.join(self.lock_dir, f'{self._tag_prefix(tag)}{key}.json')
+        waiting_since = time.time_ns()
+        with open(lock_path, 'a') as lock_file:
+            # Blocks while another process computes the same key
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                os.utime(lock_path)  # Keep in-use lock files from being pruned
+                published = self._read_result(result_path, waiting_since)
+                if published is not None:
+                    return published
+                result = fn()
+                if self.publish_if is None or self.publish_if(result):
+                    self._publish(result_path, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_result(self, result_path, waiting_since):
+        """A result published while the caller waited for the lock, or None"""
+        try:
+            published_at = os.stat(result_path).st_mtime_ns
+            if published_at < waiting_since or time.time_ns() - published_at > self.result_ttl * 1e9:
+                return None
+            with open(result_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _publish(self, result_path, result):
+        tmp_path = f'{result_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, result_path)
+        except (OSError, TypeError, ValueError):
+            # Publishing is best effort; other processes will compute themselves
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._prune()
+
+    @staticmethod
+    def _tag_prefix(tag):
+        """File name prefix of the results published under a tag (tags may be client input)"""
+        if tag is None:
+            return ''
+        return hashlib.sha256(str(tag).encode('utf-8')).hexdigest()[:16] + '-'
+
+    def discard(self, tag):
+        """Remove the results published under a tag"""
+        if not self.lock_dir:
+            return
+        prefix = self._tag_prefix(tag)
+        try:
+            entries = list(os.scandir(self.lock_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.name.endswith('.json'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        """Remove expired results and lock files that have not been used for a while"""
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.lock_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                age = now - entry.stat().st_mtime
+                if entry.name.endswith('.json') and age > self.result_ttl:
+                    os.remove(entry.path)
+                elif entry.name.endswith('.lock') and age > self.result_ttl * 20:
+                    os.remove(entry.path)
+            except OSError:
+                pass
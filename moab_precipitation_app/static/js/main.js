@@ -1,4 +1,6 @@
 let selectedFileId = null;
+let lastProcessRequest = null;  // Parameters of the last /process call, reused for lazy full renders
+let fullRenderObserver = null;
 
 // File selection change handler
 document.getElementById('fileSelect').addEventListener('change', function(e) {
@@ -9,13 +11,97 @@ document.getElementById('fileSelect').addEventListener('change', function(e) {
         const rows = option.getAttribute('data-rows');
         const start = option.getAttribute('data-start');
         const end = option.getAttribute('data-end');
+        const warmStatus = option.getAttribute('data-warm-status');
         document.getElementById('fileInfo').innerHTML = 
-            `<small>Rows: ${rows} | Date Range: ${start} to ${end}</small>`;
+            `<small>Rows: ${rows} | Date Range: ${start} to ${end}${warmStatusText(warmStatus) ? ' | ' + warmStatusText(warmStatus) : ''}</small>`;
     } else {
         document.getElementById('fileInfo').innerHTML = '';
     }
 });
 
+// Cache warming status shown on the file list
+const WARM_STATUS_LABELS = {
+    pending: 'preparing plots...',
+    warming: 'preparing plots...',
+    ready: 'ready',
+    failed: ''
+};
+
+function warmStatusText(status) {
+    return WARM_STATUS_LABELS[status] || '';
+}
+
+function updateWarmStatus(option, status) {
+    option.setAttribute('data-warm-status', status || '');
+    const text = warmStatusText(status);
+    option.textContent = option.getAttribute('data-label') + (text ? ` - ${text}` : '');
+    if (option.selected) {
+        document.getElementById('fileSelect').dispatchEvent(new Event('change'));
+    }
+}
+
+// Poll files whose default plots are still being pre-rendered after upload
+function pollWarmStatus() {
+    const options = Array.from(document.querySelectorAll('#fileSelect option[data-warm-status]'))
+        .filter(option => ['pending', 'warming'].includes(option.getAttribute('data-warm-status')));
+    if (options.length === 0) {
+        return;
+    }
+    Promise.all(options.map(option =>
+        fetch(`/file_status/${option.value}`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (data) {
+                    updateWarmStatus(option, data.warm_status);
+                }
+            })
+            .catch(() => {})
+    )).then(() => setTimeout(pollWarmStatus, 3000));
+}
+
+pollWarmStatus();
+
+// Append the next page of the file catalog to the file list
+function loadMoreFiles() {
+    const button = document.getElementById('loadMoreFiles');
+    const cursor = button.getAttribute('data-cursor');
+    button.disabled = true;
+    fetch(`/api/files?cursor=${encodeURIComponent(cursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            const fileSelect = document.getElementById('fileSelect');
+            const stationSelect = document.getElementById('stationSelect');
+            data.files.forEach(file => {
+                fileSelect.appendChild(createFileOption(file));
+                stationSelect.appendChild(new Option(createFileOption(file).getAttribute('data-label'), file.id));
+            });
+            button.setAttribute('data-cursor', data.next_cursor || '');
+            button.classList.toggle('d-none', !data.has_more);
+        })
+        .catch(error => {
+            document.getElementById('fileInfo').innerHTML =
+                `<small class="text-danger">Could not load more files: ${error.message}</small>`;
+        })
+        .finally(() => {
+            button.disabled = false;
+        });
+}
+
+function createFileOption(file) {
+    const option = document.createElement('option');
+    const uploaded = file.uploaded_at ? file.uploaded_at.slice(0, 16).replace('T', ' ') : 'N/A';
+    option.value = file.id;
+    option.setAttribute('data-rows', file.rows_count);
+    option.setAttribute('data-start', file.date_range_start || 'N/A');
+    option.setAttribute('data-end', file.date_range_end || 'N/A');
+    option.setAttribute('data-label', `${file.filename} (Uploaded: ${uploaded})`);
+    updateWarmStatus(option, file.warm_status);
+    return option;
+}
+
 // Generate all checkbox handler
 document.getElementById('generateAll').addEventListener('change', function(e) {
     const plotOptions = document.getElementById('plotOptions');
@@ -68,6 +154,7 @@ function uploadFile() {
                 `<div class="alert alert-success">
                     <strong>Success!</strong> File "${data.filename}" uploaded successfully.<br>
                     Rows: ${data.rows_count} | Date Range: ${data.date_range}
+                    ${data.duplicate_of ? '<br><small>Identical content was already stored; the existing copy was reused.</small>' : ''}
                 </div>`;
             fileInput.value = '';
             // Reload page after 2 seconds to show new file
@@ -124,6 +211,11 @@ function generatePlots() {
     const climStart = document.getElementById('climStart').value;
     const climEnd = document.getElementById('climEnd').value;
     
+    // Get output encoding
+    const outputFormat = document.getElementById('outputFormat').value;
+    const quality = document.getElementById('plotQuality').value;
+    const progressive = document.getElementById('progressiveLoading').checked;
+    
     const data = {
         file_id: parseInt(selectedFileId),
         months: months,
@@ -134,8 +226,12 @@ function generatePlots() {
         op_start: opStart,
         op_end: opEnd,
         clim_start: climStart,
-        clim_end: climEnd
+        clim_end: climEnd,
+        output_format: outputFormat,
+        quality: quality,
+        progressive: progressive
     };
+    lastProcessRequest = data;
     
     const generateSpinner = document.getElementById('generateSpinner');
     const resultsDiv = document.getElementById('results');
@@ -181,7 +277,10 @@ function generatePlots() {
     .then(data => {
         generateSpinner.classList.add('d-none');
         if (data.success && data.plots) {
-            displayPlots(data.plots, data.comparison_plots, data.comparison_stats);
+            displayPlots(data.plots, data.comparison_plots, data.comparison_stats, data.plot_formats);
+            if (data.progressive) {
+                observeFullRenders(resultsDiv);
+            }
         } else if (data.error) {
             resultsDiv.innerHTML = `<div class="col-12"><div class="alert alert-danger">Error: ${data.error}</div></div>`;
         } else {
@@ -195,7 +294,127 @@ function generatePlots() {
     });
 }
 
-function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}) {
+function analyzeEventWind() {
+    if (!selectedFileId) {
+        alert('Please select a file from the database');
+        return;
+    }
+    
+    const months = Array.from(document.querySelectorAll('.month-check:checked'))
+        .map(cb => cb.value);
+    const params = new URLSearchParams({
+        precip_type: document.getElementById('eventPrecipType').value,
+        hours_before: document.getElementById('eventHoursBefore').value || '0',
+        hours_after: document.getElementById('eventHoursAfter').value || '0',
+        months: months.join(','),
+        limit: '0',
+        plot: '1'
+    });
+    
+    const spinner = document.getElementById('eventWindSpinner');
+    const resultsDiv = document.getElementById('eventWindResults');
+    spinner.classList.remove('d-none');
+    resultsDiv.innerHTML = '';
+    
+    fetch(`/event_wind/${selectedFileId}?${params}`)
+    .then(response => response.json())
+    .then(data => {
+        spinner.classList.add('d-none');
+        if (!data.success) {
+            resultsDiv.innerHTML = `<div class="alert alert-danger">Error: ${data.error || 'Unknown error'}</div>`;
+            return;
+        }
+        resultsDiv.innerHTML = createEventWindSummary(data);
+    })
+    .catch(error => {
+        spinner.classList.add('d-none');
+        resultsDiv.innerHTML = `<div class="alert alert-danger">Error: ${error.message}</div>`;
+    });
+}
+
+function createEventWindSummary(data) {
+    const s = data.summary;
+    const unit = s.speed_unit ? ` ${s.speed_unit}` : '';
+    const fmt = (value, digits = 1) => value === null ? '-' : `${value.toFixed(digits)}${unit}`;
+    let html = `<div class="table-responsive"><table class="table table-bordered table-sm"><tbody>
+        <tr><th>Events</th><td>${s.events} (${s.events_with_wind} with wind data in the window)</td></tr>
+        <tr><th>Mean wind speed</th><td>${fmt(s.mean_speed)}</td></tr>
+        <tr><th>Median / highest window maximum</th><td>${fmt(s.median_max_speed)} / ${fmt(s.max_speed)}</td></tr>
+        <tr><th>Lowest window minimum</th><td>${fmt(s.min_speed)}</td></tr>
+        <tr><th>Highest gust</th><td>${fmt(s.max_gust)}</td></tr>
+        <tr><th>Vector-mean direction</th><td>${s.mean_direction === null ? '-' : s.mean_direction.toFixed(0) + '&deg;'}</td></tr>
+    </tbody></table></div>`;
+    if (data.plot) {
+        html += `<img src="data:${data.format};base64,${data.plot}" class="img-fluid" alt="Event wind rose">`;
+    }
+    return html;
+}
+
+function compareStations() {
+    const selected = Array.from(document.getElementById('stationSelect').selectedOptions)
+        .map(option => parseInt(option.value));
+    if (selected.length < 2) {
+        alert('Please select at least two files to compare');
+        return;
+    }
+    const precipType = document.getElementById('stationPrecipType').value;
+    
+    const spinner = document.getElementById('stationSpinner');
+    const resultsDiv = document.getElementById('stationResults');
+    spinner.classList.remove('d-none');
+    resultsDiv.innerHTML = '';
+    
+    fetch('/process_multi', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            file_ids: selected,
+            reference_id: selected[0],
+            precip_types: [precipType],
+            min_coverage: (parseFloat(document.getElementById('stationCoverage').value) || 80) / 100
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        spinner.classList.add('d-none');
+        if (!data.success) {
+            resultsDiv.innerHTML = `<div class="alert alert-danger">Error: ${data.error || 'Unknown error'}</div>`;
+            return;
+        }
+        resultsDiv.innerHTML = createStationSummary(data, precipType);
+    })
+    .catch(error => {
+        spinner.classList.add('d-none');
+        resultsDiv.innerHTML = `<div class="alert alert-danger">Error: ${error.message}</div>`;
+    });
+}
+
+function createStationSummary(data, precipType) {
+    const names = {};
+    data.stations.forEach(s => { names[s.id] = s.filename || `File ${s.id}`; });
+    const fmt = (value, digits = 2) => value === null ? '-' : value.toFixed(digits);
+    const precip = data.precip[precipType];
+    let html = `<p class="text-muted">${data.common_months} common months (${data.first_month} to ${data.last_month}),
+        reference: ${names[data.reference_id]}</p>
+        <div class="table-responsive"><table class="table table-bordered table-sm">
+        <thead><tr><th>File</th><th>Pearson r</th><th>Spearman r</th><th>Bias (mm)</th><th>Bias (%)</th>
+        <th>MAE (mm)</th><th>RMSE (mm)</th></tr></thead><tbody>`;
+    precip.vs_reference.forEach(row => {
+        html += `<tr><td>${names[row.file_id]}</td><td>${fmt(row.pearson, 3)}</td><td>${fmt(row.spearman, 3)}</td>
+            <td>${fmt(row.bias_mm)}</td><td>${fmt(row.relative_bias_pct, 1)}</td>
+            <td>${fmt(row.mae_mm)}</td><td>${fmt(row.rmse_mm)}</td></tr>`;
+    });
+    html += '</tbody></table></div>';
+    ['station_climatology', 'station_series'].forEach(plotType => {
+        const key = `${precipType}_${plotType}`;
+        if (data.plots[key]) {
+            html += `<img src="data:${data.plot_formats[key]};base64,${data.plots[key]}" class="img-fluid mb-3" alt="${plotType}">`;
+        }
+    });
+    return html;
+}
+
+function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}, plotFormats = {}) {
     const resultsDiv = document.getElementById('results');
     resultsDiv.innerHTML = '';
     
@@ -223,7 +442,7 @@ function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}) {
         rainSection.querySelector('.card').appendChild(rainContainer);
         
         Object.keys(rainPlots).forEach(plotName => {
-            const plotDiv = createPlotCard('Rain', plotName, rainPlots[plotName]);
+            const plotDiv = createPlotCard('Rain', plotName, rainPlots[plotName], plotFormats[`rain_${plotName}`]);
             rainContainer.appendChild(plotDiv);
         });
     }
@@ -240,7 +459,7 @@ function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}) {
         snowSection.querySelector('.card').appendChild(snowContainer);
         
         Object.keys(snowPlots).forEach(plotName => {
-            const plotDiv = createPlotCard('Snow', plotName, snowPlots[plotName]);
+            const plotDiv = createPlotCard('Snow', plotName, snowPlots[plotName], plotFormats[`snow_${plotName}`]);
             snowContainer.appendChild(plotDiv);
         });
     }
@@ -271,7 +490,7 @@ function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}) {
         
         Object.keys(comparisonPlots).forEach(plotKey => {
             if (comparisonPlots[plotKey]) {
-                const plotDiv = createComparisonPlotCard(plotKey, comparisonPlots[plotKey]);
+                const plotDiv = createComparisonPlotCard(plotKey, comparisonPlots[plotKey], plotFormats[plotKey]);
                 plotsRow.appendChild(plotDiv);
             }
         });
@@ -282,11 +501,61 @@ function displayPlots(plots, comparisonPlots = {}, comparisonStats = {}) {
     }
 }
 
+function observeFullRenders(container) {
+    // Replace preview images with full-quality renders as they scroll into view
+    if (fullRenderObserver) {
+        fullRenderObserver.disconnect();
+    }
+    const previews = container.querySelectorAll('img.plot-preview');
+    if (!('IntersectionObserver' in window)) {
+        previews.forEach(img => loadFullRender(img));
+        return;
+    }
+    fullRenderObserver = new IntersectionObserver((entries, observer) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                loadFullRender(entry.target);
+            }
+        });
+    }, {rootMargin: '200px'});
+    previews.forEach(img => fullRenderObserver.observe(img));
+}
+
+function loadFullRender(img) {
+    const data = Object.assign({}, lastProcessRequest, {
+        plot_type: img.dataset.plotType,
+        precip_type: img.dataset.precipType
+    });
+    
+    fetch('/render_plot', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(data)
+    })
+    .then(response => response.json())
+    .then(result => {
+        if (result.success && result.plot) {
+            img.src = `data:${result.format};base64,${result.plot}`;
+            img.classList.remove('plot-preview');
+        } else {
+            console.error('Full render failed:', result.error);
+        }
+    })
+    .catch(error => console.error('Full render failed:', error));
+}
+
 function createStatsTable(stats) {
-    let html = '<h5>Statistical Test Results</h5><div class="table-responsive"><table class="table table-bordered table-sm"><thead><tr><th>Precipitation Type</th><th>Operating Mean (mm)</th><th>Climatology Mean (mm)</th><th>t-test p-value</th><th>Mann-Whitney p-value</th><th>KS-test p-value</th><th>Cohen\'s d</th><th>Significant?</th></tr></thead><tbody>';
+    let html = '<h5>Statistical Test Results</h5><div class="table-responsive"><table class="table table-bordered table-sm"><thead><tr><th>Precipitation Type</th><th>Operating Mean (mm)</th><th>Climatology Mean (mm)</th><th>t-test p-value</th><th>Mann-Whitney p-value</th><th>KS-test p-value</th><th>Cohen\'s d</th><th>Permutation p-value</th><th>Significant?</th></tr></thead><tbody>';
     
     Object.keys(stats).forEach(precipType => {
         const s = stats[precipType];
+        const hasResampling = s.n_resamples !== undefined;
+        const ciLabel = hasResampling ? `${Math.round(s.confidence_level * 100)}% CI` : '';
+        const dText = hasResampling
+            ? `${s.cohens_d.toFixed(3)}<br><small class="text-muted">${ciLabel} [${s.cohens_d_ci_low.toFixed(3)}, ${s.cohens_d_ci_high.toFixed(3)}]</small>`
+            : s.cohens_d.toFixed(3);
+        const permText = hasResampling ? s.permutation_pvalue.toFixed(4) : '-';
         const significant = s.t_test_pvalue < 0.05 || s.mannwhitney_pvalue < 0.05;
         const sigText = significant ? '<span class="badge bg-danger">Yes</span>' : '<span class="badge bg-secondary">No</span>';
         
@@ -297,9 +566,13 @@ function createStatsTable(stats) {
             <td>${s.t_test_pvalue.toFixed(4)}</td>
             <td>${s.mannwhitney_pvalue.toFixed(4)}</td>
             <td>${s.ks_test_pvalue.toFixed(4)}</td>
-            <td>${s.cohens_d.toFixed(3)}</td>
+            <td>${dText}</td>
+            <td>${permText}</td>
             <td>${sigText}</td>
         </tr>`;
+        if (hasResampling) {
+            html += `<tr class="table-light"><td colspan="9"><small>${precipType.charAt(0).toUpperCase() + precipType.slice(1)} mean difference (operating - climatology): ${s.mean_difference.toFixed(2)} mm, bootstrap ${ciLabel} [${s.mean_difference_ci_low.toFixed(2)}, ${s.mean_difference_ci_high.toFixed(2)}] from ${s.n_resamples} resamples</small></td></tr>`;
+        }
     });
     
     html += '</tbody></table></div>';
@@ -308,7 +581,7 @@ function createStatsTable(stats) {
     return html;
 }
 
-function createComparisonPlotCard(plotKey, imgBase64) {
+function createComparisonPlotCard(plotKey, imgBase64, mimeType = 'image/png') {
     const col = document.createElement('div');
     col.className = 'col-lg-6 col-md-12 mb-4';
     
@@ -321,6 +594,8 @@ function createComparisonPlotCard(plotKey, imgBase64) {
     }
     
     const precipType = plotKey.startsWith('rain_') ? 'Rain' : 'Snow';
+    const plotType = plotKey.replace(/^(rain|snow)_/, '');
+    const previewClass = lastProcessRequest && lastProcessRequest.progressive ? ' plot-preview' : '';
     
     col.innerHTML = `
         <div class="card h-100 shadow-sm">
@@ -328,19 +603,21 @@ function createComparisonPlotCard(plotKey, imgBase64) {
                 <h5 class="mb-0">${precipType} - ${displayName}</h5>
             </div>
             <div class="card-body">
-                <img src="data:image/png;base64,${imgBase64}" class="img-fluid" alt="${displayName}">
+                <img src="data:${mimeType};base64,${imgBase64}" class="img-fluid${previewClass}" alt="${displayName}"
+                     data-plot-type="${plotType}" data-precip-type="${precipType.toLowerCase()}">
             </div>
         </div>
     `;
     return col;
 }
 
-function createPlotCard(precipType, plotName, imgBase64) {
+function createPlotCard(precipType, plotName, imgBase64, mimeType = 'image/png') {
     const col = document.createElement('div');
     col.className = 'col-lg-6 col-md-12 mb-4';
     
     // Format plot name for display
     const displayName = plotName.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
+    const previewClass = lastProcessRequest && lastProcessRequest.progressive ? ' plot-preview' : '';
     
     col.innerHTML = `
         <div class="card h-100 shadow-sm">
@@ -348,7 +625,8 @@ function createPlotCard(precipType, plotName, imgBase64) {
                 <h5 class="mb-0">${precipType} - ${displayName}</h5>
             </div>
             <div class="card-body">
-                <img src="data:image/png;base64,${imgBase64}" class="img-fluid" alt="${displayName}">
+                <img src="data:${mimeType};base64,${imgBase64}" class="img-fluid${previewClass}" alt="${displayName}"
+                     data-plot-type="${plotName}" data-precip-type="${precipType.toLowerCase()}">
             </div>
         </div>
     `;
@@ -0,0 +1,128 @@
+"""
+Helpers for files stored on disk (uploads and generated reports)
+"""
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+
+# File locks are only available on POSIX; elsewhere readers are not protected from reclamation
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+def file_sha256(filepath, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 hex digest of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_stream_with_hash(stream, directory, chunk_size=HASH_CHUNK_SIZE):
+    """Write a binary stream to a temporary file in `directory`, hashing it on the way.
+    
+    Returns (temp_path, sha256_hexdigest, size_in_bytes). The caller either
+    moves the temporary file into place or deletes it.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = os.path.join(directory, f'.upload-{uuid.uuid4().hex}.part')
+    try:
+        with open(temp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def directory_size(path):
+    """Total size in bytes of the files under a directory (0 if it does not exist)"""
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class FileLocks:
+    """Reader/remover locks on stored files, shared between worker processes.
+
+    Readers hold a shared lock while they read a stored file; removal takes
+    the exclusive lock without waiting and skips files that are in use.
+    """
+
+    def __init__(self, lock_dir):
+        self.lock_dir = lock_dir
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _lock_path(self, filepath):
+        name = hashlib.sha256(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.lock_dir, f'{name}.lock')
+
+    def _locked(self, filepath, operation):
+        """Open the lock file and lock it, or return None if a non-blocking lock is refused.
+
+        A remover unlinks the lock file while still holding it, so a lock
+        taken on an inode that is no longer at the lock path is released and
+        taken again on the current file.
+        """
+        lock_path = self._lock_path(filepath)
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                fcntl.flock(lock_file, operation)
+            except OSError:
+                lock_file.close()
+                return None
+            try:
+                current = os.stat(lock_path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and current.st_ino == os.fstat(lock_file.fileno()).st_ino:
+                return lock_file
+            lock_file.close()
+
+    @contextmanager
+    def reading(self, filepath):
+        if fcntl is None:
+            yield
+            return
+        lock_file = self._locked(filepath, fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            lock_file.close()
+
+    @contextmanager
+    def removing(self, filepath):
+        """Yield True if no reader holds the file (and keep new readers out), else False"""
+        if fcntl is None:
+            yield True
+            return
+        lock_file = self._locked(filepath, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if lock_file is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            # Unlink before unlocking: anyone waiting on this inode sees it is gone and retries
+            try:
+                os.remove(self._lock_path(filepath))
+            except OSError:
+                pass
+            lock_file.close()
@@ -0,0 +1,59 @@
+"""
+Synthetic station files for the load test and the parser benchmark.
+
+Both generators return CSV bytes in the layout the app ingests, with a
+seasonal temperature cycle and random precipitation, wind and snowfall.
+"""
+import numpy as np
+import pandas as pd
+
+FIRST_YEAR = 2000
+
+
+def synthetic_csv(years, seed, station='Moab'):
+    """Hourly MeteoBlue CSV (bytes) covering `years` years from FIRST_YEAR"""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(f'{FIRST_YEAR}-01-01', periods=int(years * 8760), freq='h')
+    day_of_year = timestamps.dayofyear.to_numpy()
+    temperature = 12 - 14 * np.cos(2 * np.pi * (day_of_year - 15) / 365) + rng.normal(0, 4, len(timestamps))
+    wet = rng.random(len(timestamps)) < 0.04
+    precipitation = np.where(wet, rng.gamma(0.8, 1.5, len(timestamps)), 0.0).round(2)
+    snowfall = np.where(temperature < 0, precipitation * 0.7, 0.0).round(3)
+    frame = pd.DataFrame({
+        'timestamp': timestamps.strftime('%Y%m%dT%H%M'),
+        f'{station} Precipitation Total': precipitation,
+        f'{station} Snowfall Amount': snowfall,
+        f'{station} Temperature [2 m elevation corrected]': temperature.round(1),
+        f'{station} Wind Speed [10 m]': rng.gamma(2.0, 2.5, len(timestamps)).round(1),
+        f'{station} Wind Direction [10 m]': rng.uniform(0, 360, len(timestamps)).round(0)
+    })
+    header = ''.join(f'{key},{value}\n' for key, value in [
+        ('location', station), ('lat', 38.5), ('lon', -109.5), ('asl', 1200), ('city', station),
+        ('domain', 'NEMS'), ('level', 'sfc'), ('unit', 'mm'), ('aggregation', 'hourly')])
+    return (header + frame.to_csv(index=False)).encode()
+
+
+
+def synthetic_synopticx(years, seed, station='MOAB'):
+    """10-minute SynopticX CSV (bytes) with -0700/-0600 offsets, `years` years from FIRST_YEAR"""
+    rng = np.random.default_rng(seed)
+    local = pd.date_range(f'{FIRST_YEAR}-01-01', periods=int(years * 365 * 144), freq='10min')
+    offsets = np.where((local.month >= 4) & (local.month <= 10), '-0600', '-0700')
+    n = len(local)
+    temperature = 12 - 14 * np.cos(2 * np.pi * (local.dayofyear.to_numpy() - 15) / 365) + rng.normal(0, 4, n)
+    precipitation = np.where(rng.random(n) < 0.01, rng.gamma(0.6, 0.5, n), 0.0).round(2)
+    frame = pd.DataFrame({
+        'Station_ID': station,
+        'Date_Time': local.strftime('%Y-%m-%dT%H:%M:%S') + offsets,
+        'air_temp_set_1': temperature.round(1),
+        'wind_speed_set_1': rng.gamma(2.0, 2.0, n).round(1),
+        'wind_direction_set_1': rng.integers(0, 360, n),
+        'wind_gust_set_1': np.where(rng.random(n) < 0.2, np.nan, rng.gamma(3.0, 2.5, n).round(1)),
+        'precip_accum_ten_minute_set_1': precipitation,
+        'estimated_snowfall_rate_set_1': np.where(temperature < 0, precipitation * 6, 0.0).round(2)
+    })
+    header = f'# STATION: {station}\n# Synoptic data\n'
+    units = ',,Celsius,m/s,Degrees,m/s,Millimeters,mm/h\n'
+    csv_text = frame.to_csv(index=False)
+    first_line, rest = csv_text.split('\n', 1)
+    return (header + first_line + '\n' + units + rest).encode()
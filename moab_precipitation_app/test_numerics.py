@@ -0,0 +1,145 @@
+"""Checks of the vectorized statistics against scipy or plain loops on short synthetic series
+
+Run with: python -m pytest test_numerics.py
+"""
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import aggregates
+import extremes
+import trends
+from uniform_series import UniformSeries
+
+
+def mann_kendall_loop(x, t):
+    """Textbook Mann-Kendall S, tie-corrected variance and Theil-Sen slope of one series"""
+    keep = [i for i in range(len(x)) if not math.isnan(x[i])]
+    x, t = [x[i] for i in keep], [t[i] for i in keep]
+    n = len(x)
+    s = sum(np.sign(x[j] - x[i]) for i, j in itertools.combinations(range(n), 2))
+    ties = sum(c * (c - 1) * (2 * c + 5) for c in pd.Series(x).value_counts() if c > 1)
+    variance = (n * (n - 1) * (2 * n + 5) - ties) / 18
+    slopes = [(x[j] - x[i]) / (t[j] - t[i]) for i, j in itertools.combinations(range(n), 2)]
+    return s, variance, float(np.median(slopes))
+
+
+def test_mann_kendall_ties_and_sen_slope():
+    t = np.arange(2000, 2012, dtype=np.float64)
+    series = np.array([
+        [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0, 5.0, 3.0, 5.0, 8.0],  # ties of 2 and 3
+        [0.0, 0.0, 0.0, 2.5, 0.0, 1.0, 0.0, 3.5, 0.0, 0.0, 4.0, 0.0],  # mostly dry months
+        [1.0, np.nan, 2.0, 2.0, np.nan, 3.0, 7.0, 2.0, 6.0, np.nan, 9.0, 4.0]
+    ])
+    result = trends.mann_kendall_sen(series, t)
+    for row, x in enumerate(series):
+        s, variance, slope = mann_kendall_loop(list(x), list(t))
+        valid = np.isfinite(x)
+        assert result['n'][row] == valid.sum()
+        assert result['s'][row] == s
+        assert result['variance'][row] == pytest.approx(variance)
+        z = (s - np.sign(s)) / np.sqrt(variance)
+        assert result['z'][row] == pytest.approx(z)
+        assert result['p_value'][row] == pytest.approx(2 * stats.norm.sf(abs(z)))
+        assert result['slope'][row] == pytest.approx(slope)
+        assert result['slope'][row] == pytest.approx(stats.theilslopes(x[valid], t[valid])[0])
+        assert result['intercept'][row] == pytest.approx(np.median(x[valid] - slope * t[valid]))
+
+
+def test_mann_kendall_without_ties_matches_kendall_tau():
+    rng = np.random.default_rng(3)
+    t = np.arange(15, dtype=np.float64)
+    x = rng.permutation(15).astype(np.float64)
+    result = trends.mann_kendall_sen(x[None, :], t)
+    tau = stats.kendalltau(t, x)[0]
+    assert result['s'][0] == pytest.approx(tau * 15 * 14 / 2)
+    assert result['variance'][0] == pytest.approx(15 * 14 * 35 / 18)
+
+
+def test_gumbel_l_moments():
+    rng = np.random.default_rng(7)
+    maxima = rng.gumbel(40, 12, size=(3, 9))
+    location, scale = extremes.fit_gumbel(maxima)
+    for row, x in enumerate(maxima):
+        ordered = np.sort(x)
+        n = len(ordered)
+        # Sample L-moments from all pairs: l2 is half the mean absolute pairwise difference
+        l1 = ordered.mean()
+        l2 = sum(ordered[j] - ordered[i] for i, j in itertools.combinations(range(n), 2)) / (n * (n - 1))
+        assert scale[row] == pytest.approx(l2 / math.log(2))
+        assert location[row] == pytest.approx(l1 - np.euler_gamma * l2 / math.log(2))
+    levels = extremes.return_levels(location, scale, [2, 100])
+    expected = stats.gumbel_r.ppf([0.5, 0.99], loc=location[:, None], scale=scale[:, None])
+    np.testing.assert_allclose(levels, expected)
+
+
+def test_rolling_totals_window_bounds():
+    hours = np.array([0, 1, 2, 5, 6, 30, 31, 32, 80])
+    times = (np.datetime64('2021-06-01T00:00', 'ns') + hours * np.timedelta64(1, 'h'))
+    values = np.array([1.0, 2.0, 0.5, 4.0, 0.0, 3.0, 1.5, 2.0, 7.0])
+    for window_hours in (1, 3, 24, 48):
+        expected = [values[(hours > h - window_hours) & (hours <= h)].sum() for h in hours]
+        np.testing.assert_allclose(extremes.rolling_totals(times, values, window_hours), expected)
+
+
+def hourly_frame(start, periods, seed, missing=()):
+    """Processed-like hourly frame with random showers and the given hour ranges removed"""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=periods, freq='h')
+    rain = np.where(rng.random(periods) < 0.1, rng.gamma(0.8, 2.0, periods), 0.0)
+    df = pd.DataFrame({'timestamp': timestamps, 'Rain_mm': rain,
+                       'Snow_mm': np.where(timestamps.month.isin([12, 1, 2]), rain * 0.5, 0.0)})
+    for lo, hi in missing:
+        df = df[(df['timestamp'] < lo) | (df['timestamp'] >= hi)]
+    df = df.reset_index(drop=True)
+    df['Year'], df['Month'] = df['timestamp'].dt.year, df['timestamp'].dt.month
+    return df
+
+
+def test_annual_maxima_year_bounds():
+    df = hourly_frame('2019-01-01', 3 * 8760, seed=1)
+    result = extremes.annual_maxima(df, 'rain', windows_days=(1, 3), min_coverage=0.5)
+    times = df['timestamp'].to_numpy().astype('datetime64[ns]')
+    values = df['Rain_mm'].to_numpy()
+    for i, days in enumerate(result['windows_days']):
+        totals = extremes.rolling_totals(times, values, days * 24)
+        for j, year in enumerate(result['years']):
+            in_year = (df['Year'] == year).to_numpy()
+            assert result['maxima'][i, j] == pytest.approx(totals[in_year].max())
+            assert pd.Timestamp(result['times'][i, j]).year == year
+
+
+def test_uniform_reduce_matches_groupby():
+    # Gaps inside a month and a whole missing month (April)
+    df = hourly_frame('2021-01-15 06:00', 24 * 150, seed=2,
+                      missing=[('2021-02-03', '2021-02-05'), ('2021-04-01', '2021-05-01')])
+    series = UniformSeries.from_frame(df, ['Rain_mm', 'Snow_mm'])
+    grouped = df.groupby(df['timestamp'].dt.to_period('M'))
+    for how in ('sum', 'mean', 'max', 'min'):
+        table = series.reduce('Rain_mm', 'M', how).set_index('period')
+        expected = getattr(grouped['Rain_mm'], how)()
+        observed = table[table['observations'] > 0]
+        np.testing.assert_allclose(observed['value'].to_numpy(), expected.to_numpy())
+        np.testing.assert_array_equal(observed['observations'].to_numpy(), grouped.size().to_numpy())
+        assert table.loc[np.datetime64('2021-04'), 'observations'] == 0
+    np.testing.assert_allclose(series.period_totals('Snow_mm', 'M'), grouped['Snow_mm'].sum().to_numpy())
+
+
+def test_uniform_window_bounds_are_inclusive():
+    df = hourly_frame('2021-01-01', 24 * 120, seed=4, missing=[('2021-02-10', '2021-02-12')])
+    series = UniformSeries.from_frame(df, ['Rain_mm', 'Snow_mm'])
+    start, end = pd.Timestamp('2021-01-20 13:00'), pd.Timestamp('2021-03-31 23:00')
+    window = series.window(start, end)
+    rows = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+    assert window.start == np.datetime64(start) and window.end == np.datetime64(end)
+    assert window.valid.sum() == len(rows)
+    np.testing.assert_allclose(window.period_totals('Rain_mm', 'M'),
+                               rows.groupby('Month')['Rain_mm'].sum().to_numpy())
+    by_grid = aggregates.window_monthly_totals(df, start, end, series=series)
+    by_rows = aggregates.window_monthly_totals(df, start, end)
+    np.testing.assert_allclose(by_grid[['Rain_mm', 'Snow_mm']].to_numpy(),
+                               by_rows[['Rain_mm', 'Snow_mm']].to_numpy())
@@ -0,0 +1,236 @@
+"""
+Monthly and daily precipitation totals persisted in the database.
+
+Totals are written once per file at upload with bulk inserts, after which
+climatologies, anomalies and multi-file comparisons are answered by
+aggregate SQL over the indexed monthly_total / daily_total tables instead of
+re-reading the CSV. Only portable SQL (AVG, SUM, COUNT, CASE) is used so the
+same queries run on SQLite and PostgreSQL.
+"""
+import math
+
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+
+from models import db, DataFile, MonthlyTotal, DailyTotal
+from aggregates import PRECIP_COLUMNS
+
+# Rows per INSERT batch (executemany; multi-row VALUES on PostgreSQL)
+INSERT_BATCH_ROWS = 5000
+
+
+def build_totals(df):
+    """Monthly and daily total rows (without file_id) for both precip types"""
+    cols = list(PRECIP_COLUMNS.values())
+    monthly = (df.groupby(['Year', 'Month'])
+                 .agg(season=('Season', 'first'), observations=('timestamp', 'size'),
+                      **{c: (c, 'sum') for c in cols})
+                 .reset_index())
+    daily = (df.assign(date=df['timestamp'].dt.normalize())
+               .groupby('date')
+               .agg(year=('Year', 'first'), month=('Month', 'first'), season=('Season', 'first'),
+                    observations=('timestamp', 'size'), **{c: (c, 'sum') for c in cols})
+               .reset_index())
+
+    monthly_rows = []
+    daily_rows = []
+    for precip_type, col in PRECIP_COLUMNS.items():
+        monthly_rows.extend({
+            'precip_type': precip_type,
+            'year': int(r.Year),
+            'month': int(r.Month),
+            'season': r.season,
+            'total_mm': float(getattr(r, col)),
+            'observations': int(r.observations)
+        } for r in monthly.itertuples(index=False))
+        daily_rows.extend({
+            'precip_type': precip_type,
+            'date': r.date.date(),
+            'year': int(r.year),
+            'month': int(r.month),
+            'season': r.season,
+            'total_mm': float(getattr(r, col)),
+            'observations': int(r.observations)
+        } for r in daily.itertuples(index=False))
+    return monthly_rows, daily_rows
+
+
+def _bulk_insert(model, file_id, rows):
+    for start in range(0, len(rows), INSERT_BATCH_ROWS):
+        batch = [dict(row, file_id=file_id) for row in rows[start:start + INSERT_BATCH_ROWS]]
+        db.session.execute(db.insert(model), batch)
+
+
+def save_totals(file_id, df):
+    """Replace the stored totals of a file (caller commits)"""
+    monthly_rows, daily_rows = build_totals(df)
+    delete_totals(file_id)
+    _bulk_insert(MonthlyTotal, file_id, monthly_rows)
+    _bulk_insert(DailyTotal, file_id, daily_rows)
+    return len(monthly_rows), len(daily_rows)
+
+
+def copy_totals(source_file_id, file_id):
+    """Copy the totals of a file to a deduplicated upload with INSERT ... SELECT (caller commits)"""
+    for model in (MonthlyTotal, DailyTotal):
+        columns = [c.name for c in model.__table__.columns if c.name not in ('id', 'file_id')]
+        select = db.select(db.literal(file_id), *[model.__table__.c[c] for c in columns]).where(
+            model.file_id == source_file_id)
+        db.session.execute(db.insert(model).from_select(['file_id'] + columns, select))
+
+
+def delete_totals(file_id):
+    for model in (MonthlyTotal, DailyTotal):
+        db.session.execute(db.delete(model).where(model.file_id == file_id))
+
+
+def has_totals(file_id):
+    return db.session.query(MonthlyTotal.id).filter_by(file_id=file_id).first() is not None
+
+
+def ensure_totals(data_file, load_df):
+    """Backfill totals for files uploaded before they were persisted; load_df() returns the DataFrame
+    
+    Returns whether this call stored them; a backfill that loses a race with
+    a concurrent one (unique (file, precip type, period) indexes) is rolled back.
+    """
+    if has_totals(data_file.id):
+        return False
+    try:
+        save_totals(data_file.id, load_df())
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def _std(total, total_sq, n):
+    """Sample standard deviation from SUM(x), SUM(x*x) and COUNT(x)"""
+    if not n or n < 2:
+        return None
+    var = (total_sq - total * total / n) / (n - 1)
+    return math.sqrt(max(var, 0.0))
+
+
+def _season_year():
+    # December belongs to the following year's DJF, as in aggregates.seasonal_totals
+    return db.case((MonthlyTotal.month == 12, MonthlyTotal.year + 1), else_=MonthlyTotal.year)
+
+
+def climatology(file_ids, precip_type='rain', by='month', start_year=None, end_year=None):
+    """Mean, spread and range of monthly (or seasonal) totals per file, computed in SQL"""
+    if by == 'month':
+        period_totals = (db.select(MonthlyTotal.file_id.label('file_id'),
+                                   MonthlyTotal.month.label('period'),
+                                   MonthlyTotal.year.label('year'),
+                                   MonthlyTotal.total_mm.label('total_mm'))
+                         .join(DataFile, DataFile.id == MonthlyTotal.file_id))
+        year_col = MonthlyTotal.year
+    elif by == 'season':
+        season_year = _season_year()
+        period_totals = (db.select(MonthlyTotal.file_id.label('file_id'),
+                                   MonthlyTotal.season.label('period'),
+                                   season_year.label('year'),
+                                   db.func.sum(MonthlyTotal.total_mm).label('total_mm'))
+                         .join(DataFile, DataFile.id == MonthlyTotal.file_id)
+                         .group_by(MonthlyTotal.file_id, MonthlyTotal.season, season_year))
+        year_col = season_year
+    else:
+        raise ValueError(f"Unknown climatology period '{by}'. Choose month or season")
+
+    period_totals = period_totals.where(MonthlyTotal.file_id.in_(file_ids),
+                                        MonthlyTotal.precip_type == precip_type,
+                                        DataFile.is_active.is_(True))
+    if start_year is not None:
+        period_totals = period_totals.where(year_col >= start_year)
+    if end_year is not None:
+        period_totals = period_totals.where(year_col <= end_year)
+    sub = period_totals.subquery()
+
+    query = (db.select(sub.c.file_id, sub.c.period,
+                       db.func.count(sub.c.total_mm).label('years'),
+                       db.func.avg(sub.c.total_mm).label('mean_mm'),
+                       db.func.sum(sub.c.total_mm).label('sum_mm'),
+                       db.func.sum(sub.c.total_mm * sub.c.total_mm).label('sum_sq'),
+                       db.func.min(sub.c.total_mm).label('min_mm'),
+                       db.func.max(sub.c.total_mm).label('max_mm'))
+             .group_by(sub.c.file_id, sub.c.period)
+             .order_by(sub.c.file_id, sub.c.period))
+
+    rows = []
+    for r in db.session.execute(query):
+        rows.append({
+            'file_id': r.file_id,
+            'period': r.period,
+            'years': r.years,
+            'mean_mm': float(r.mean_mm),
+            'std_mm': _std(float(r.sum_mm), float(r.sum_sq), r.years),
+            'min_mm': float(r.min_mm),
+            'max_mm': float(r.max_mm)
+        })
+    return rows
+
+
+def monthly_anomalies(file_id, precip_type='rain', clim_start_year=None, clim_end_year=None,
+                      start_year=None, end_year=None):
+    """Monthly totals and their departure from the file's monthly climatology, in one SQL query"""
+    clim = (db.select(MonthlyTotal.month.label('month'),
+                      db.func.avg(MonthlyTotal.total_mm).label('clim_mm'))
+            .where(MonthlyTotal.file_id == file_id, MonthlyTotal.precip_type == precip_type))
+    if clim_start_year is not None:
+        clim = clim.where(MonthlyTotal.year >= clim_start_year)
+    if clim_end_year is not None:
+        clim = clim.where(MonthlyTotal.year <= clim_end_year)
+    clim = clim.group_by(MonthlyTotal.month).subquery()
+
+    query = (db.select(MonthlyTotal.year, MonthlyTotal.month, MonthlyTotal.total_mm, clim.c.clim_mm,
+                       (MonthlyTotal.total_mm - clim.c.clim_mm).label('anomaly_mm'))
+             .join(clim, clim.c.month == MonthlyTotal.month)
+             .where(MonthlyTotal.file_id == file_id, MonthlyTotal.precip_type == precip_type))
+    if start_year is not None:
+        query = query.where(MonthlyTotal.year >= start_year)
+    if end_year is not None:
+        query = query.where(MonthlyTotal.year <= end_year)
+    query = query.order_by(MonthlyTotal.year, MonthlyTotal.month)
+
+    rows = []
+    for r in db.session.execute(query):
+        clim_mm = float(r.clim_mm)
+        rows.append({
+            'year': r.year,
+            'month': r.month,
+            'total_mm': float(r.total_mm),
+            'climatology_mm': clim_mm,
+            'anomaly_mm': float(r.anomaly_mm),
+            'anomaly_pct': (float(r.anomaly_mm) / clim_mm * 100) if clim_mm > 0 else None
+        })
+    return rows
+
+
+def daily_totals(file_id, precip_type='rain', start=None, end=None):
+    """Stored daily totals of a file as a DataFrame (date, total_mm, observations)"""
+    query = (db.select(DailyTotal.date, DailyTotal.total_mm, DailyTotal.observations)
+             .where(DailyTotal.file_id == file_id, DailyTotal.precip_type == precip_type))
+    if start is not None:
+        query = query.where(DailyTotal.date >= pd.Timestamp(start).date())
+    if end is not None:
+        query = query.where(DailyTotal.date <= pd.Timestamp(end).date())
+    query = query.order_by(DailyTotal.date)
+    return pd.DataFrame(db.session.execute(query).all(), columns=['date', 'total_mm', 'observations'])
+
+
+def monthly_table(file_id):
+    """Stored monthly totals of a file laid out like aggregates.monthly_totals(), or None"""
+    query = (db.select(MonthlyTotal.year, MonthlyTotal.month, MonthlyTotal.precip_type, MonthlyTotal.total_mm)
+             .where(MonthlyTotal.file_id == file_id))
+    rows = pd.DataFrame(db.session.execute(query).all(), columns=['Year', 'Month', 'precip_type', 'total_mm'])
+    if rows.empty:
+        return None
+    table = (rows.pivot_table(index=['Year', 'Month'], columns='precip_type', values='total_mm', aggfunc='sum')
+                 .rename(columns=PRECIP_COLUMNS)
+                 .reindex(columns=list(PRECIP_COLUMNS.values()), fill_value=0.0)
+                 .reset_index())
+    table.columns.name = None
+    table['Precip_Total_mm'] = table['Rain_mm'] + table['Snow_mm']
+    return table
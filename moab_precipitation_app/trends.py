@@ -0,0 +1,151 @@
+"""
+Mann-Kendall trend tests and Theil-Sen slopes for every month and season.
+
+The Year x Month and SeasonYear x Season totals (aggregates.monthly_totals /
+seasonal_totals) are laid out as one matrix of series x years. All pairwise
+differences of every series come from a single broadcast
+(series x years x years), from which the Mann-Kendall S statistic, its
+tie-corrected variance and the Theil-Sen slopes are reduced along the pair
+axes, so rain and snow for 12 months, 4 seasons and the annual total are
+tested together instead of one np.polyfit per plot.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregates import PRECIP_TYPES
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
+SEASON_START_MONTH = {'DJF': 12, 'MAM': 3, 'JJA': 6, 'SON': 9}
+
+# Fewest years with data a series needs to be tested
+MIN_YEARS = 4
+
+
+def _complete(period_start, months, first, last):
+    """Whether [period_start, period_start + months) lies inside the record [first, last]"""
+    period_end = period_start + pd.DateOffset(months=months)
+    # One day of slack for records starting after midnight or ending before the last hour
+    return first <= period_start + pd.Timedelta(days=1) and last >= period_end - pd.Timedelta(days=1)
+
+
+def series_matrix(monthly, seasonal, column, first, last):
+    """(labels, kinds, years, matrix) of monthly, seasonal and annual totals
+
+    Periods only partly covered by the record (its first and last month or
+    season) are NaN, so they do not read as a drop in precipitation.
+    """
+    years = np.arange(int(monthly['Year'].min()), int(monthly['Year'].max()) + 1)
+    by_month = (monthly.pivot_table(index='Month', columns='Year', values=column, aggfunc='sum')
+                .reindex(index=range(1, 13), columns=years))
+    by_season = (seasonal.pivot_table(index='Season', columns='SeasonYear', values=column, aggfunc='sum')
+                 .reindex(index=SEASONS, columns=years))
+    annual = by_month.sum(min_count=1).to_frame().T
+
+    for month in range(1, 13):
+        for year in years:
+            if not _complete(pd.Timestamp(year, month, 1), 1, first, last):
+                by_month.loc[month, year] = np.nan
+    for season in SEASONS:
+        start_month = SEASON_START_MONTH[season]
+        for year in years:
+            start_year = year - 1 if season == 'DJF' else year
+            if not _complete(pd.Timestamp(start_year, start_month, 1), 3, first, last):
+                by_season.loc[season, year] = np.nan
+    for year in years:
+        if not _complete(pd.Timestamp(year, 1, 1), 12, first, last):
+            annual.loc[:, year] = np.nan
+
+    matrix = np.vstack([by_month.to_numpy(dtype=np.float64), by_season.to_numpy(dtype=np.float64),
+                        annual.to_numpy(dtype=np.float64)])
+    labels = MONTH_NAMES + SEASONS + ['Annual']
+    kinds = ['month'] * 12 + ['season'] * 4 + ['annual']
+    return labels, kinds, years, matrix
+
+
+def mann_kendall_sen(matrix, t):
+    """Batched Mann-Kendall test and Theil-Sen slope of each row of `matrix` against `t`
+
+    NaN values are skipped pairwise. Returns a dict of per-row arrays:
+    n, s, variance, z, p_value, slope, intercept.
+    """
+    from scipy import stats
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    valid = np.isfinite(matrix)
+    n = valid.sum(axis=1)
+
+    # Pairwise differences x[j] - x[i] for every row: rows x n x n
+    diffs = matrix[:, None, :] - matrix[:, :, None]
+    pair_valid = valid[:, None, :] & valid[:, :, None]
+    upper = np.triu(np.ones((len(t), len(t)), dtype=bool), k=1)
+    pairs = pair_valid & upper
+
+    s = np.where(pairs, np.sign(np.nan_to_num(diffs)), 0).sum(axis=(1, 2))
+
+    # Tie correction: an element in a group of t equal values contributes (t-1)(2t+5)
+    ties = ((diffs == 0) & pair_valid).sum(axis=2)
+    tie_term = np.where(valid, (ties - 1) * (2 * ties + 5), 0).sum(axis=1)
+    variance = (n * (n - 1) * (2 * n + 5) - tie_term) / 18.0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(variance > 0, (s - np.sign(s)) / np.sqrt(variance), 0.0)
+        p_value = 2 * stats.norm.sf(np.abs(z))
+
+        # Theil-Sen: median of all pairwise slopes
+        dt = t[None, :] - t[:, None]
+        slopes = np.where(pairs, diffs / np.where(upper, dt, 1.0), np.nan)
+        flat = slopes.reshape(len(matrix), -1)
+        has_pairs = pairs.reshape(len(matrix), -1).any(axis=1)
+        slope = np.full(len(matrix), np.nan)
+        slope[has_pairs] = np.nanmedian(flat[has_pairs], axis=1)
+        residual = np.where(valid, matrix - slope[:, None] * t[None, :], np.nan)
+        intercept = np.full(len(matrix), np.nan)
+        has_values = n > 0
+        intercept[has_values] = np.nanmedian(residual[has_values], axis=1)
+
+    return {'n': n, 's': s, 'variance': variance, 'z': z, 'p_value': p_value,
+            'slope': slope, 'intercept': intercept}
+
+
+def trend_table(monthly, seasonal, first, last, precip_types=('rain', 'snow'), alpha=0.05):
+    """Trend of every month, season and the annual total for each precip type
+
+    One row per (precip_type, period): years used, Mann-Kendall S, Z and
+    p-value, Sen's slope (mm/year), the slope as percent of the period mean
+    per decade, and the trend direction at significance level `alpha`.
+    """
+    blocks = [series_matrix(monthly, seasonal, PRECIP_TYPES[p], first, last) for p in precip_types]
+    years = blocks[0][2]
+    matrix = np.vstack([block[3] for block in blocks])
+    result = mann_kendall_sen(matrix, years)
+
+    means = np.full(len(matrix), np.nan)
+    has_values = np.isfinite(matrix).any(axis=1)
+    means[has_values] = np.nanmean(matrix[has_values], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_per_decade = np.where(means > 0, result['slope'] * 10 / means * 100, np.nan)
+
+    enough = result['n'] >= MIN_YEARS
+    significant = enough & (result['p_value'] < alpha)
+    direction = np.where(significant & (result['s'] > 0), 'increasing',
+                         np.where(significant & (result['s'] < 0), 'decreasing', 'no trend'))
+
+    table = pd.DataFrame({
+        'precip_type': np.repeat(list(precip_types), len(blocks[0][0])),
+        'period': blocks[0][0] * len(precip_types),
+        'kind': blocks[0][1] * len(precip_types),
+        'years': result['n'],
+        'mean_mm': means,
+        'mk_s': result['s'],
+        'mk_z': result['z'],
+        'p_value': result['p_value'],
+        'sen_slope_mm_per_year': result['slope'],
+        'percent_per_decade': percent_per_decade,
+        'trend': direction
+    })
+    # Too few years to say anything
+    table.loc[~enough, ['mk_z', 'p_value', 'sen_slope_mm_per_year', 'percent_per_decade']] = np.nan
+    table.loc[~enough, 'trend'] = 'insufficient data'
+    return table
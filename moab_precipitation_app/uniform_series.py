@@ -0,0 +1,220 @@
+"""
+Uniform-grid, array-backed representation of a processed time series.
+
+Station records are regularized onto a fixed time step starting at the first
+observation: slot i holds the observation at start + i * step. Each column is
+a contiguous float64 array and a boolean mask marks slots that hold an
+observation, so gaps are explicit instead of implied by missing rows.
+Locating a time is index arithmetic, a time window is an array slice, and
+daily/monthly/yearly totals are np.add.reduceat over calendar boundaries
+rather than a groupby.
+"""
+import numpy as np
+import pandas as pd
+
+# Steps the detector snaps to; covers the 1/5/10/15/30-minute, hourly and daily records we ingest
+COMMON_STEPS_SECONDS = (60, 300, 600, 900, 1800, 3600, 10800, 21600, 86400)
+PERIOD_UNITS = {'D': 'D', 'M': 'M', 'Y': 'Y'}
+# Accumulated quantities: observations sharing a slot add up rather than average
+ACCUMULATED_COLUMNS = ('Rain_mm', 'Snow_mm', 'Precip_Total_mm')
+
+
+def is_accumulated(column):
+    """Whether a column holds per-timestep accumulations (precipitation and its inputs)"""
+    return column in ACCUMULATED_COLUMNS or 'Precipitation' in column or 'Snowfall' in column
+
+
+def detect_step(timestamps):
+    """Sampling interval of a record as a pd.Timedelta.
+
+    Uses the most common positive spacing when it accounts for at least half
+    of the intervals, otherwise the median spacing, so isolated gaps,
+    duplicates and the odd off-schedule reading do not skew the result.
+    Returns None if fewer than two distinct timestamps are present.
+    """
+    ts = np.asarray(pd.to_datetime(timestamps).values, dtype='datetime64[ns]')
+    ts = ts[~np.isnat(ts)]
+    if len(ts) < 2:
+        return None
+    diffs = np.diff(np.sort(ts)).astype(np.int64)
+    diffs = diffs[diffs > 0]
+    if len(diffs) == 0:
+        return None
+
+    values, counts = np.unique(diffs, return_counts=True)
+    if counts.max() * 2 >= len(diffs):
+        step_ns = int(values[counts.argmax()])
+    else:
+        step_ns = int(np.median(diffs))
+        # Snap a noisy median to the nearest common step when it is within 10%
+        nearest = min(COMMON_STEPS_SECONDS, key=lambda s: abs(s * 1e9 - step_ns))
+        if abs(nearest * 1e9 - step_ns) <= 0.1 * nearest * 1e9:
+            step_ns = int(nearest * 1e9)
+    return pd.Timedelta(step_ns, unit='ns')
+
+
+class UniformSeries:
+    """Columns on a uniform time grid with an explicit observation mask"""
+
+    def __init__(self, start, step, values, valid, duplicates=0, off_grid=0):
+        self.start = np.datetime64(start, 'ns')
+        self.step = np.timedelta64(step, 'ns')
+        self.values = values  # column name -> float64 array (NaN where no observation)
+        self.valid = valid
+        self.duplicates = duplicates  # observations merged into an already filled slot
+        self.off_grid = off_grid  # observations snapped to the nearest slot
+
+    @classmethod
+    def from_frame(cls, df, columns, step=None, duplicates=None, max_grid_factor=4):
+        """Regularize the timestamp column and `columns` of a processed DataFrame.
+
+        Observations that fall between slots are snapped to the nearest one;
+        several observations in one slot are combined with `duplicates`
+        ('mean', 'sum' or 'first'). By default accumulated precipitation
+        columns are summed, so merged readings do not undercount totals, and
+        other variables are averaged. Raises ValueError if the record is too
+        sparse for a grid (more than max_grid_factor slots per observation).
+        """
+        if duplicates not in (None, 'mean', 'sum', 'first'):
+            raise ValueError(f"Unknown duplicate resolution '{duplicates}'")
+        ts = np.asarray(df['timestamp'].values, dtype='datetime64[ns]')
+        keep = ~np.isnat(ts)
+        ts = ts[keep]
+        if len(ts) == 0:
+            raise ValueError('No timestamps to build a grid from')
+        step = pd.Timedelta(step) if step is not None else (detect_step(ts) or pd.Timedelta(hours=1))
+        step_ns = step.value
+
+        start = ts.min()
+        offsets_ns = (ts - start).astype(np.int64)
+        slots = (offsets_ns + step_ns // 2) // step_ns
+        n = int(slots.max()) + 1
+        if n > max(max_grid_factor * len(ts), 1024):
+            raise ValueError(f'Record too sparse for a uniform grid: {n} slots for {len(ts)} observations')
+
+        counts = np.bincount(slots, minlength=n)
+        valid = counts > 0
+        values = {}
+        if duplicates == 'first':
+            order = np.argsort(slots, kind='stable')
+            first_slots, first_idx = np.unique(slots[order], return_index=True)
+            first_rows = order[first_idx]
+        for col in columns:
+            how = duplicates or ('sum' if is_accumulated(col) else 'mean')
+            col_values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)[keep]
+            out = np.full(n, np.nan)
+            if how == 'first':
+                out[first_slots] = col_values[first_rows]
+            else:
+                present = ~np.isnan(col_values)
+                sums = np.bincount(slots[present], weights=col_values[present], minlength=n)
+                n_present = np.bincount(slots[present], minlength=n)
+                filled = n_present > 0
+                out[filled] = sums[filled] if how == 'sum' else sums[filled] / n_present[filled]
+            values[col] = out
+
+        return cls(start, step_ns, values, valid,
+                   duplicates=int((counts - 1)[valid].sum()),
+                   off_grid=int(np.count_nonzero(offsets_ns % step_ns)))
+
+    def __len__(self):
+        return len(self.valid)
+
+    @property
+    def end(self):
+        return self.start + (len(self) - 1) * self.step
+
+    def timestamps(self):
+        return self.start + np.arange(len(self)) * self.step
+
+    def index_of(self, when, side='left'):
+        """Slot of a time, clipped to [0, len]; side='right' returns one past the slot at or before it"""
+        offset = (np.datetime64(pd.Timestamp(when), 'ns') - self.start).astype(np.int64)
+        step_ns = self.step.astype(np.int64)
+        if side == 'left':
+            index = -(-offset // step_ns)  # First slot at or after `when`
+        else:
+            index = offset // step_ns + 1  # One past the last slot at or before `when`
+        return int(min(max(index, 0), len(self)))
+
+    def window(self, start=None, end=None):
+        """View of the slots with start <= time <= end (both inclusive, like the timestamp filters)"""
+        i0 = self.index_of(start) if start is not None else 0
+        i1 = self.index_of(end, side='right') if end is not None else len(self)
+        i1 = max(i0, i1)
+        return UniformSeries(self.start + i0 * self.step, self.step,
+                             {name: arr[i0:i1] for name, arr in self.values.items()},
+                             self.valid[i0:i1])
+
+    def coverage(self):
+        """Fraction of slots that hold an observation"""
+        return float(self.valid.mean()) if len(self) else 0.0
+
+    def gaps(self):
+        """(start, end, slots) of each run of missing slots"""
+        missing = np.concatenate([[False], ~self.valid, [False]])
+        edges = np.flatnonzero(np.diff(missing.astype(np.int8)))
+        starts, ends = edges[0::2], edges[1::2]
+        return [(self.start + s * self.step, self.start + (e - 1) * self.step, int(e - s))
+                for s, e in zip(starts, ends)]
+
+    def _period_bounds(self, period):
+        """Slot boundaries of the calendar periods overlapping the grid, plus the period labels"""
+        unit = PERIOD_UNITS[period]
+        first = self.start.astype(f'datetime64[{unit}]')
+        last = self.end.astype(f'datetime64[{unit}]')
+        labels = np.arange(first, last + 1)
+        edges = np.append(labels, last + 1).astype('datetime64[ns]')
+        step_ns = self.step.astype(np.int64)
+        offsets = (edges - self.start).astype(np.int64)
+        bounds = np.clip(-(-offsets // step_ns), 0, len(self))
+        bounds[0], bounds[-1] = 0, len(self)
+        return labels, bounds
+
+    def reduce(self, column, period='M', how='sum'):
+        """Per-period reduction of a column as a DataFrame (period, value, observations).
+
+        Missing slots are ignored; periods without any observation get NaN
+        (0 observations) so callers can drop or flag them.
+        """
+        if how not in ('sum', 'mean', 'max', 'min'):
+            raise ValueError(f"Unknown reduction '{how}'")
+        labels, bounds = self._period_bounds(period)
+        arr = self.values[column]
+        present = ~np.isnan(arr)
+        n_obs = np.zeros(len(labels), dtype=np.int64)
+        result = np.full(len(labels), np.nan)
+
+        nonempty = np.diff(bounds) > 0
+        starts = bounds[:-1][nonempty]
+        if len(starts):
+            # Empty periods have equal boundaries, so reducing over the non-empty
+            # starts still covers exactly each period's slots
+            n_obs[nonempty] = np.add.reduceat(present.astype(np.int64), starts)
+            if how in ('sum', 'mean'):
+                sums = np.add.reduceat(np.where(present, arr, 0.0), starts)
+                result[nonempty] = sums if how == 'sum' else sums / np.maximum(n_obs[nonempty], 1)
+            elif how == 'max':
+                result[nonempty] = np.fmax.reduceat(arr, starts)
+            else:
+                result[nonempty] = np.fmin.reduceat(arr, starts)
+        result[n_obs == 0] = np.nan
+        return pd.DataFrame({'period': labels, 'value': result, 'observations': n_obs})
+
+    def period_totals(self, column, period='M'):
+        """Totals per period with at least one observation, as an array (like a groupby sum)"""
+        table = self.reduce(column, period, 'sum')
+        return table.loc[table['observations'] > 0, 'value'].to_numpy()
+
+    def to_frame(self):
+        """Grid as a DataFrame with a timestamp column and a `valid` observation flag"""
+        frame = pd.DataFrame({'timestamp': self.timestamps()})
+        for name, arr in self.values.items():
+            frame[name] = arr
+        frame['valid'] = self.valid
+        return frame
+
+
+def from_processed(df, columns=('Rain_mm', 'Snow_mm')):
+    """Uniform series of the precipitation columns of a DataProcessor result"""
+    return UniformSeries.from_frame(df, [c for c in columns if c in df.columns], duplicates='sum')
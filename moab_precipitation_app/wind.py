@@ -0,0 +1,124 @@
+"""
+Wind rose tables from processed data.
+
+Port of the wind rose analysis in Wind_Rose_Analysis_Template.ipynb. Instead
+of redrawing from raw rows, every rose is a direction sector x speed bin
+frequency table built with one np.histogram2d pass over the filtered rows;
+plots and JSON responses are rendered from that table, so it can be cached
+per file and filter.
+"""
+import numpy as np
+
+DIRECTION_COLUMN = 'Wind_Direction_10m'
+SPEED_COLUMN = 'Wind_Speed_10m'
+
+# Sectors of the notebook's roses (22.5 degrees each, the first centred on north)
+DEFAULT_SECTORS = 16
+
+# Speed bin edges per file format; the last bin is open-ended.
+# MeteoBlue exports wind speed in km/h, SynopticX in m/s.
+SPEED_UNITS = {'meteoblue': 'km/h', 'synopticx': 'm/s'}
+DEFAULT_SPEED_BINS = {
+    'meteoblue': [0, 10, 20, 30, 40],
+    'synopticx': [0, 3, 6, 9, 12]
+}
+
+# Precipitation filters: rows with rain, snow or either (as in filter_by_precip_type)
+PRECIP_FILTERS = {
+    'rain': ['Rain_mm'],
+    'snow': ['Snow_mm'],
+    'both': ['Rain_mm', 'Snow_mm']
+}
+
+
+def has_wind(df):
+    return DIRECTION_COLUMN in df.columns and SPEED_COLUMN in df.columns
+
+
+def default_speed_bins(file_format):
+    return DEFAULT_SPEED_BINS.get(file_format, DEFAULT_SPEED_BINS['meteoblue'])
+
+
+def parse_speed_bins(value):
+    """Speed bin edges from '0,5,10' (raises ValueError unless increasing and >= 0)"""
+    edges = [float(v) for v in str(value).split(',') if v.strip()]
+    if len(edges) < 2:
+        raise ValueError('speed_bins needs at least two edges')
+    if edges[0] < 0 or any(b <= a for a, b in zip(edges, edges[1:])):
+        raise ValueError('speed_bins must be increasing and non-negative')
+    return edges
+
+
+def vector_average_direction(directions):
+    """Mean wind direction (0-360 degrees) of unit vectors, NaN if there are none"""
+    rad = np.deg2rad(directions)
+    if rad.size == 0:
+        return float('nan')
+    return float((np.rad2deg(np.arctan2(np.sin(rad).mean(), np.cos(rad).mean())) + 360) % 360)
+
+
+def filter_mask(df, month_filter=None, precip_type=None):
+    """Boolean mask of the rows a wind rose covers (None/'all' keeps every precip state)"""
+    mask = np.ones(len(df), dtype=bool)
+    if month_filter:
+        mask &= np.isin(df['Month'].to_numpy(), [int(m) for m in month_filter])
+    if precip_type and precip_type != 'all':
+        if precip_type not in PRECIP_FILTERS:
+            raise ValueError(f"Invalid precip_type '{precip_type}'. Choose one of: all, {', '.join(PRECIP_FILTERS)}")
+        wet = np.zeros(len(df), dtype=bool)
+        for col in PRECIP_FILTERS[precip_type]:
+            wet |= df[col].to_numpy(dtype=np.float64) > 0
+        mask &= wet
+    return mask
+
+
+def wind_rose_table(df, month_filter=None, precip_type=None, sectors=DEFAULT_SECTORS, speed_bins=None,
+                    file_format=None):
+    """Sector x speed bin counts and frequencies of the filtered rows
+
+    Raises ValueError if the file has no 10 m wind data.
+    """
+    if not has_wind(df):
+        raise ValueError('File has no 10 m wind speed/direction data')
+    if not 4 <= int(sectors) <= 72:
+        raise ValueError('sectors must be between 4 and 72')
+    sectors = int(sectors)
+    edges = list(speed_bins) if speed_bins else default_speed_bins(file_format)
+
+    mask = filter_mask(df, month_filter, precip_type)
+    table = rose_table(df[DIRECTION_COLUMN].to_numpy(dtype=np.float64)[mask],
+                       df[SPEED_COLUMN].to_numpy(dtype=np.float64)[mask], sectors, edges, file_format)
+    table['months'] = sorted(int(m) for m in (month_filter or []))
+    table['precip_type'] = precip_type or 'all'
+    return table
+
+
+def rose_table(direction, speed, sectors=DEFAULT_SECTORS, speed_bins=None, file_format=None):
+    """Sector x speed bin table of paired direction/speed arrays (NaN pairs are skipped)"""
+    edges = list(speed_bins) if speed_bins else default_speed_bins(file_format)
+    valid = np.isfinite(direction) & np.isfinite(speed) & (speed >= edges[0])
+    direction, speed = direction[valid], speed[valid]
+
+    width = 360.0 / sectors
+    # Shift by half a sector so sector 0 is centred on north (348.75-11.25 for 16 sectors)
+    shifted = np.mod(direction + width / 2, 360.0)
+    # The open-ended last bin is closed at the observed maximum for histogram2d
+    speed_edges = np.array(edges + [max(edges[-1], float(speed.max()) if speed.size else 0.0) + 1.0])
+    counts, _, _ = np.histogram2d(shifted, speed, bins=[np.linspace(0, 360, sectors + 1), speed_edges])
+    counts = counts.astype(np.int64)
+
+    total = int(counts.sum())
+    frequency = counts / total * 100 if total else np.zeros_like(counts, dtype=np.float64)
+    labels = [f'{a:g}-{b:g}' for a, b in zip(edges, edges[1:])] + [f'>{edges[-1]:g}']
+    return {
+        'sectors': sectors,
+        'sector_centers': [round(i * width, 2) for i in range(sectors)],
+        'speed_bins': edges,
+        'speed_labels': labels,
+        'speed_unit': SPEED_UNITS.get(file_format),
+        'counts': counts.tolist(),
+        'frequency': np.round(frequency, 3).tolist(),
+        'total': total,
+        'mean_speed': float(speed.mean()) if speed.size else None,
+        'mean_direction': None if not direction.size else vector_average_direction(direction)
+    }